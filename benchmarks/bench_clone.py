@@ -0,0 +1,116 @@
+r"""
+Benchmark of the setup of a remote Source: the full clone against the shallow, filtered and sparse clones. The
+remote is a local bare repo fixture that mimics a course repo: a small source directory next to a large dataset
+directory rewritten over several commits.
+
+The bytes transferred are measured as the size of the `.git` directory of the clone right after the setup, and the
+disk usage as the size of the whole clone.
+
+Example of command:
+    python benchmarks/bench_clone.py --dataset-size-mb 50 --n-commits 5 --output clone_results.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import tac
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+    import tac
+
+
+SRC_PATH = "Example/SimpleTP/src"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset-size-mb", type=float, default=20.0, help="Size of the dataset of each commit.")
+    parser.add_argument("--n-commits", type=int, default=5)
+    parser.add_argument("--n-repeats", type=int, default=3)
+    parser.add_argument("--output", type=str, default=None, help="Path of the json file of the results.")
+    return parser.parse_args()
+
+
+def git(*args, cwd: str):
+    subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_bare_repo_fixture(root: str, dataset_size_mb: float, n_commits: int) -> str:
+    r"""
+    Create a bare repo with a small source directory and a dataset directory rewritten at each commit.
+
+    :return: The path of the bare repo.
+    """
+    work_dir = os.path.join(root, "work")
+    bare_dir = os.path.join(root, "remote.git")
+    os.makedirs(os.path.join(work_dir, SRC_PATH))
+    os.makedirs(os.path.join(work_dir, "datasets"))
+    git("init", "--initial-branch=main", cwd=work_dir)
+    git("config", "user.email", "bench@example.com", cwd=work_dir)
+    git("config", "user.name", "bench", cwd=work_dir)
+    with open(os.path.join(work_dir, os.path.dirname(SRC_PATH), "requirements.txt"), "w") as f:
+        f.write("numpy\n")
+    for i in range(n_commits):
+        with open(os.path.join(work_dir, SRC_PATH, "functions.py"), "w") as f:
+            f.write(f"VERSION = {i}\n\n\ndef add(a, b):\n    return a + b\n")
+        with open(os.path.join(work_dir, "datasets", "data.bin"), "wb") as f:
+            f.write(os.urandom(int(dataset_size_mb * 1024 ** 2)))
+        git("add", "-A", cwd=work_dir)
+        git("commit", "-m", f"commit {i}", cwd=work_dir)
+    git("clone", "--bare", work_dir, bare_dir, cwd=root)
+    # Allow the partial clones from the fixture, as the git hosting services do.
+    git("config", "uploadpack.allowFilter", "true", cwd=bare_dir)
+    return bare_dir
+
+
+def time_setup(bare_dir: str, n_repeats: int, **kwargs) -> dict:
+    durations, git_sizes, clone_sizes = [], [], []
+    for _ in range(n_repeats):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src = tac.Source(SRC_PATH, url=bare_dir, **kwargs)
+            start = time.perf_counter()
+            src.setup_at(tmp_dir)
+            durations.append(time.perf_counter() - start)
+            git_sizes.append(tac.tac_utils.get_dir_size(os.path.join(src.local_repo_tmp_dirpath, ".git")))
+            clone_sizes.append(tac.tac_utils.get_dir_size(src.local_repo_tmp_dirpath))
+            assert os.path.exists(os.path.join(src.local_path, "functions.py"))
+            src.repo.close()
+    return {
+        "durations"  : durations,
+        "mean"       : sum(durations) / len(durations),
+        "git_bytes"  : max(git_sizes),
+        "clone_bytes": max(clone_sizes),
+    }
+
+
+def main():
+    args = parse_args()
+    modes = {
+        "full"                 : dict(clone_depth=None, clone_filter=None, sparse_checkout=False),
+        "shallow"              : dict(clone_depth=1, clone_filter=None, sparse_checkout=False),
+        "shallow_filter"       : dict(clone_depth=1, clone_filter="blob:none", sparse_checkout=False),
+        "shallow_filter_sparse": dict(clone_depth=1, clone_filter="blob:none", sparse_checkout=True),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        bare_dir = make_bare_repo_fixture(root, args.dataset_size_mb, args.n_commits)
+        for mode, mode_kwargs in modes.items():
+            results[mode] = time_setup(bare_dir, args.n_repeats, **mode_kwargs)
+            print(
+                f"{mode}: mean={results[mode]['mean']:.3f} s, "
+                f"transferred={results[mode]['git_bytes'] / 1024 ** 2:.2f} MB, "
+                f"disk={results[mode]['clone_bytes'] / 1024 ** 2:.2f} MB over {args.n_repeats} runs"
+            )
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+r"""
+End-to-end throughput benchmark of the grading pipeline on synthetic submissions generated from `Example/SimpleTP`.
+
+Each submission is a local bare git repo with the code, the tests and a requirements file of the example, mutated
+with a seeded random generator:
+    - some functions of the code are broken, so the pass rates of the tests and of the master tests vary;
+    - some files are reformatted with PEP8 violations, so the PEP8 scores vary;
+    - the requirements are a random set of small generated packages on top of the pytest plugins, so the
+      submissions don't all share the same venv.
+
+The master tests are in their own bare repo shared by every submission. The requirements are installed from a
+wheelhouse only (pip install --no-index), so the benchmark runs fully offline once the wheels of the pytest plugins
+are in the wheelhouse, which can be built once with `--download-wheelhouse`. The wheels of the generated packages
+are written in the wheelhouse by the benchmark itself.
+
+The submissions are graded by each of the given modes:
+    - `tester`: one :class:`tac.Tester` after the other in the current process;
+    - `batch`: a :class:`tac.BatchTester` with a pool of `--n-workers` processes;
+    - `scheduler`: a :class:`tac.BatchTester` running the stages of every submission in a single
+      :class:`tac.StageScheduler`;
+    - `cli`: one `python -m tac` command after the other.
+The venv cache and the git mirror cache, when enabled, are shared by the modes, so the first mode builds them.
+With `--test-workers`, the tests of each submission are distributed across pytest-xdist workers, to compare the
+latency of a submission with the throughput of the batch.
+
+The end-to-end throughput of a mode is the number of submissions graded per minute of wall-clock time. The
+throughput of a stage is the number of submissions per minute of the total wall-clock time spent in this stage,
+taken from the timings of the reports. The results are saved as json and can be compared with the ones of a
+previous run given with `--baseline`.
+
+Example of command:
+    python benchmarks/bench_end_to_end.py --n-submissions 8 --modes tester batch --wheelhouse wheelhouse
+        --download-wheelhouse --output e2e_results.json --baseline e2e_baseline.json
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+try:
+    import tac
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+    import tac
+
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Example", "SimpleTP")
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+BASE_REQUIREMENTS = ["pytest", "pytest-cov", "pytest-json-report"]
+XDIST_REQUIREMENTS = ["pytest-xdist"]
+GENERATED_PACKAGE_PATTERN = "tacbench_dep_{}"
+GENERATED_PACKAGE_VERSION = "1.0.0"
+N_GENERATED_PACKAGES = 6
+BROKEN_FUNCTIONS = {
+    "add": "    return a + b + 1\n",
+    "sub": "    return b - a\n",
+    "mul": "    return a * b * 2\n",
+}
+MODES = ["tester", "batch", "scheduler", "cli"]
+STANDALONE_TESTS_HEADER = (
+    "import os\nimport sys\nimport pytest\n\n"
+    "sys.path.append(os.path.join(os.path.dirname(__file__), \"..\", \"src\"))\n"
+    "from a_class import AClass\n\n\n"
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-submissions", type=int, default=8)
+    parser.add_argument("--modes", type=str, nargs="*", default=["tester", "batch"], choices=MODES)
+    parser.add_argument("--n-workers", type=int, default=None, help="Number of workers of the batch modes.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generation of the submissions.")
+    parser.add_argument("--wheelhouse", type=str, default="wheelhouse")
+    parser.add_argument(
+        "--download-wheelhouse", action="store_true",
+        help=f"Build the wheels of {BASE_REQUIREMENTS} (and {XDIST_REQUIREMENTS} with --test-workers) in the "
+             f"wheelhouse first. This is the only step that may need network access.",
+    )
+    parser.add_argument("--venv-cache", action="store_true", help="Share the venvs through a venv cache.")
+    parser.add_argument("--git-mirror-cache", action="store_true", help="Clone through a git mirror cache.")
+    parser.add_argument("--warm-workers", action="store_true", help="Run pytest in warm pytest workers.")
+    parser.add_argument(
+        "--test-workers", type=str, default=None,
+        help=f"Number of pytest-xdist workers of each pytest session. {XDIST_REQUIREMENTS} are then added to the "
+             f"requirements of the submissions.",
+    )
+    parser.add_argument("--root", type=str, default=None, help="Directory of the fixtures and of the reports.")
+    parser.add_argument("--output", type=str, default=None, help="Path of the json file of the results.")
+    parser.add_argument("--baseline", type=str, default=None, help="Json file of results to compare with.")
+    return parser.parse_args()
+
+
+def silent(*args, **kwargs):
+    pass
+
+
+def git(*args, cwd: str):
+    subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_bare_repo(root: str, name: str, files: dict) -> str:
+    r"""
+    Create a bare repo whose single commit contains the given files.
+
+    :param files: The content of each file by path relative to the root of the repo.
+    :return: The path of the bare repo.
+    """
+    work_dir = os.path.join(root, "work", name)
+    bare_dir = os.path.join(root, "remotes", f"{name}.git")
+    for path, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(work_dir, path)), exist_ok=True)
+        with open(os.path.join(work_dir, path), "w") as f:
+            f.write(content)
+    git("init", "--initial-branch=main", cwd=work_dir)
+    git("config", "user.email", "bench@example.com", cwd=work_dir)
+    git("config", "user.name", "bench", cwd=work_dir)
+    git("add", "-A", cwd=work_dir)
+    git("commit", "-m", "submission", cwd=work_dir)
+    os.makedirs(os.path.dirname(bare_dir), exist_ok=True)
+    git("clone", "--bare", work_dir, bare_dir, cwd=root)
+    git("config", "uploadpack.allowFilter", "true", cwd=bare_dir)
+    shutil.rmtree(work_dir)
+    return bare_dir
+
+
+def make_wheel(wheelhouse: str, name: str, version: str = GENERATED_PACKAGE_VERSION) -> str:
+    r"""
+    Write the wheel of a small pure python package in the wheelhouse.
+
+    :return: The path of the wheel.
+    """
+    dist_info = f"{name}-{version}.dist-info"
+    files = {
+        f"{name}/__init__.py": f"VERSION = \"{version}\"\nTABLE = {list(range(256))}\n",
+        f"{dist_info}/METADATA": f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n",
+        f"{dist_info}/WHEEL"   : "Wheel-Version: 1.0\nGenerator: tac-bench\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    record = []
+    for path, content in files.items():
+        digest = base64.urlsafe_b64encode(hashlib.sha256(content.encode("utf-8")).digest()).rstrip(b"=").decode()
+        record.append(f"{path},sha256={digest},{len(content.encode('utf-8'))}")
+    record.append(f"{dist_info}/RECORD,,")
+    files[f"{dist_info}/RECORD"] = "\n".join(record) + "\n"
+    os.makedirs(wheelhouse, exist_ok=True)
+    wheel_path = os.path.join(wheelhouse, f"{name}-{version}-py3-none-any.whl")
+    with zipfile.ZipFile(wheel_path, "w") as zf:
+        for path, content in files.items():
+            zf.writestr(path, content)
+    return wheel_path
+
+
+def read_example_file(*path: str) -> str:
+    with open(os.path.join(EXAMPLE_PATH, *path), "r") as f:
+        return f.read()
+
+
+def read_example_tests(dirname: str) -> dict:
+    r"""
+    Read the test files of the example. The tests importing the code with the utils of tac import it from the
+    source directory instead, since tac is not installed in the venvs of the submissions.
+    """
+    tests = {}
+    for filename in sorted(os.listdir(os.path.join(EXAMPLE_PATH, dirname))):
+        if not filename.endswith(".py"):
+            continue
+        code = read_example_file(dirname, filename)
+        if "import tac" in code or "from tac" in code:
+            code = STANDALONE_TESTS_HEADER + code[code.index("@pytest"):]
+        tests[os.path.join(dirname, filename)] = code
+    return tests
+
+
+def break_functions(code: str, names: list) -> str:
+    for name in names:
+        code = re.sub(
+            rf"(def {name}\(a, b\):\n)    return .*\n", lambda m: m.group(1) + BROKEN_FUNCTIONS[name], code
+        )
+    return code
+
+
+def degrade_pep8(code: str, level: int) -> str:
+    r"""
+    Add PEP8 violations to the code: unused imports, missing whitespaces and long lines, more of them at each level.
+    """
+    if level <= 0:
+        return code
+    header = "import os,sys\nimport re\n"
+    code = header + code.replace("a + b", "a+b").replace("a - b", "a-b")
+    if level >= 2:
+        code = code.replace("def ", "def  ").replace(", ", ",")
+        code += f"\n\nLONG_CONSTANT = {list(range(64))}\n" + "x=1;y=2\n" * level
+    return code
+
+
+def make_submission_spec(rng: random.Random, i: int) -> dict:
+    n_packages = rng.choice([0, 1, 2, 3])
+    return {
+        "name"            : f"submission_{i}",
+        "broken_functions": sorted(rng.sample(sorted(BROKEN_FUNCTIONS), rng.randint(0, len(BROKEN_FUNCTIONS)))),
+        "pep8_level"      : rng.randint(0, 2),
+        "requirements"    : [
+            GENERATED_PACKAGE_PATTERN.format(j)
+            for j in sorted(rng.sample(range(N_GENERATED_PACKAGES), n_packages))
+        ],
+    }
+
+
+def get_base_requirements(args) -> list:
+    return BASE_REQUIREMENTS + (XDIST_REQUIREMENTS if args.test_workers is not None else [])
+
+
+def make_fixtures(root: str, n_submissions: int, seed: int, wheelhouse: str, base_requirements: list) -> dict:
+    r"""
+    Create the bare repos of the master tests and of the submissions, and the wheels of the generated packages.
+
+    :return: The path of the bare repo of the master tests and the specification and the bare repo of each
+        submission.
+    """
+    for j in range(N_GENERATED_PACKAGES):
+        make_wheel(wheelhouse, GENERATED_PACKAGE_PATTERN.format(j))
+    master_tests_repo = make_bare_repo(root, "master", read_example_tests("master_tests"))
+    rng = random.Random(seed)
+    submissions = {}
+    for i in range(n_submissions):
+        spec = make_submission_spec(rng, i)
+        files = {
+            os.path.join("src", "functions.py"): degrade_pep8(
+                break_functions(read_example_file("src", "functions.py"), spec["broken_functions"]),
+                spec["pep8_level"],
+            ),
+            os.path.join("src", "a_class.py"): degrade_pep8(read_example_file("src", "a_class.py"), spec["pep8_level"]),
+            "requirements.txt": "\n".join(base_requirements + spec["requirements"]) + "\n",
+        }
+        files.update(read_example_tests("tests"))
+        spec["repo"] = make_bare_repo(root, spec["name"], files)
+        submissions[spec["name"]] = spec
+    return {"master_tests_repo": master_tests_repo, "submissions": submissions}
+
+
+def get_source_kwargs(args, root: str) -> dict:
+    source_kwargs = {}
+    if args.git_mirror_cache:
+        source_kwargs["git_mirror_cache"] = tac.GitMirrorCache(os.path.join(root, "git_mirrors"))
+    return source_kwargs
+
+
+def get_code_kwargs(args, root: str) -> dict:
+    code_kwargs = get_source_kwargs(args, root)
+    code_kwargs["wheelhouse"] = tac.Wheelhouse(args.wheelhouse)
+    if args.venv_cache:
+        code_kwargs["venv_cache"] = tac.VenvCache(os.path.join(root, "venv_cache"))
+    return code_kwargs
+
+
+def make_sources(args, root: str, spec: dict):
+    code_src = tac.SourceCode("src", url=spec["repo"], **get_code_kwargs(args, root))
+    tests_src = tac.SourceTests("tests", url=spec["repo"], **get_source_kwargs(args, root))
+    return code_src, tests_src
+
+
+def get_tester_kwargs(args) -> dict:
+    return dict(
+        logging_func=silent, reuse_results=False, warm_workers=args.warm_workers, test_workers=args.test_workers
+    )
+
+
+def run_tester_mode(args, root: str, fixtures: dict, report_dir: str) -> dict:
+    master_tests_src = tac.SourceMasterTests("master_tests", url=fixtures["master_tests_repo"])
+    for name, spec in fixtures["submissions"].items():
+        tester = tac.Tester(
+            *make_sources(args, root, spec),
+            master_tests_src=master_tests_src,
+            report_dir=os.path.join(report_dir, name),
+            **get_tester_kwargs(args),
+        )
+        tester.run(overwrite=True)
+    return {}
+
+
+def run_batch_mode(args, root: str, fixtures: dict, report_dir: str, stage_scheduler: bool = False) -> dict:
+    batch_tester = tac.BatchTester(
+        {name: make_sources(args, root, spec) for name, spec in fixtures["submissions"].items()},
+        master_tests_src=tac.SourceMasterTests("master_tests", url=fixtures["master_tests_repo"]),
+        report_dir=report_dir,
+        n_workers=args.n_workers,
+        tester_kwargs=get_tester_kwargs(args),
+        stage_scheduler=stage_scheduler,
+        logging_func=silent,
+    )
+    batch_tester.run(overwrite=True)
+    return batch_tester.errors
+
+
+def run_cli_mode(args, root: str, fixtures: dict, report_dir: str) -> dict:
+    errors = {}
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [SRC_PATH, os.environ.get("PYTHONPATH")]))}
+    for name, spec in fixtures["submissions"].items():
+        cmd = [
+            sys.executable, "-m", "tac",
+            "--code-src-path", "src", "--code-src-url", spec["repo"],
+            "--tests-src-path", "tests", "--tests-src-url", spec["repo"],
+            "--master-tests-src-path", "master_tests", "--master-tests-src-url", fixtures["master_tests_repo"],
+            "--report-dir", os.path.join(report_dir, name),
+            "--wheelhouse", args.wheelhouse,
+            "--no-reuse-results",
+            "--overwrite",
+        ]
+        if args.venv_cache:
+            cmd += ["--venv-cache-dir", os.path.join(root, "venv_cache")]
+        if args.git_mirror_cache:
+            cmd += ["--git-mirror-dir", os.path.join(root, "git_mirrors")]
+        if args.warm_workers:
+            cmd += ["--warm-workers"]
+        if args.test_workers is not None:
+            cmd += ["--test-workers", args.test_workers]
+        result = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        # The cli exits with the message of the points as status, so only a missing report is an error.
+        if not os.path.exists(os.path.join(report_dir, name, tac.Tester.DEFAULT_REPORT_FILENAME)):
+            errors[name] = result.stdout[-2000:]
+    return errors
+
+
+def summarize_reports(report_dir: str, names: list, duration: float, errors: dict) -> dict:
+    r"""
+    Summarize the grades and the timings of the reports of a mode.
+    """
+    grades, stages = {}, {}
+    for name in names:
+        report_filepath = os.path.join(report_dir, name, tac.Tester.DEFAULT_REPORT_FILENAME)
+        if not os.path.exists(report_filepath):
+            continue
+        report = tac.Report().load(report_filepath)
+        grades[name] = report.grade
+        for stage, timing in (report.timings or {}).get("sections", {}).items():
+            if "/" in stage:
+                continue
+            stages.setdefault(stage, {"wall": [], "cpu": []})
+            stages[stage]["wall"].append(timing["wall"])
+            stages[stage]["cpu"].append(timing["cpu"])
+    n = len(names)
+    return {
+        "duration"               : duration,
+        "submissions_per_minute" : 60.0 * n / duration,
+        "n_errors"               : len(errors),
+        "errors"                 : errors,
+        "grades"                 : grades,
+        "stages"                 : {
+            stage: {
+                "mean_wall"             : sum(timing["wall"]) / len(timing["wall"]),
+                "mean_cpu"              : sum(timing["cpu"]) / len(timing["cpu"]),
+                "total_wall"            : sum(timing["wall"]),
+                "submissions_per_minute": 60.0 * len(timing["wall"]) / max(sum(timing["wall"]), 1e-9),
+            }
+            for stage, timing in stages.items()
+        },
+    }
+
+
+def compare_with_baseline(results: dict, baseline: dict):
+    for mode, mode_results in results["modes"].items():
+        baseline_mode = baseline.get("modes", {}).get(mode)
+        if baseline_mode is None:
+            continue
+        speedup = mode_results["submissions_per_minute"] / baseline_mode["submissions_per_minute"]
+        print(f"{mode}: x{speedup:.2f} submissions/min against the baseline")
+        for stage, stage_results in mode_results["stages"].items():
+            baseline_stage = baseline_mode["stages"].get(stage)
+            if baseline_stage is not None:
+                speedup = stage_results["submissions_per_minute"] / baseline_stage["submissions_per_minute"]
+                print(f"  {stage}: x{speedup:.2f}")
+
+
+def main():
+    args = parse_args()
+    args.wheelhouse = os.path.abspath(args.wheelhouse)
+    if args.download_wheelhouse:
+        tac.Wheelhouse(args.wheelhouse).download(get_base_requirements(args))
+    root = tempfile.mkdtemp(prefix="tac_bench_") if args.root is None else os.path.abspath(args.root)
+    results = {
+        "config": {
+            **vars(args),
+            "python"   : platform.python_version(),
+            "platform" : platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "modes" : {},
+    }
+    try:
+        fixtures = make_fixtures(root, args.n_submissions, args.seed, args.wheelhouse, get_base_requirements(args))
+        results["submissions"] = {
+            name: {key: value for key, value in spec.items() if key != "repo"}
+            for name, spec in fixtures["submissions"].items()
+        }
+        runners = {
+            "tester"   : run_tester_mode,
+            "batch"    : run_batch_mode,
+            "scheduler": lambda *a: run_batch_mode(*a, stage_scheduler=True),
+            "cli"      : run_cli_mode,
+        }
+        for mode in args.modes:
+            report_dir = os.path.join(root, "reports", mode)
+            start = time.perf_counter()
+            errors = runners[mode](args, root, fixtures, report_dir)
+            duration = time.perf_counter() - start
+            results["modes"][mode] = summarize_reports(report_dir, list(fixtures["submissions"]), duration, errors)
+            print(
+                f"{mode}: {results['modes'][mode]['submissions_per_minute']:.2f} submissions/min "
+                f"({args.n_submissions} submissions in {duration:.2f} s, {len(errors)} errors)"
+            )
+            for stage, stage_results in results["modes"][mode]["stages"].items():
+                print(
+                    f"  {stage}: {stage_results['submissions_per_minute']:.2f} submissions/min, "
+                    f"mean wall={stage_results['mean_wall']:.3f} s, mean cpu={stage_results['mean_cpu']:.3f} s"
+                )
+    finally:
+        if args.root is None:
+            shutil.rmtree(root, ignore_errors=True)
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            compare_with_baseline(results, json.load(f))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == '__main__':
+    main()
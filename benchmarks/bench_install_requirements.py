@@ -0,0 +1,74 @@
+r"""
+Benchmark of the installation of the requirements of a SourceCode: the per-package loop (one pip invocation for
+the requirements file and one for each additional requirement) against the single-shot installation, optionally
+from an offline wheelhouse.
+
+Example of command:
+    python benchmarks/bench_install_requirements.py --src-path Example/SimpleTP/src
+        --additional-requirements pytest pytest-cov pytest-json-report --wheelhouse wheelhouse --download-wheelhouse
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import tac
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+    import tac
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src-path", type=str, default=os.path.join("Example", "SimpleTP", "src"))
+    parser.add_argument("--additional-requirements", type=str, nargs="*", default=[])
+    parser.add_argument("--wheelhouse", type=str, default=None)
+    parser.add_argument("--download-wheelhouse", action="store_true")
+    parser.add_argument("--n-repeats", type=int, default=3)
+    parser.add_argument("--output", type=str, default=None, help="Path of the json file of the results.")
+    return parser.parse_args()
+
+
+def time_install(src_path: str, n_repeats: int, **kwargs) -> list:
+    durations = []
+    for _ in range(n_repeats):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            code_src = tac.SourceCode(src_path, **kwargs)
+            code_src.working_dir = tmp_dir
+            code_src.maybe_create_venv()
+            start = time.perf_counter()
+            code_src.install_requirements()
+            durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    args = parse_args()
+    kwargs = dict(additional_requirements=args.additional_requirements)
+    wheelhouse = None
+    if args.wheelhouse is not None:
+        wheelhouse = tac.Wheelhouse(args.wheelhouse)
+        if args.download_wheelhouse:
+            wheelhouse.download(tac.SourceCode(args.src_path, **kwargs).requirements)
+    modes = {
+        "per_package": dict(single_shot_install=False),
+        "single_shot": dict(single_shot_install=True),
+    }
+    if wheelhouse is not None:
+        modes["single_shot_wheelhouse"] = dict(single_shot_install=True, wheelhouse=wheelhouse)
+    results = {}
+    for mode, mode_kwargs in modes.items():
+        durations = time_install(args.src_path, args.n_repeats, **kwargs, **mode_kwargs)
+        results[mode] = {"durations": durations, "mean": sum(durations) / len(durations)}
+        print(f"{mode}: mean={results[mode]['mean']:.3f} s over {args.n_repeats} runs")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == '__main__':
+    main()
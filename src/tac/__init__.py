@@ -13,7 +13,21 @@ from .source import (
     SourceMasterTests,
 )
 from .tester import Tester
+from .batch_tester import BatchTester
 from .report import Report
+from .report_store import ReportStore
+from .report_batch import ReportBatch
+from .report_publisher import ReportPublisher
+from .venv_cache import VenvCache
+from .wheelhouse import Wheelhouse
+from .lint_cache import LintCache
+from .git_mirror_cache import GitMirrorCache
+from .async_utils import AsyncLimits
+from .stage_scheduler import Stage, StageGraph, StageScheduler
+from .resource_governor import ResourceLimits, ProcessOutcome
+from .timings import Timings
+from .test_impact import TestImpactIndex
+from .pytest_results import PytestResults
 from . import utils as tac_utils
 
 import warnings
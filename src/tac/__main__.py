@@ -1,4 +1,5 @@
 import argparse
+import os
 import sys
 
 from . import (
@@ -8,6 +9,11 @@ from . import (
     SourceMasterTests,
     Tester,
     Report,
+    ReportStore,
+    VenvCache,
+    Wheelhouse,
+    GitMirrorCache,
+    ResourceLimits,
 )
 
 
@@ -89,6 +95,174 @@ def parse_args():
         action="store_true",
         help="Clear pytest temporary files.",
     )
+    parser.add_argument(
+        "--venv-cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the venv cache. If given, the venvs are taken from this cache instead of being rebuilt "
+             "at every run.",
+    )
+    parser.add_argument(
+        "--venv-cache-max-size",
+        type=float,
+        default=None,
+        help="Maximum size of the venv cache in GB. The least recently used venvs are evicted when exceeded.",
+    )
+    parser.add_argument(
+        "--wheelhouse",
+        type=str,
+        default=None,
+        help="Directory of wheels from which the requirements are installed without network access "
+             "(pip install --no-index --find-links).",
+    )
+    parser.add_argument(
+        "--download-wheelhouse",
+        action="store_true",
+        help="Build the wheels of the requirements in the wheelhouse before running.",
+    )
+    parser.add_argument(
+        "--warm-workers",
+        action="store_true",
+        help="Run the pytest sessions in children forked from warm pytest workers (POSIX only).",
+    )
+    parser.add_argument(
+        "--preload-modules",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Modules imported once by the warm pytest workers, e.g. the heavy requirements of the code.",
+    )
+    parser.add_argument(
+        "--sequential-stages",
+        action="store_true",
+        help="Run the tests, the master tests and the PEP8 stages one after the other instead of concurrently.",
+    )
+    parser.add_argument(
+        "--pycache-prefix",
+        type=str,
+        default=None,
+        help="Throwaway directory where the pytest sessions write their bytecode instead of the report directory.",
+    )
+    parser.add_argument(
+        "--lint-cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the lint cache. If given, only the files whose content is not in the cache are linted.",
+    )
+    parser.add_argument(
+        "--git-mirror-dir",
+        type=str,
+        default=None,
+        help="Directory of the git mirror cache. If given, the remote sources are cloned from local mirrors of their "
+             "repos, fetched only when the head of their branch moved.",
+    )
+    parser.add_argument(
+        "--full-clone",
+        action="store_true",
+        default=False,
+        help="Clone the remote sources with their whole history and check out all their files instead of doing "
+             "shallow, partial and sparse clones limited to the source paths.",
+    )
+    parser.add_argument(
+        "--full-copy",
+        action="store_true",
+        default=False,
+        help="Remove and fully copy the sources at each setup instead of only copying the files that changed.",
+    )
+    parser.add_argument(
+        "--link-patterns",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Glob patterns of the read-only input files of the sources, e.g. 'data/*'. These files are hardlinked "
+             "instead of being copied.",
+    )
+    parser.add_argument(
+        "--json-report",
+        action="store_true",
+        default=False,
+        help="Also write the full json reports of pytest-json-report of the test sessions. The grades only need the "
+             "compact results files written by the results plugin of tac.",
+    )
+    parser.add_argument(
+        "--test-workers",
+        type=str,
+        default=None,
+        help="Number of worker processes of pytest-xdist running the tests of the submission, or 'auto' for one "
+             "per cpu. pytest-xdist must be in the requirements, otherwise the tests run in a single process. "
+             "Lower the number of concurrent submissions accordingly.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="Only rerun the tests impacted by the changes since the previous run in the same report directory. "
+             "The impact of a change is found from the coverage of each test.",
+    )
+    parser.add_argument(
+        "--coverage-by-statements",
+        action="store_true",
+        default=False,
+        help="Compute the code coverage as the percentage of covered statements of all the files together instead "
+             "of the mean of the percentages of the files.",
+    )
+    parser.add_argument(
+        "--no-reuse-results",
+        action="store_true",
+        default=False,
+        help="Always rerun every stage instead of reusing the results of the previous report whose inputs are "
+             "unchanged.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Maximum wall-clock duration in seconds of each student-controlled process (pytest sessions, venv "
+             "creations and pip installs). The whole process group is killed on expiry.",
+    )
+    parser.add_argument(
+        "--cpu-time-limit",
+        type=int,
+        default=None,
+        help="Maximum CPU time in seconds of each student-controlled process.",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=float,
+        default=None,
+        help="Maximum address space in GB of each student-controlled process.",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        default=False,
+        help=f"Save the timings of the stages as a Chrome trace file ({Tester.TRACE_FILENAME}) in the report "
+             f"directory, to load in a trace viewer such as chrome://tracing or Perfetto.",
+    )
+    parser.add_argument(
+        "--report-store",
+        type=str,
+        default=None,
+        help="Path of a SQLite database of reports (see ReportStore) in which the report is also saved.",
+    )
+    parser.add_argument(
+        "--student",
+        type=str,
+        default=None,
+        help="Student of the report saved in the report store. Defaults to the url or the path of the code source.",
+    )
+    parser.add_argument(
+        "--assignment",
+        type=str,
+        default="",
+        help="Assignment of the report saved in the report store.",
+    )
+    parser.add_argument(
+        "--run-id",
+        type=str,
+        default="",
+        help="Run of the report saved in the report store, e.g. the date of the grading.",
+    )
     for key, default_weight in Tester.DEFAULT_WEIGHTS.items():
         parser.add_argument(
             f"--{key}-weight",
@@ -126,17 +300,44 @@ def parse_args():
 
 def main():
     args = parse_args()
-    code_source = SourceCode(src_path=args.code_src_path, url=args.code_src_url)
-    test_source = SourceTests(src_path=args.tests_src_path, url=args.tests_src_url)
+    source_kwargs = {}
+    if args.full_clone:
+        source_kwargs = dict(clone_depth=None, clone_filter=None, sparse_checkout=False)
+    if args.git_mirror_dir is not None:
+        source_kwargs["git_mirror_cache"] = GitMirrorCache(args.git_mirror_dir)
+    source_kwargs["incremental_copy"] = not args.full_copy
+    source_kwargs["link_patterns"] = args.link_patterns
+    resource_limits = ResourceLimits(
+        timeout=args.timeout,
+        cpu_time=args.cpu_time_limit,
+        memory=None if args.memory_limit is None else int(args.memory_limit * 1024 ** 3),
+    )
+    source_kwargs["resource_limits"] = resource_limits
+    code_kwargs = dict(source_kwargs)
+    if args.venv_cache_dir is not None:
+        max_size = None if args.venv_cache_max_size is None else int(args.venv_cache_max_size * 1024 ** 3)
+        code_kwargs["venv_cache"] = VenvCache(args.venv_cache_dir, max_size=max_size)
+    if args.wheelhouse is not None:
+        code_kwargs["wheelhouse"] = Wheelhouse(args.wheelhouse)
+    code_source = SourceCode(src_path=args.code_src_path, url=args.code_src_url, **code_kwargs)
+    test_source = SourceTests(src_path=args.tests_src_path, url=args.tests_src_url, **source_kwargs)
     logging_func = print if args.debug else Tester.DEFAULT_LOGGING_FUNC
     if args.master_code_src_path is None and args.master_code_src_url is None:
         master_code_source = None
     else:
-        master_code_source = SourceMasterCode(src_path=args.master_code_src_path, url=args.master_code_src_url)
+        master_code_source = SourceMasterCode(
+            src_path=args.master_code_src_path, url=args.master_code_src_url, **code_kwargs
+        )
     if args.master_tests_src_path is None and args.master_tests_src_url is None:
         master_tests_source = None
     else:
-        master_tests_source = SourceMasterTests(src_path=args.master_tests_src_path, url=args.master_tests_src_url)
+        master_tests_source = SourceMasterTests(
+            src_path=args.master_tests_src_path, url=args.master_tests_src_url, **source_kwargs
+        )
+    if args.wheelhouse is not None and args.download_wheelhouse:
+        for src in [code_source, master_code_source]:
+            if src is not None and src.is_local:
+                src.wheelhouse.download(src.requirements)
     weights = Tester.DEFAULT_WEIGHTS.copy()
     weights.update({
         key: getattr(args, f"{key}_weight", default_weight)
@@ -155,6 +356,18 @@ def main():
         logging_func=logging_func,
         weights=weights,
         report_kwargs=report_kwargs,
+        warm_workers=args.warm_workers,
+        concurrent_stages=not args.sequential_stages,
+        pycache_prefix=args.pycache_prefix,
+        lint_cache=args.lint_cache_dir,
+        preload_modules=args.preload_modules,
+        reuse_results=not args.no_reuse_results,
+        incremental=args.incremental,
+        coverage_by_statements=args.coverage_by_statements,
+        json_report=args.json_report,
+        test_workers=args.test_workers,
+        resource_limits=resource_limits,
+        trace=args.trace,
     )
     tester.run(
         overwrite=args.overwrite,
@@ -162,6 +375,10 @@ def main():
         clear_pytest_temporary_files=args.clear_pytest_temporary_files
     )
     report = tester.report
+    if args.report_store is not None:
+        student = args.student or code_source.repo_url or os.path.abspath(code_source.src_path)
+        with ReportStore(args.report_store) as report_store:
+            report_store.save(report, student, args.assignment, args.run_id)
     if args.push_report_to is not None:
         try:
             tester.push_report_to(args.push_report_to)
@@ -0,0 +1,54 @@
+r"""
+Runner of a pylint session in its own interpreter. pylint relies on global state (sys.path, the astroid cache), so
+the sessions of concurrent testers run in separate processes instead of being serialized in the process of the
+testers. This script must only depend on the standard library and on pylint.
+
+The arguments of the script are the ones of pylint. The statistics and the messages of each linted file are written
+as one json object on the original stdout. The output of pylint is sent to stderr so it can't corrupt the result.
+"""
+import json
+import os
+import sys
+
+
+def main():
+    # The directory of this script must not shadow the modules of the linted code.
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    from pylint.lint import Run
+    from pylint.reporters import CollectingReporter
+
+    class ModulePathsReporter(CollectingReporter):
+        r"""
+        Reporter collecting the messages and the path of each linted module, so the statistics of pylint (indexed
+        by module name) can be mapped back to files.
+        """
+        def __init__(self):
+            super().__init__()
+            self.module_paths = {}
+
+        def on_set_current_module(self, module, filepath):
+            super().on_set_current_module(module, filepath)
+            if filepath is not None:
+                self.module_paths[module] = os.path.abspath(filepath)
+
+    reporter = ModulePathsReporter()
+    run = Run(sys.argv[1:], reporter=reporter, exit=False)
+    stats = {}
+    for module, module_stats in run.linter.stats.by_module.items():
+        path = reporter.module_paths.get(module)
+        if path is not None:
+            stats[path] = {key: int(value) for key, value in module_stats.items()}
+    messages = [
+        {"path": os.path.abspath(message.abspath or message.path), "symbol": message.symbol}
+        for message in reporter.messages
+    ]
+    protocol_out.write(json.dumps({"stats": stats, "messages": messages}) + "\n")
+    protocol_out.flush()
+
+
+if __name__ == '__main__':
+    main()
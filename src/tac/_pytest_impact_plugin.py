@@ -0,0 +1,29 @@
+r"""
+Pytest plugin of the incremental runs of tac. It is loaded with `-p` by the pytest of a venv, so it must only depend
+on the standard library and on pytest (tac is not installed in the venvs).
+
+The plugin deselects the tests whose node ids are listed in the json file given by the environment variable
+`TAC_DESELECT_FILE`. Unlike the `--deselect` option of pytest, the node ids are matched exactly instead of as
+prefixes, so deselecting `test_f` doesn't deselect `test_foo`.
+"""
+import json
+import os
+
+DESELECT_FILE_ENV_VAR = "TAC_DESELECT_FILE"
+
+
+def pytest_collection_modifyitems(session, config, items):
+    deselect_file = os.environ.get(DESELECT_FILE_ENV_VAR)
+    if not deselect_file or not os.path.exists(deselect_file):
+        return
+    with open(deselect_file, "r") as f:
+        deselect = set(json.load(f))
+    remaining, deselected = [], []
+    for item in items:
+        if item.nodeid in deselect:
+            deselected.append(item)
+        else:
+            remaining.append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = remaining
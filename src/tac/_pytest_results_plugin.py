@@ -0,0 +1,114 @@
+r"""
+Pytest plugin collecting the results of the sessions run by tac. It is loaded with `-p` by the pytest of a venv, so
+it must only depend on the standard library and on pytest (tac is not installed in the venvs).
+
+The results are streamed as one compact json record per line to the file given by the environment variable
+`TAC_RESULTS_FILE`:
+    - `{"type": "start", "root": ...}` when the session starts;
+    - `{"type": "collector", "nodeid": ..., "outcome": "failed"}` for each collection error;
+    - `{"type": "test", "nodeid": ..., "outcome": ..., "duration": ...}` once each test is torn down;
+    - `{"type": "finish", "exitcode": ..., "summary": {...}}` when the session ends, with the number of tests by
+      outcome, computed along the way, the total and the number of collected tests, deselected ones included like
+      in pytest-json-report.
+
+The outcomes are the ones of pytest-json-report: passed, failed, skipped, xfailed, xpassed or error.
+
+With pytest-xdist, only the controller writes the results since the reports of the tests run by the workers are
+sent back to it. The workers collect and deselect the tests themselves, so they send their number of deselected
+tests to the controller with their output.
+"""
+import json
+import os
+
+import pytest
+
+RESULTS_FILE_ENV_VAR = "TAC_RESULTS_FILE"
+N_DESELECTED_KEY = "tac_n_deselected"
+
+
+class ResultsCollector:
+    def __init__(self, config, results_file: str):
+        self.config = config
+        self.file = open(results_file, "w", buffering=1)
+        self.summary = {}
+        self.n_collected = 0
+        self.n_deselected = 0
+        self._outcomes = {}
+        self._durations = {}
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def pytest_sessionstart(self, session):
+        root = getattr(self.config, "rootpath", None) or self.config.rootdir
+        self.write({"type": "start", "root": str(root)})
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.write({"type": "collector", "nodeid": report.nodeid, "outcome": "failed"})
+
+    def pytest_deselected(self, items):
+        self.n_deselected += len(items)
+
+    def pytest_collection_finish(self, session):
+        self.n_collected = max(self.n_collected, len(session.items))
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node, ids):
+        self.n_collected = max(self.n_collected, len(ids))
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        # Every worker collects and deselects the same tests.
+        workeroutput = getattr(node, "workeroutput", None) or {}
+        self.n_deselected = max(self.n_deselected, workeroutput.get(N_DESELECTED_KEY, 0))
+
+    def pytest_runtest_logreport(self, report):
+        category = self.config.hook.pytest_report_teststatus(report=report, config=self.config)[0]
+        outcome = self._outcomes.get(report.nodeid, "passed")
+        if report.when == "setup":
+            outcome = category or "passed"
+        elif report.when == "call" and outcome == "passed":
+            outcome = category or "passed"
+        elif report.when == "teardown" and report.failed and outcome == "passed":
+            outcome = "error"
+        self._outcomes[report.nodeid] = outcome
+        self._durations[report.nodeid] = self._durations.get(report.nodeid, 0.0) + (report.duration or 0.0)
+        if report.when == "teardown":
+            self.write({
+                "type"    : "test",
+                "nodeid"  : report.nodeid,
+                "outcome" : outcome,
+                "duration": round(self._durations.pop(report.nodeid), 6),
+            })
+            self._outcomes.pop(report.nodeid)
+            self.summary[outcome] = self.summary.get(outcome, 0) + 1
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        summary = dict(self.summary)
+        summary["total"] = sum(self.summary.values())
+        summary["collected"] = self.n_collected + self.n_deselected
+        self.write({"type": "finish", "exitcode": int(exitstatus), "summary": summary})
+        self.file.close()
+
+
+class WorkerDeselectedCounter:
+    r"""
+    Counter of the deselected tests of a pytest-xdist worker, sent to the controller in the output of the worker.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.config.workeroutput[N_DESELECTED_KEY] = 0
+
+    def pytest_deselected(self, items):
+        self.config.workeroutput[N_DESELECTED_KEY] += len(items)
+
+
+def pytest_configure(config):
+    results_file = os.environ.get(RESULTS_FILE_ENV_VAR)
+    if not results_file:
+        return
+    if hasattr(config, "workerinput"):
+        config.pluginmanager.register(WorkerDeselectedCounter(config), "tac_worker_deselected_counter")
+        return
+    config.pluginmanager.register(ResultsCollector(config, results_file), "tac_results_collector")
@@ -0,0 +1,141 @@
+r"""
+Server of a warm pytest worker. This script is executed by the python interpreter of a venv, so it must only depend
+on the standard library and on the packages installed in that venv (tac is not).
+
+The server pre-imports pytest, its plugins and the modules given as arguments, then reads one json request per line
+on its stdin. For each request, a clean child is forked to run `pytest.main(args)` in the requested cwd and the
+result is written as one json line on the original stdout. The output of pytest is sent to stderr so it can't
+corrupt the protocol.
+"""
+import importlib
+import json
+import os
+import sys
+
+DEFAULT_PRELOAD_MODULES = ["pytest", "_pytest.config", "pytest_cov.plugin", "pytest_jsonreport.plugin"]
+
+
+def preload_modules(modules):
+    loaded = []
+    for module_name in modules:
+        try:
+            importlib.import_module(module_name)
+            loaded.append(module_name)
+        except Exception:
+            pass
+    try:
+        from importlib import metadata
+        metadata.entry_points()
+    except Exception:
+        pass
+    return loaded
+
+
+def read_summary(results_file):
+    r"""
+    Read the summary of the finish record of a results file of the tac results plugin, or of a json report of
+    pytest-json-report.
+    """
+    if results_file is None or not os.path.exists(results_file):
+        return None
+    try:
+        with open(results_file, "r") as f:
+            if results_file.endswith(".json"):
+                return json.load(f).get("summary")
+            summary = None
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("type") == "finish":
+                    summary = record.get("summary")
+            return summary
+    except Exception:
+        return None
+
+
+def set_rlimits(rlimits):
+    r"""
+    Limit the CPU time and the address space of the child, like the `ulimit` wrapper of the sessions run without
+    warm workers.
+    """
+    import resource
+    if rlimits.get("cpu_time") is not None:
+        cpu_time = max(1, int(rlimits["cpu_time"]))
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_time, cpu_time + 1))
+    if rlimits.get("memory") is not None:
+        memory = max(1, int(rlimits["memory"]))
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+
+def run_in_child(request):
+    set_rlimits(request.get("rlimits") or {})
+    import pytest
+    os.chdir(request.get("cwd", os.getcwd()))
+    os.environ.update(request.get("env", {}))
+    # The bytecode prefix is read at the startup of the interpreter, so it must be set explicitly in the child.
+    if "PYTHONPYCACHEPREFIX" in request.get("env", {}):
+        sys.pycache_prefix = request["env"]["PYTHONPYCACHEPREFIX"]
+    # Same for the python path, e.g. the directory of the plugins given with `-p`.
+    python_path = request.get("env", {}).get("PYTHONPATH", "")
+    sys.path[0:0] = [p for p in python_path.split(os.pathsep) if p and p not in sys.path]
+    # The plugins are imported before pytest starts, so pytest warns that it can't rewrite their assertions.
+    args = ["-W", "ignore::pytest.PytestAssertRewriteWarning"] + list(request["args"])
+    exit_code = pytest.main(args)
+    results_file = request.get("results_file")
+    if results_file is not None:
+        results_file = os.path.join(os.getcwd(), results_file)
+    return {"exit_code": int(exit_code), "summary": read_summary(results_file)}
+
+
+def serve(protocol_out):
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        if request.get("cmd") == "exit":
+            break
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                result = run_in_child(request)
+            except BaseException as err:
+                result = {"exit_code": None, "error": repr(err)}
+            with os.fdopen(write_fd, "w") as f:
+                f.write(json.dumps(result))
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd, "r") as f:
+            data = f.read()
+        _, status, rusage = os.wait4(pid, 0)
+        if data:
+            result = json.loads(data)
+        else:
+            result = {"exit_code": None, "error": f"Worker child exited with status {status} without result."}
+        if os.WIFSIGNALED(status):
+            result["signal"] = os.WTERMSIG(status)
+        result["child_pid"] = pid
+        result["cpu_time"] = rusage.ru_utime + rusage.ru_stime
+        protocol_out.write(json.dumps(result) + "\n")
+        protocol_out.flush()
+
+
+def main():
+    # The directory of this script must not shadow the modules of the tested code.
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    loaded = preload_modules(DEFAULT_PRELOAD_MODULES + sys.argv[1:])
+    protocol_out.write(json.dumps({"ready": True, "pid": os.getpid(), "preloaded": loaded}) + "\n")
+    protocol_out.flush()
+    serve(protocol_out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import os
+from typing import Dict, List, Optional
+
+
+class ArtifactManifest:
+    r"""
+    Manifest of the artifacts written during a run. Every artifact has an exact path decided before the run and
+    given to the tools that write it (pytest-cov, pytest-json-report, ...), so finding an artifact never requires
+    walking a directory.
+
+    :param root: The directory in which the artifacts are written.
+    :param filenames: The filename of each artifact by name.
+    """
+    def __init__(self, root: str, filenames: Dict[str, str]):
+        self.root = os.path.abspath(root)
+        self.filenames = dict(filenames)
+
+    def get_path(self, name: str) -> str:
+        r"""
+        Return the path where the given artifact is written, whether it exists or not.
+
+        :param name: The name of the artifact.
+        :return: The path of the artifact.
+        """
+        return os.path.join(self.root, self.filenames[name])
+
+    def get(self, name: str) -> Optional[str]:
+        r"""
+        Return the path of the given artifact if it exists, None otherwise.
+
+        :param name: The name of the artifact.
+        :return: The path of the artifact or None.
+        """
+        path = self.get_path(name)
+        if os.path.exists(path):
+            return path
+        return None
+
+    def add(self, name: str, filename: str) -> "ArtifactManifest":
+        self.filenames[name] = filename
+        return self
+
+    @property
+    def paths(self) -> Dict[str, str]:
+        return {name: self.get_path(name) for name in self.filenames}
+
+    @property
+    def existing_paths(self) -> List[str]:
+        return [path for path in self.paths.values() if os.path.exists(path)]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.filenames
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(root={self.root}, artifacts={list(self.filenames)})"
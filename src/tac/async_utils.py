@@ -0,0 +1,157 @@
+import asyncio
+import os
+import subprocess
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple, Union
+
+from .resource_governor import ProcessOutcome, ResourceLimits, format_cmd, kill_process_group
+
+
+class AsyncLimits:
+    r"""
+    Limits of the number of concurrent operations of each kind run by the asynchronous API of the testers and of the
+    sources, so a single event loop can drive many gradings without starting hundreds of clones, pip installs or
+    pytest sessions at the same time.
+
+    The semaphores are created lazily for each event loop, so the same limits can be used by several loops and be
+    pickled with the sources.
+
+    :param limits: The maximum number of concurrent operations by kind, e.g. `pytest=4`. The kinds not given keep
+        their default limit, see :attr:`DEFAULT_LIMITS`.
+    """
+    CLONE = "clone"
+    PIP = "pip"
+    PYTEST = "pytest"
+    LINT = "lint"
+    DEFAULT_LIMITS = {
+        CLONE : 8,
+        PIP   : 4,
+        PYTEST: os.cpu_count() or 1,
+        LINT  : os.cpu_count() or 1,
+    }
+
+    def __init__(self, **limits: int):
+        self.limits = {**self.DEFAULT_LIMITS, **limits}
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def get_semaphore(self, kind: str) -> asyncio.Semaphore:
+        r"""
+        Get the semaphore limiting the operations of the given kind in the running event loop.
+
+        :param kind: The kind of operations.
+        :return: The semaphore.
+        """
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if kind not in semaphores:
+            semaphores[kind] = asyncio.Semaphore(self.limits.get(kind, 1))
+        return semaphores[kind]
+
+    def __getstate__(self):
+        return {"limits": self.limits}
+
+    def __setstate__(self, state):
+        self.limits = state["limits"]
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({', '.join(f'{k}={v}' for k, v in self.limits.items())})"
+
+
+_default_limits: Optional[AsyncLimits] = None
+
+
+def get_default_async_limits() -> AsyncLimits:
+    r"""
+    Get the limits shared by all the testers and sources that are not given their own.
+    """
+    global _default_limits
+    if _default_limits is None:
+        _default_limits = AsyncLimits()
+    return _default_limits
+
+
+async def run_governed_async(
+        cmd: Union[str, List[str]],
+        limits: Optional[ResourceLimits] = None,
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        capture_output: bool = True,
+) -> ProcessOutcome:
+    r"""
+    Asynchronous version of :func:`tac.resource_governor.run_governed`: run a command in a new process group under
+    the given limits without blocking the event loop. The process group is killed at the timeout, on cancellation
+    and once the command ends. A command that could not be started has the status `crash`.
+
+    :param cmd: The arguments of the command, or a command line run through the shell.
+    :param limits: The limits of the command.
+    :param cwd: The working directory of the command.
+    :param env: The environment of the command. The one of the current process if None.
+    :param capture_output: If True, the stdout and the stderr of the command are captured in the outcome.
+        Otherwise, they are inherited from the current process.
+    :return: The outcome of the command.
+    """
+    limits = limits or ResourceLimits()
+    args = limits.wrap_cmd(cmd) if isinstance(cmd, str) else limits.wrap_args(cmd)
+    pipe = asyncio.subprocess.PIPE if capture_output else None
+    start = time.perf_counter()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=pipe,
+            stderr=asyncio.subprocess.STDOUT if capture_output else None,
+            cwd=cwd,
+            env=env,
+            start_new_session=True,
+        )
+    except OSError as err:
+        return ProcessOutcome.from_os_error(err, cmd, duration=time.perf_counter() - start)
+    timed_out = False
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=limits.timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        kill_process_group(process.pid)
+        stdout, _ = await process.communicate()
+    except asyncio.CancelledError:
+        kill_process_group(process.pid)
+        await process.wait()
+        raise
+    kill_process_group(process.pid)
+    return ProcessOutcome.from_returncode(
+        None if timed_out else process.returncode,
+        timed_out=timed_out,
+        duration=time.perf_counter() - start,
+        stdout=None if stdout is None else stdout.decode("utf8", errors="ignore"),
+        cmd=format_cmd(cmd),
+        shell=isinstance(cmd, str) or limits.has_rlimits,
+    )
+
+
+async def run_cmd_async(
+        cmd: Union[str, List[str]],
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        capture_output: bool = True,
+) -> Tuple[int, Optional[str]]:
+    r"""
+    Run a command in a subprocess without blocking the event loop. On timeout, the process group of the command is
+    killed.
+
+    :param cmd: The arguments of the command, or a command line run through the shell.
+    :param cwd: The working directory of the command.
+    :param env: The environment of the command. The one of the current process if None.
+    :param timeout: The maximum duration of the command in seconds.
+    :param capture_output: If True, the stdout and the stderr of the command are captured and returned.
+        Otherwise, they are inherited from the current process.
+    :return: The return code of the command and its output if captured, None otherwise.
+    :raises subprocess.TimeoutExpired: If the command didn't finish in time.
+    """
+    outcome = await run_governed_async(
+        cmd, limits=ResourceLimits(timeout=timeout), cwd=cwd, env=env, capture_output=capture_output
+    )
+    if outcome.status == ProcessOutcome.TIMEOUT:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return outcome.returncode, outcome.stdout
@@ -0,0 +1,267 @@
+import logging
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .report import Report
+from .report_publisher import ReportPublisher
+from .report_store import ReportStore
+from .source import SourceCode, SourceTests, SourceMasterCode, SourceMasterTests
+from .stage_scheduler import StageScheduler
+from .tester import Tester
+from .timings import Timings
+
+
+SubmissionType = Tuple[SourceCode, SourceTests]
+
+
+def _run_submission(
+        name: str,
+        code_src: SourceCode,
+        tests_src: SourceTests,
+        tester_kwargs: dict,
+        run_kwargs: dict,
+) -> Tuple[str, Optional[Report], Optional[str]]:
+    r"""
+    Grade a single submission. This function is executed in a worker process of the pool, so it must stay at
+    the module level to be picklable.
+
+    :return: The name of the submission, its report and the formatted traceback if the grading crashed.
+    """
+    tester = None
+    try:
+        tester = Tester(code_src, tests_src, **tester_kwargs)
+        tester.run(**run_kwargs)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    report = tester.report if tester is not None else None
+    return name, report, error
+
+
+class BatchTester:
+    r"""
+    Grade a cohort of submissions in parallel. Each submission is a pair (SourceCode, SourceTests) that is graded
+    by its own :class:`Tester` in an isolated report directory named after the submission. The master sources
+    are shared by every submission.
+
+    :param submissions: The submissions to grade. Either a mapping {name: (code_src, tests_src)} or a sequence of
+        pairs (code_src, tests_src), in which case the names are generated from the index of the submission.
+    :param master_code_src: The master code source shared by every submission.
+    :param master_tests_src: The master tests source shared by every submission.
+    :param report_dir: The directory in which the report directory of every submission is created.
+    :param n_workers: The number of worker processes. If None, the number of cpus is used. If n_workers <= 1, the
+        submissions are graded sequentially in the current process.
+    :param tester_kwargs: Additional keyword arguments given to every :class:`Tester`.
+    :param stage_scheduler: If True, the stages of all the submissions are run by a single :class:`StageScheduler`
+        in threads of the current process instead of grading each submission in a worker process. The stages
+        bound by different resources then overlap across the submissions, e.g. the pip installs of some
+        submissions while the tests of others run.
+    :param stage_limits: The maximum number of stages running at the same time by resource class when
+        `stage_scheduler` is True, e.g. `{"pip": 4, "pytest": 32}`.
+    :param report_store: A :class:`ReportStore` or the path of its database in which the report of every
+        submission is saved, the submission name being the student. If True, the database is created in the report
+        directory. The reports are written in batches as the submissions are graded.
+    :param assignment: The assignment of the reports saved in the report store.
+    :param run_id: The run of the reports saved in the report store, e.g. the date of the grading.
+
+    :ivar reports: The report of each submission after :meth:`run`.
+    :ivar errors: The traceback of each submission that crashed during :meth:`run`.
+    """
+    DEFAULT_REPORT_DIRNAME = "batch_report_dir"
+    DEFAULT_SUBMISSION_NAME_PATTERN = "submission_{}"
+    DEFAULT_LOGGING_FUNC = staticmethod(logging.info)
+
+    def __init__(
+            self,
+            submissions: Union[Mapping[str, SubmissionType], Sequence[SubmissionType]],
+            *,
+            master_code_src: Optional[SourceMasterCode] = None,
+            master_tests_src: Optional[SourceMasterTests] = None,
+            report_dir: Optional[str] = None,
+            n_workers: Optional[int] = None,
+            tester_kwargs: Optional[dict] = None,
+            **kwargs
+    ):
+        if not isinstance(submissions, Mapping):
+            submissions = {
+                self.DEFAULT_SUBMISSION_NAME_PATTERN.format(i): submission
+                for i, submission in enumerate(submissions)
+            }
+        self.submissions: Dict[str, SubmissionType] = dict(submissions)
+        self.master_code_src = master_code_src
+        self.master_tests_src = master_tests_src
+        self.report_dir = os.path.abspath(report_dir or os.path.join(os.getcwd(), self.DEFAULT_REPORT_DIRNAME))
+        self.n_workers = n_workers or os.cpu_count()
+        self.tester_kwargs = tester_kwargs or {}
+        self.kwargs = kwargs
+        self.logging_func = kwargs.get("logging_func", self.DEFAULT_LOGGING_FUNC)
+
+        self.reports: Dict[str, Report] = {}
+        self.errors: Dict[str, str] = {}
+        self.report_store = self._init_report_store(kwargs.get("report_store", None))
+
+    def _init_report_store(self, report_store: Optional[Union[bool, str, ReportStore]]) -> Optional[ReportStore]:
+        if report_store is None or report_store is False or isinstance(report_store, ReportStore):
+            return report_store or None
+        if report_store is True:
+            report_store = os.path.join(self.report_dir, ReportStore.DEFAULT_FILENAME)
+        return ReportStore(report_store)
+
+    @property
+    def submission_names(self):
+        return list(self.submissions.keys())
+
+    def get_submission_report_dir(self, name: str) -> str:
+        return os.path.join(self.report_dir, name)
+
+    def get_tester_kwargs(self, name: str) -> dict:
+        tester_kwargs = dict(self.tester_kwargs)
+        tester_kwargs.update(dict(
+            master_code_src=self.master_code_src,
+            master_tests_src=self.master_tests_src,
+            report_dir=self.get_submission_report_dir(name),
+        ))
+        return tester_kwargs
+
+    def _iter_submissions_args(self, run_kwargs: dict):
+        for name, (code_src, tests_src) in self.submissions.items():
+            yield name, code_src, tests_src, self.get_tester_kwargs(name), run_kwargs
+
+    def _collect(self, name: str, report: Optional[Report], error: Optional[str]):
+        if report is None:
+            report = Report(report_filepath=os.path.join(
+                self.get_submission_report_dir(name), Tester.DEFAULT_REPORT_FILENAME
+            ))
+        self.reports[name] = report
+        if self.report_store is not None:
+            self.report_store.add(report, name, self.kwargs.get("assignment", ""), self.kwargs.get("run_id", ""))
+        if error is not None:
+            self.errors[name] = error
+            self.logging_func(f"Submission {name} crashed: {error}")
+        else:
+            self.logging_func(f"Submission {name} graded: {report.grade:.2f}")
+
+    def run(self, **run_kwargs) -> Dict[str, Report]:
+        r"""
+        Grade every submission. A submission that crashes does not stop the batch: its traceback is stored in
+        :attr:`errors` and an empty report is returned for it.
+
+        :param run_kwargs: Keyword arguments given to :meth:`Tester.run` for every submission.
+        :return: The report of each submission by submission name.
+        """
+        os.makedirs(self.report_dir, exist_ok=True)
+        self.reports, self.errors = {}, {}
+        if self.kwargs.get("stage_scheduler", False):
+            self._run_with_stage_scheduler(run_kwargs)
+        elif self.n_workers <= 1:
+            self._run_sequentially(run_kwargs)
+        else:
+            self._run_in_pool(run_kwargs)
+        if self.report_store is not None:
+            self.report_store.flush()
+        self.maybe_merge_traces()
+        return self.reports
+
+    @property
+    def trace_filepath(self) -> Optional[str]:
+        r"""
+        Return the path of the Chrome trace file of the whole batch if the option `trace` of the testers is enabled,
+        None otherwise. Each submission is a process of the trace, so the stragglers stand out in the trace viewer.
+        """
+        if not self.tester_kwargs.get("trace", Tester.DEFAULT_TRACE):
+            return None
+        return os.path.join(self.report_dir, Tester.TRACE_FILENAME)
+
+    def maybe_merge_traces(self) -> Optional[str]:
+        if self.trace_filepath is None:
+            return None
+        trace_filepaths = [
+            os.path.join(self.get_submission_report_dir(name), Tester.TRACE_FILENAME) for name in self.submission_names
+        ]
+        return Timings.merge_traces(trace_filepaths, self.trace_filepath)
+
+    def _run_sequentially(self, run_kwargs: dict):
+        for name, code_src, tests_src, tester_kwargs, _ in self._iter_submissions_args(run_kwargs):
+            try:
+                # Like the workers of the pool, each tester gets its own copy of the sources, so the master
+                # sources set up for a submission don't leak into the next one.
+                code_src, tests_src, tester_kwargs = deepcopy((code_src, tests_src, tester_kwargs))
+            except Exception:
+                self._collect(name, None, traceback.format_exc())
+                continue
+            self._collect(*_run_submission(name, code_src, tests_src, tester_kwargs, run_kwargs))
+
+    def _run_in_pool(self, run_kwargs: dict):
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            futures = {
+                executor.submit(_run_submission, *args): args[0]
+                for args in self._iter_submissions_args(run_kwargs)
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    self._collect(*future.result())
+                except Exception:
+                    self._collect(name, None, traceback.format_exc())
+        self.reports = {name: self.reports[name] for name in self.submission_names}
+
+    def _run_with_stage_scheduler(self, run_kwargs: dict):
+        testers, graphs = {}, []
+        for name, code_src, tests_src, tester_kwargs, _ in self._iter_submissions_args(run_kwargs):
+            try:
+                # Each tester gets its own copy of the sources, like the workers of the pool, since the master
+                # sources are set up in the report directory of every submission.
+                code_src, tests_src, tester_kwargs = deepcopy((code_src, tests_src, tester_kwargs))
+                testers[name] = Tester(code_src, tests_src, **tester_kwargs)
+                graphs.append(testers[name].get_stage_graph(**run_kwargs))
+            except Exception:
+                testers.pop(name, None)
+                self._collect(name, None, traceback.format_exc())
+        scheduler = StageScheduler(self.kwargs.get("stage_limits", None), logging_func=self.logging_func)
+        for (name, tester), graph_run in zip(testers.items(), scheduler.run(graphs)):
+            tester.maybe_save_trace()
+            self._collect(name, tester.report, None if graph_run.ok else graph_run.format_errors())
+        self.reports = {name: self.reports[name] for name in self.submission_names}
+
+    def publish_reports(
+            self,
+            repo_url: str,
+            repo_branch: str = ReportPublisher.DEFAULT_BRANCH,
+            dst_pattern: str = "{name}/{filename}",
+            **kwargs
+    ) -> List[str]:
+        r"""
+        Publish the report files of the submissions to a git repo in a few commits and a single push with a
+        :class:`ReportPublisher`. The submissions without a report file, e.g. the ones that crashed before it was
+        saved, are skipped.
+
+        :param repo_url: The url of the repo.
+        :param repo_branch: The branch of the repo.
+        :param dst_pattern: The pattern of the path of the reports in the repo, formatted with the `name` of the
+            submission and the `filename` of the report.
+        :param kwargs: Additional keyword arguments given to the :class:`ReportPublisher`.
+        :return: The shas of the published commits.
+        """
+        kwargs.setdefault("logging_func", self.logging_func)
+        publisher = ReportPublisher(repo_url, repo_branch, **kwargs)
+        for name, report in self.reports.items():
+            if report.report_filepath is None or not os.path.exists(report.report_filepath):
+                continue
+            filename = os.path.basename(report.report_filepath)
+            publisher.add(report.report_filepath, dst_pattern.format(name=name, filename=filename))
+        return publisher.publish()
+
+    def get_grades(self) -> Dict[str, float]:
+        return {name: report.grade for name, report in self.reports.items()}
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}("
+            f"n_submissions={len(self.submissions)}, "
+            f"n_workers={self.n_workers}, "
+            f"report_dir={self.report_dir}"
+            f")"
+        )
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from typing import List, Optional
+
+from . import utils
+
+
+class GitMirrorCache:
+    r"""
+    Node-level cache of bare mirrors of git repos, identified by their url. The sources cloned from the same url,
+    e.g. the master code and tests of every submission of a cohort or the code and the tests of the same student
+    repo, are cloned locally from the mirror with `git clone --shared`, which borrows its objects instead of
+    copying them, so a repo is downloaded only once per node.
+
+    A mirror is refreshed at most once per batch: the first source of a batch asking for a branch compares the head
+    of the remote branch (`git ls-remote`) with the one of the mirror and fetches only if it moved. The batch is
+    identified by `batch_id` which is shared by the copies of the cache sent to the workers of a batch.
+
+    The mirrors are stored in `root/<key>.git` with a `root/<key>.json` metadata file. The accesses to a mirror are
+    synchronized between processes with a lock file `root/<key>.lock`.
+
+    :param root: The directory of the cache.
+    :param batch_id: The identifier of the current batch. A new one is generated if None.
+    """
+    DEFAULT_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "tac", "git_mirrors")
+    ROOT_ENV_VAR = "TAC_GIT_MIRROR_DIR"
+    MIRROR_PATTERN = "{}.git"
+    META_PATTERN = "{}.json"
+    LOCK_PATTERN = "{}.lock"
+
+    def __init__(self, root: Optional[str] = None, batch_id: Optional[str] = None, **kwargs):
+        self.root = os.path.abspath(root or os.environ.get(self.ROOT_ENV_VAR, self.DEFAULT_ROOT))
+        self.batch_id = batch_id or uuid.uuid4().hex
+        self.kwargs = kwargs
+        self.fetches = 0
+        self.skipped_fetches = 0
+
+    @staticmethod
+    def make_key(repo_url: str) -> str:
+        if os.path.isdir(repo_url):
+            repo_url = os.path.abspath(repo_url)
+        return hashlib.sha256(repo_url.rstrip("/").encode("utf-8")).hexdigest()[:32]
+
+    def get_mirror_path(self, repo_url: str) -> str:
+        return os.path.join(self.root, self.MIRROR_PATTERN.format(self.make_key(repo_url)))
+
+    def _read_meta(self, key: str) -> dict:
+        try:
+            with open(os.path.join(self.root, self.META_PATTERN.format(key)), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_meta(self, key: str, meta: dict):
+        meta_path = os.path.join(self.root, self.META_PATTERN.format(key))
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump(meta, f, indent=4)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @staticmethod
+    def get_local_head(mirror_path: str, repo_branch: str) -> Optional[str]:
+        import git
+        try:
+            return git.Repo(mirror_path).git.rev_parse(f"refs/heads/{repo_branch}")
+        except Exception:
+            return None
+
+    def update(self, repo_url: str, repo_branch: str) -> str:
+        r"""
+        Create the mirror of the repo if it doesn't exist or refresh it if it was not yet refreshed during the
+        current batch and the head of the remote branch moved.
+
+        :param repo_url: The url of the repo.
+        :param repo_branch: The branch to keep up to date.
+        :return: The path of the mirror.
+        """
+        import git
+        key = self.make_key(repo_url)
+        mirror_path = self.get_mirror_path(repo_url)
+        with utils.file_lock(os.path.join(self.root, self.LOCK_PATTERN.format(key))):
+            meta = self._read_meta(key)
+            refreshed = meta.get("refreshed", {})
+            if not os.path.exists(mirror_path):
+                tmp_mirror_path = f"{mirror_path}.tmp"
+                utils.try_rmtree(tmp_mirror_path, ignore_errors=True)
+                git.Repo.clone_from(repo_url, tmp_mirror_path, mirror=True)
+                os.replace(tmp_mirror_path, mirror_path)
+                self.fetches += 1
+            elif refreshed.get(repo_branch) != self.batch_id:
+                remote_head = utils.get_remote_head(repo_url, repo_branch)
+                if remote_head is None or remote_head != self.get_local_head(mirror_path, repo_branch):
+                    git.Repo(mirror_path).git.fetch("--prune", "origin")
+                    self.fetches += 1
+                else:
+                    self.skipped_fetches += 1
+            refreshed[repo_branch] = self.batch_id
+            self._write_meta(key, {"url": repo_url, "refreshed": refreshed})
+        return mirror_path
+
+    def clone(
+            self,
+            repo_url: str,
+            repo_branch: str,
+            dst: str,
+            sparse_checkout_paths: Optional[List[str]] = None,
+    ):
+        r"""
+        Clone the branch of the repo from its mirror to the given location, or update the clone if it exists.
+
+        :param repo_url: The url of the repo.
+        :param repo_branch: The branch to check out.
+        :param dst: The location of the clone.
+        :param sparse_checkout_paths: The directories to check out in sparse cone mode. All the files are checked
+            out if None.
+        :return: The :class:`git.Repo` of the clone.
+        """
+        import git
+        mirror_path = self.update(repo_url, repo_branch)
+        if os.path.exists(dst):
+            repo = git.Repo(dst)
+            repo.git.fetch("origin", repo_branch)
+        else:
+            repo = git.Repo.clone_from(mirror_path, dst, shared=True, no_checkout=True, branch=repo_branch)
+            if sparse_checkout_paths is not None:
+                repo.git.sparse_checkout("init", "--cone")
+                repo.git.sparse_checkout("set", *sparse_checkout_paths)
+        repo.git.checkout("-B", repo_branch, f"refs/remotes/origin/{repo_branch}")
+        return repo
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        return self
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(root={self.root}, batch_id={self.batch_id}, "
+            f"fetches={self.fetches}, skipped_fetches={self.skipped_fetches})"
+        )
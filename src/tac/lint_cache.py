@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import List, Optional
+
+
+class LintCache:
+    r"""
+    Persistent cache of the lint results of single files. An entry is identified by the hash of the content of the
+    file, the name and version of the linter and its options, so byte-identical files (untouched starter files,
+    copied tests, resubmissions) are linted only once across a cohort.
+
+    The entries are json files stored in `root/<key[:2]>/<key>.json`. They are written atomically, so several
+    graders can share the same cache.
+
+    :param root: The directory of the cache.
+    """
+    DEFAULT_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "tac", "lint")
+    ROOT_ENV_VAR = "TAC_LINT_CACHE_DIR"
+
+    def __init__(self, root: Optional[str] = None, **kwargs):
+        self.root = os.path.abspath(root or os.environ.get(self.ROOT_ENV_VAR, self.DEFAULT_ROOT))
+        self.kwargs = kwargs
+        self._memory = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(filepath: str, linter: str, options: List[str]) -> str:
+        r"""
+        Make the key of the lint result of a file.
+
+        :param filepath: The path of the linted file.
+        :param linter: The name and the version of the linter.
+        :param options: The options of the linter.
+        :return: The key of the entry.
+        """
+        content_hash = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                content_hash.update(chunk)
+        context = json.dumps(
+            {"linter": linter, "options": list(options), "python": sys.version_info[:2]}, sort_keys=True
+        )
+        return hashlib.sha256(f"{content_hash.hexdigest()}:{context}".encode("utf-8")).hexdigest()
+
+    def get_entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._memory.get(key)
+        if entry is None:
+            try:
+                with open(self.get_entry_path(key), "r") as f:
+                    entry = json.load(f)
+                self._memory[key] = entry
+            except (FileNotFoundError, ValueError):
+                entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def set(self, key: str, entry: dict) -> "LintCache":
+        self._memory[key] = entry
+        entry_path = self.get_entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, entry_path)
+        return self
+
+    def get_fingerprint(self) -> str:
+        r"""
+        Return the fingerprint of the cache for the fingerprint of a run, e.g. of a test case using it. The lint
+        results don't depend on the content of the cache, so neither does its fingerprint.
+        """
+        return self.__class__.__name__
+
+    def clear(self):
+        from .utils import try_rmtree
+        self._memory = {}
+        try_rmtree(self.root)
+        return self
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(root={self.root}, hits={self.hits}, misses={self.misses})"
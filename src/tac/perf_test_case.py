@@ -1,17 +1,23 @@
+import json
+import os
+import subprocess
 import sys
-import re
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 import numpy as np
 import pycodestyle
-from pylint.lint import Run
+from pylint import __version__ as pylint_version
+
+from .lint_cache import LintCache
 
 
 class TestResult:
-    def __init__(self, name: str, percent_value: float, message: str = ""):
+    def __init__(self, name: str, percent_value: float, message: str = "", details: Optional[dict] = None):
         self.name = name
         self.percent_value = percent_value
         self.message = message
+        self.details = details or {}
     
     def __str__(self):
         _str = f'[{self.name}: {self.percent_value:.2f} %'
@@ -46,28 +52,200 @@ class PEP8TestCasePyCodeStyle(TestCase):
 
 
 class PEP8TestCasePylint(TestCase):
+    r"""
+    Score the PEP8 compliance of a directory with pylint. The messages and the statistics are collected through a
+    pylint reporter, so nothing is printed nor captured from the standard output. Each pylint run has its own
+    interpreter because pylint relies on global state (sys.path, astroid cache), which makes this test case safe
+    to run from several threads without serializing them.
+    
+    The result details contain the number of messages by symbol, the statistics and the score of each file.
+    
+    :param name: The name of the test case.
+    :param files_dir: The directory to lint.
+    :param lint_cache: If given, only the files whose content is not in the cache are linted.
+    :param jobs: The number of pylint worker processes.
+    """
     MAX_LINE_LENGTH = 120
+    STATS_KEYS = ("convention", "error", "fatal", "info", "refactor", "statement", "warning")
+    DEFAULT_JOBS = 1
+    RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_pylint_runner.py")
     
-    def __init__(self, name: str, files_dir: str):
+    def __init__(
+            self,
+            name: str,
+            files_dir: str,
+            lint_cache: Optional[LintCache] = None,
+            jobs: Optional[int] = None,
+    ):
         self.name = name
         self.files_dir = files_dir
-
-    def _run_pylint(self):
-        output = StringIO()
-        sys.stdout = output
-        try:
-            Run([self.files_dir, f'--max-line-length={self.MAX_LINE_LENGTH}', '--exit-zero'])
-        except SystemExit:
-            pass
-        sys.stdout = sys.__stdout__
-        pylint_output = output.getvalue()
-        match = re.search(r"Your code has been rated at ([\d\.]+)/10", pylint_output)
-        if match:
-            score = float(match.group(1))
-            percent_value = 10 * score
-            return TestResult(self.name, percent_value, message=None)
-        else:
-            return None, None
+        self.lint_cache = lint_cache
+        self.jobs = jobs or self.DEFAULT_JOBS
+    
+    @property
+    def options(self) -> List[str]:
+        return [f'--max-line-length={self.MAX_LINE_LENGTH}']
+    
+    @property
+    def linter_id(self) -> str:
+        return f"pylint=={pylint_version}"
+    
+    def get_python_files(self) -> List[str]:
+        filepaths = []
+        for root, dirs, files in os.walk(self.files_dir):
+            dirs[:] = [d for d in dirs if d != "__pycache__"]
+            filepaths.extend(os.path.abspath(os.path.join(root, f)) for f in files if f.endswith(".py"))
+        return sorted(filepaths)
+    
+    @classmethod
+    def compute_score(cls, stats: Dict[str, int]) -> Optional[float]:
+        r"""
+        Compute the pylint score out of 10 of the given statistics with the default evaluation of pylint.
+        
+        :param stats: The number of messages by category and the number of statements.
+        :return: The score or None if there is no statement.
+        """
+        if stats.get("statement", 0) == 0:
+            return None
+        if stats.get("fatal", 0):
+            return 0.0
+        penalty = 5 * stats.get("error", 0) + stats.get("warning", 0) + stats.get("refactor", 0)
+        penalty += stats.get("convention", 0)
+        return max(0.0, 10.0 - (float(penalty) / stats["statement"]) * 10)
+    
+    def run(self) -> TestResult:
+        return self.run_many(
+            self.name, [self.files_dir], lint_cache=self.lint_cache, jobs=self.jobs
+        )[0]
+    
+    @classmethod
+    def run_many(
+            cls,
+            name: str,
+            files_dirs: List[str],
+            lint_cache: Optional[LintCache] = None,
+            jobs: Optional[int] = None,
+    ) -> List[TestResult]:
+        r"""
+        Score several directories at once. Each directory is linted by its own pylint run, like a directory linted
+        alone, and the runs of the directories are executed in parallel.
+        
+        :param name: The name of the test cases.
+        :param files_dirs: The directories to lint.
+        :param lint_cache: If given, only the files whose content is not in the cache are linted.
+        :param jobs: The number of pylint worker processes of each run.
+        :return: The result of each directory.
+        """
+        test_cases = [cls(name, d, lint_cache=lint_cache, jobs=jobs) for d in files_dirs]
+        
+        def run_test_case(test_case: "PEP8TestCasePylint") -> TestResult:
+            return test_case.make_result(test_case.get_entries(test_case.get_python_files()))
+        
+        with ThreadPoolExecutor(max_workers=max(1, len(test_cases))) as executor:
+            return list(executor.map(run_test_case, test_cases))
+    
+    def get_entries(self, filepaths: List[str]) -> Dict[str, dict]:
+        r"""
+        Get the statistics and the message counts of the given files from the lint cache if any, linting the
+        missing ones.
+        """
+        if self.lint_cache is None:
+            return self._lint_files(filepaths)
+        entries, missing_keys = {}, {}
+        for filepath in filepaths:
+            key = self.lint_cache.make_key(filepath, self.linter_id, self.options)
+            entry = self.lint_cache.get(key)
+            if entry is None:
+                missing_keys[filepath] = key
+            else:
+                entries[filepath] = entry
+        if missing_keys:
+            for filepath, entry in self._lint_files(list(missing_keys.keys())).items():
+                self.lint_cache.set(missing_keys[filepath], entry)
+                entries[filepath] = entry
+        return entries
+    
+    @staticmethod
+    def _split_by_module_name(filepaths: List[str]) -> List[List[str]]:
+        r"""
+        Split the files in groups without two modules of the same name, since pylint indexes its statistics by
+        module name.
+        """
+        groups, names = [], []
+        for filepath in filepaths:
+            name = os.path.splitext(os.path.basename(filepath))[0]
+            for group, group_names in zip(groups, names):
+                if name not in group_names:
+                    group.append(filepath)
+                    group_names.add(name)
+                    break
+            else:
+                groups.append([filepath])
+                names.append({name})
+        return groups
+    
+    def _lint_files(self, filepaths: List[str]) -> Dict[str, dict]:
+        r"""
+        Lint the given files and return the statistics and the message counts of each file.
+        """
+        entries = {
+            path: {"stats": {k: 0 for k in self.STATS_KEYS}, "messages": {}}
+            for path in filepaths
+        }
+        for group in self._split_by_module_name(filepaths):
+            result = self._run_pylint([*group, *self.options, f"--jobs={min(self.jobs, len(group))}"])
+            for path, module_stats in result["stats"].items():
+                if path in entries:
+                    entries[path]["stats"] = {k: int(module_stats.get(k, 0)) for k in self.STATS_KEYS}
+            for message in result["messages"]:
+                if message["path"] in entries:
+                    messages = entries[message["path"]]["messages"]
+                    messages[message["symbol"]] = messages.get(message["symbol"], 0) + 1
+        return entries
+    
+    def _run_pylint(self, args: List[str]) -> dict:
+        r"""
+        Run pylint with the given arguments in a new interpreter.
+        
+        :return: The statistics of each linted file and the messages.
+        """
+        process = subprocess.run(
+            [sys.executable, self.RUNNER_SCRIPT, *args],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            encoding="utf8",
+            errors="ignore",
+        )
+        lines = process.stdout.strip().splitlines()
+        if process.returncode != 0 or not lines:
+            raise RuntimeError(
+                f"pylint failed on {self.files_dir} with the return code {process.returncode}: {process.stderr}"
+            )
+        return json.loads(lines[-1])
+    
+    def make_result(self, entries: Dict[str, dict]) -> TestResult:
+        r"""
+        Recombine the statistics of the files into the score that pylint gives to the whole directory. Note that
+        the checks spanning several modules (e.g. duplicate-code) only see the files of the directory linted in the
+        same run.
+        """
+        stats = {k: sum(e["stats"].get(k, 0) for e in entries.values()) for k in self.STATS_KEYS}
+        message_counts = {}
+        for entry in entries.values():
+            for symbol, count in entry["messages"].items():
+                message_counts[symbol] = message_counts.get(symbol, 0) + count
+        file_scores = {path: self.compute_score(entry["stats"]) for path, entry in entries.items()}
+        score = self.compute_score(stats)
+        # pylint reports its score with two decimals. A directory without statements has nothing to penalize.
+        percent_value = 100.0 if score is None else 10 * round(score, 2)
+        details = {
+            "stats"         : stats,
+            "message_counts": message_counts,
+            "file_scores"   : file_scores,
+        }
+        return TestResult(self.name, percent_value, message=None, details=details)
 
 
 PEP8TestCase = PEP8TestCasePylint
@@ -0,0 +1,90 @@
+import json
+import os
+from collections import Counter
+from typing import List, Optional
+
+
+class PytestResults:
+    r"""
+    Reader and writer of the results files streamed by the tac pytest plugin (`_pytest_results_plugin`): one compact
+    json record per line instead of a json report holding the whole session.
+
+    The results are loaded as a dict with the same keys as the json report of pytest-json-report: `root`,
+    `exitcode`, `collectors`, `tests` (with the `nodeid`, the `outcome` and the `duration` of each test) and
+    `summary` (the number of tests by outcome, `total` and `collected`), so a json report of pytest-json-report
+    can be read the same way.
+    """
+    PLUGIN_NAME = "_pytest_results_plugin"
+    FILE_ENV_VAR = "TAC_RESULTS_FILE"
+    JSON_REPORT_EXT = ".json"
+
+    @staticmethod
+    def compute_summary(tests: List[dict], collected: Optional[int] = None) -> dict:
+        summary = dict(Counter(test["outcome"] for test in tests))
+        summary["total"] = len(tests)
+        summary["collected"] = len(tests) if collected is None else collected
+        return summary
+
+    @classmethod
+    def load(cls, path: str) -> dict:
+        r"""
+        Load a results file or a json report of pytest-json-report.
+
+        If the session was interrupted before its end, e.g. killed at a resource limit, the summary is computed
+        from the tests that finished and the exit code is None.
+
+        :param path: The path of the file.
+        :return: The results.
+        """
+        if path.endswith(cls.JSON_REPORT_EXT):
+            with open(path, "r") as f:
+                return json.load(f)
+        results = {"root": "", "exitcode": None, "collectors": [], "tests": [], "summary": None}
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line of an interrupted session may be truncated.
+                    continue
+                record_type = record.pop("type", None)
+                if record_type == "start":
+                    results["root"] = record.get("root", "")
+                elif record_type == "collector":
+                    results["collectors"].append(record)
+                elif record_type == "test":
+                    results["tests"].append(record)
+                elif record_type == "finish":
+                    results["exitcode"] = record.get("exitcode")
+                    results["summary"] = record.get("summary")
+        if results["summary"] is None:
+            results["summary"] = cls.compute_summary(results["tests"])
+        return results
+
+    @classmethod
+    def save(cls, path: str, results: dict) -> str:
+        r"""
+        Save results in the format of the results files, e.g. after merging the results of reused tests.
+
+        :param path: The path of the file.
+        :param results: The results, as returned by :meth:`load`.
+        :return: The path of the file.
+        """
+        if path.endswith(cls.JSON_REPORT_EXT):
+            with open(path, "w") as f:
+                json.dump(results, f, indent=4)
+            return path
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            records = [{"type": "start", "root": results.get("root", "")}]
+            records += [{"type": "collector", **collector} for collector in results.get("collectors", [])]
+            records += [{"type": "test", **test} for test in results.get("tests", [])]
+            records.append({
+                "type"    : "finish",
+                "exitcode": results.get("exitcode"),
+                "summary" : results.get("summary") or cls.compute_summary(results.get("tests", [])),
+            })
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, path)
+        return path
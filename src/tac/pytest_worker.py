@@ -0,0 +1,241 @@
+import atexit
+import json
+import os
+import select
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class PytestWorkerError(RuntimeError):
+    pass
+
+
+class PytestWorker:
+    r"""
+    Long-lived pytest worker attached to a venv. The worker process pre-imports pytest, its plugins and the given
+    modules once, then forks a clean child for every pytest session it runs, so the sessions don't pay the
+    interpreter startup, the plugins discovery and the imports of the heavy requirements anymore.
+
+    The requests and the results are exchanged as json lines over the stdin and stdout pipes of the worker.
+    Warm workers rely on `os.fork` and are therefore only supported on POSIX systems.
+
+    :param python_path: The python interpreter of the venv.
+    :param preload_modules: Additional modules to import in the worker before forking, e.g. the heavy requirements
+        of the tested code.
+    """
+    SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_pytest_worker_server.py")
+
+    def __init__(self, python_path: str, preload_modules: Optional[List[str]] = None):
+        self.python_path = python_path
+        self.preload_modules = list(preload_modules or [])
+        self.process: Optional[subprocess.Popen] = None
+        self.preloaded: List[str] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_supported() -> bool:
+        return hasattr(os, "fork") and sys.platform != "win32"
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> "PytestWorker":
+        if self.is_alive:
+            return self
+        self.process = subprocess.Popen(
+            [self.python_path, self.SERVER_SCRIPT, *self.preload_modules],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            encoding="utf8",
+            start_new_session=True,
+        )
+        ready = self._read_result(timeout=None)
+        self.preloaded = ready.get("preloaded", [])
+        return self
+
+    def _read_result(self, timeout: Optional[float]) -> dict:
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            self.kill()
+            raise TimeoutError(f"The pytest worker {self.python_path} did not answer in {timeout} seconds.")
+        line = self.process.stdout.readline()
+        if not line:
+            self.kill()
+            raise PytestWorkerError(f"The pytest worker {self.python_path} exited unexpectedly.")
+        return json.loads(line)
+
+    def run(
+            self,
+            args: List[str],
+            cwd: str,
+            results_file: Optional[str] = None,
+            timeout: Optional[float] = None,
+            env: Optional[Dict[str, str]] = None,
+            rlimits: Optional[Dict[str, Optional[int]]] = None,
+    ) -> dict:
+        r"""
+        Run a pytest session in a child forked from the warm worker.
+
+        :param args: The arguments of pytest.
+        :param cwd: The directory from which pytest is run.
+        :param results_file: The results file written by the tac results plugin or the json report written by
+            pytest-json-report, if any. Its summary is sent back with the result.
+        :param timeout: The maximum duration of the session in seconds. On expiry, the worker is killed.
+        :param env: Environment variables set in the child before running pytest.
+        :param rlimits: The CPU time in seconds (`cpu_time`) and the address space in bytes (`memory`) the child is
+            limited to.
+        :return: A dict with the exit code of pytest, the summary of the results file and the signal that killed the
+            child, if any.
+        """
+        with self._lock:
+            self.start()
+            request = {
+                "args"            : list(args),
+                "cwd"             : cwd,
+                "results_file"    : results_file,
+                "env"             : env or {},
+                "rlimits"         : rlimits or {},
+            }
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            return self._read_result(timeout=timeout)
+
+    def kill(self):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        self.process = None
+
+    def close(self):
+        if not self.is_alive:
+            self.process = None
+            return
+        try:
+            self.process.stdin.write(json.dumps({"cmd": "exit"}) + "\n")
+            self.process.stdin.flush()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+        self.process = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(python_path={self.python_path}, alive={self.is_alive})"
+
+
+class PytestWorkerPool:
+    r"""
+    Pool of warm pytest workers by venv and preloaded modules. A worker runs one session at a time, so each session
+    checks out an idle worker of its venv with :meth:`acquire` and a new worker is started when all of them are busy:
+    the concurrent sessions of the same venv, e.g. the tests and the master tests of a submission, run in parallel
+    instead of queuing behind a single worker. The venvs are identified by their real path, so the venvs linked from
+    the same entry of a :class:`tac.VenvCache` share their workers.
+
+    :param max_idle_workers: The maximum number of idle workers kept alive. Beyond it, the least recently used idle
+        workers are closed. Defaults to the number of CPUs.
+    """
+    def __init__(self, max_idle_workers: Optional[int] = None):
+        self.max_idle_workers = max_idle_workers if max_idle_workers is not None else (os.cpu_count() or 1)
+        self.workers: Dict[Tuple[str, Tuple[str, ...]], List[PytestWorker]] = {}
+        self.idle: List[Tuple[Tuple[str, Tuple[str, ...]], PytestWorker]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(venv_path: str, preload_modules: Optional[List[str]] = None) -> Tuple[str, Tuple[str, ...]]:
+        return os.path.realpath(venv_path), tuple(sorted(preload_modules or []))
+
+    @contextmanager
+    def acquire(
+            self,
+            venv_path: str,
+            python_path: str,
+            preload_modules: Optional[List[str]] = None,
+    ) -> Iterator[PytestWorker]:
+        r"""
+        Check out a worker of the venv for one session. The worker is given back to the pool at the exit of the
+        context.
+
+        :param venv_path: The path of the venv.
+        :param python_path: The python interpreter of the venv.
+        :param preload_modules: The additional modules preloaded by the worker.
+        :return: A context manager yielding the worker.
+        """
+        key = self.get_key(venv_path, preload_modules)
+        with self._lock:
+            indexes = [i for i, (idle_key, _) in enumerate(self.idle) if idle_key == key]
+            if indexes:
+                _, worker = self.idle.pop(indexes[-1])
+            else:
+                real_python_path = os.path.join(key[0], os.path.relpath(python_path, venv_path))
+                worker = PytestWorker(real_python_path, preload_modules=preload_modules)
+                self.workers.setdefault(key, []).append(worker)
+        try:
+            yield worker
+        finally:
+            self._release(key, worker)
+
+    def _release(self, key: Tuple[str, Tuple[str, ...]], worker: PytestWorker):
+        to_close = []
+        with self._lock:
+            if worker not in self.workers.get(key, []):
+                # The pool was closed during the session.
+                to_close.append(worker)
+            elif not worker.is_alive:
+                # The worker died or was killed during the session, e.g. at its timeout.
+                self._remove(key, worker)
+                to_close.append(worker)
+            else:
+                self.idle.append((key, worker))
+            while len(self.idle) > self.max_idle_workers:
+                old_key, old_worker = self.idle.pop(0)
+                self._remove(old_key, old_worker)
+                to_close.append(old_worker)
+        for old_worker in to_close:
+            old_worker.close()
+
+    def _remove(self, key: Tuple[str, Tuple[str, ...]], worker: PytestWorker):
+        self.workers[key].remove(worker)
+        if not self.workers[key]:
+            self.workers.pop(key)
+
+    def close(self):
+        with self._lock:
+            workers = [worker for key_workers in self.workers.values() for worker in key_workers]
+            self.workers = {}
+            self.idle = []
+        for worker in workers:
+            worker.close()
+
+    def __len__(self):
+        return sum(len(workers) for workers in self.workers.values())
+
+
+_default_pool: Optional[PytestWorkerPool] = None
+
+
+def get_default_pool() -> PytestWorkerPool:
+    r"""
+    Get the pool of warm pytest workers shared by all the testers of the current process.
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = PytestWorkerPool()
+        atexit.register(_default_pool.close)
+    return _default_pool
+
+
+def split_options(options: List[str]) -> List[str]:
+    r"""
+    Split the pytest options formatted for a shell command, e.g. "-p no:cacheprovider", into a list of arguments.
+    """
+    return [arg for option in options for arg in shlex.split(option)]
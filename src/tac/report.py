@@ -24,6 +24,10 @@ class Report:
     :type grade_max: float
     :keyword grade_norm_func: The function to use to normalize the grade.
     :type grade_norm_func: Callable[[float], float]
+    :keyword metadata: Additional information saved with the report, e.g. the fingerprints of the run.
+    :type metadata: dict
+    :keyword timings: The wall-clock and CPU times of the stages of the run that produced the report.
+    :type timings: dict
 
     Note: The grade is calculated as follows:
         grade = (grade_max - grade_min_value) * (weighted sum of values - grade_min) / (grade_max - grade_min) + grade_min_value
@@ -39,6 +43,10 @@ class Report:
     :vartype grade_max: float
     :ivar grade_norm_func: The function to use to normalize the grade.
     :vartype grade_norm_func: Callable[[float], float]
+    :ivar metadata: Additional information saved with the report.
+    :vartype metadata: dict
+    :ivar timings: The wall-clock and CPU times of the stages of the run that produced the report.
+    :vartype timings: dict
     :ivar args: Additional positional arguments.
     :vartype args: tuple
     :ivar kwargs: Additional keyword arguments.
@@ -57,6 +65,8 @@ class Report:
         self.grade_min_value = kwargs.pop("grade_min_value", self.DEFAULT_GRADE_MIN_VALUE)
         self.grade_max = kwargs.pop("grade_max", self.DEFAULT_GRADE_MAX)
         self.grade_norm_func: Optional[Callable[[float], float]] = kwargs.pop("grade_norm_func", None)
+        self.metadata: dict = kwargs.pop("metadata", {})
+        self.timings: dict = kwargs.pop("timings", {})
         self.args = args
         self.kwargs = kwargs
         
@@ -81,6 +91,8 @@ class Report:
             "report_filepath": self.report_filepath,
             "args"           : self.args,
             "kwargs"         : self.kwargs,
+            "metadata"       : self.metadata,
+            "timings"        : self.timings,
         }
     
     def set_state(self, state: dict):
@@ -88,6 +100,8 @@ class Report:
         self.report_filepath = state["report_filepath"]
         self.args = state["args"]
         self.kwargs = state["kwargs"]
+        self.metadata = state.get("metadata", {})
+        self.timings = state.get("timings", {})
     
     def add(self, key, value, weight=1.0):
         self.data[key] = {self.VALUE_KEY: value, self.WEIGHT_KEY: weight}
@@ -146,11 +160,12 @@ class Report:
         )
     
     def get_grade(self) -> float:
-        if self.is_normalized:
-            report = self
+        # Same as the weighted sum of the normalized report, without instantiating it.
+        total_weight = sum([self.get_weight(k) for k in self.keys()])
+        if np.isclose(total_weight, 1.0):
+            grade = sum([self.get_weighted(k) for k in self.keys()])
         else:
-            report = self.get_normalized()
-        grade = sum([report.get_weighted(k) for k in report.keys()])
+            grade = sum([self.get_value(k) * (self.get_weight(k) / total_weight) for k in self.keys()])
         grade_scale = self.grade_max - self.grade_min
         grade = (self.grade_max - self.grade_min_value) * (grade - self.grade_min) / grade_scale + self.grade_min_value
         if self.grade_norm_func is not None:
@@ -0,0 +1,270 @@
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from .report import Report
+
+
+WeightsType = Union[Mapping[str, float], Sequence[float], np.ndarray]
+
+
+class ReportBatch:
+    r"""
+    Values and weights of the reports of a cohort held as arrays of shape (n_reports, n_keys), so the grades of the
+    whole cohort are computed in one vectorized pass instead of report by report, and the weights can be changed
+    after the fact without rerunning any test or instantiating any report.
+
+    The grades are computed like :meth:`Report.get_grade`: the weighted sum of the values with the weights
+    normalized by report, scaled from [grade_min, grade_max] to [grade_min_value, grade_max] and normalized by
+    `grade_norm_func`. A key missing from a report is ignored by the grade of this report, whatever its weight.
+
+    :param values: The values of the reports, of shape (n_reports, n_keys).
+    :param weights: The weights of the reports, of shape (n_reports, n_keys), or of the keys, of shape (n_keys,).
+    :param keys: The keys of the columns, e.g. `code_coverage`.
+    :param names: The names of the reports, e.g. the students. Defaults to the indexes of the reports.
+    :param mask: Whether each key is in each report, of shape (n_reports, n_keys). Defaults to the values that are
+        not NaN.
+    :param kwargs: Additional keyword arguments.
+
+    :keyword grade_min: The minimum grade of the reports.
+    :type grade_min: float
+    :keyword grade_min_value: The value of the reports when the grade is the minimum.
+    :type grade_min_value: float
+    :keyword grade_max: The maximum grade of the reports.
+    :type grade_max: float
+    :keyword grade_norm_func: The function to use to normalize the grades. It is called with the array of the grades
+        and, if it doesn't support arrays, with each grade.
+    :type grade_norm_func: Callable[[float], float]
+    """
+    GRADE_OPTIONS = ("grade_min", "grade_min_value", "grade_max", "grade_norm_func")
+
+    def __init__(
+            self,
+            values: np.ndarray,
+            weights: Union[np.ndarray, Sequence[float]],
+            keys: Sequence[str],
+            names: Optional[Sequence[str]] = None,
+            mask: Optional[np.ndarray] = None,
+            **kwargs
+    ):
+        values = np.asarray(values, dtype=float)
+        if values.ndim != 2 or values.shape[1] != len(keys):
+            raise ValueError(f"The values must be of shape (n_reports, {len(keys)}), got {values.shape}.")
+        self.keys = list(keys)
+        self.names = list(names) if names is not None else list(range(values.shape[0]))
+        self.mask = ~np.isnan(values) if mask is None else np.asarray(mask, dtype=bool)
+        self.values = np.where(self.mask, values, 0.0)
+        self.weights = np.broadcast_to(np.asarray(weights, dtype=float), values.shape) * self.mask
+        self.grade_min = kwargs.pop("grade_min", Report.DEFAULT_GRADE_MIN)
+        self.grade_min_value = kwargs.pop("grade_min_value", Report.DEFAULT_GRADE_MIN_VALUE)
+        self.grade_max = kwargs.pop("grade_max", Report.DEFAULT_GRADE_MAX)
+        self.grade_norm_func: Optional[Callable[[float], float]] = kwargs.pop("grade_norm_func", None)
+        self.kwargs = kwargs
+
+    @classmethod
+    def from_reports(
+            cls,
+            reports: Union[Mapping[str, Report], Sequence[Report]],
+            keys: Optional[Sequence[str]] = None,
+            **kwargs
+    ) -> "ReportBatch":
+        r"""
+        Make a batch from reports. The grade options default to the ones of the first report.
+
+        :param reports: The reports, by name or as a sequence.
+        :param keys: The keys of the batch. Defaults to the keys of all the reports, in order of appearance.
+        :return: The batch.
+        """
+        if isinstance(reports, Mapping):
+            names, reports = list(reports.keys()), list(reports.values())
+        else:
+            names, reports = None, list(reports)
+        if keys is None:
+            keys = list(dict.fromkeys(key for report in reports for key in report.keys()))
+        columns = {key: j for j, key in enumerate(keys)}
+        values = np.full((len(reports), len(keys)), np.nan)
+        weights = np.zeros((len(reports), len(keys)))
+        for i, report in enumerate(reports):
+            for key in report.keys():
+                if key in columns:
+                    values[i, columns[key]] = report.get_value(key)
+                    weights[i, columns[key]] = report.get_weight(key)
+        if reports:
+            for option in cls.GRADE_OPTIONS:
+                kwargs.setdefault(option, getattr(reports[0], option))
+        return cls(values, weights, keys, names=names, **kwargs)
+
+    @classmethod
+    def from_report_store(
+            cls,
+            report_store,
+            keys: Optional[Sequence[str]] = None,
+            grade_kwargs: Optional[Mapping[str, Any]] = None,
+            **filters
+    ) -> "ReportBatch":
+        r"""
+        Make a batch from the values of the reports of a :class:`ReportStore` without loading their states. The
+        reports are named after their students, prefixed by their assignment and their run if the filters match
+        several reports of the same student.
+
+        The grade options are not saved in the store, so they are given apart from the filters, whose `grade_min`
+        and `grade_max` select the reports by their saved grade.
+
+        :param report_store: The store of the reports.
+        :param keys: The keys of the batch. Defaults to the keys of all the reports.
+        :param grade_kwargs: The grade options of the batch, i.e. `grade_min`, `grade_min_value`, `grade_max` and
+            `grade_norm_func`. Defaults to the ones of :class:`Report`.
+        :param filters: The filters of the reports, see :meth:`ReportStore.query`.
+        :return: The batch.
+        """
+        grade_kwargs = dict(grade_kwargs or {})
+        unknown_options = set(grade_kwargs) - set(cls.GRADE_OPTIONS)
+        if unknown_options:
+            raise TypeError(f"Unknown grade options {sorted(unknown_options)}, expected some of {cls.GRADE_OPTIONS}.")
+        rows = report_store.get_report_values(**filters)
+        report_ids = list(dict.fromkeys(row["report_id"] for row in rows))
+        identities = {row["report_id"]: (row["assignment"], row["run"], row["student"]) for row in rows}
+        students = [identities[report_id][2] for report_id in report_ids]
+        if len(set(students)) == len(students):
+            names = students
+        else:
+            names = ["/".join(identities[report_id]) for report_id in report_ids]
+        if keys is None:
+            keys = list(dict.fromkeys(row["key"] for row in rows))
+        rows_index = {report_id: i for i, report_id in enumerate(report_ids)}
+        columns = {key: j for j, key in enumerate(keys)}
+        values = np.full((len(report_ids), len(keys)), np.nan)
+        weights = np.zeros((len(report_ids), len(keys)))
+        for row in rows:
+            if row["key"] in columns:
+                index = rows_index[row["report_id"]], columns[row["key"]]
+                values[index] = np.nan if row["value"] is None else row["value"]
+                weights[index] = row["weight"] or 0.0
+        return cls(values, weights, keys, names=names, **grade_kwargs)
+
+    @property
+    def n_reports(self) -> int:
+        return self.values.shape[0]
+
+    def get_weights_array(self, weights: WeightsType) -> np.ndarray:
+        r"""
+        Return the weights of the keys as an array of shape (n_keys,). A key missing from a mapping of weights gets
+        a weight of 0.
+        """
+        if isinstance(weights, Mapping):
+            unknown_keys = set(weights) - set(self.keys)
+            if unknown_keys:
+                raise KeyError(f"Unknown keys {sorted(unknown_keys)}, the keys of the batch are {self.keys}.")
+            return np.array([weights.get(key, 0.0) for key in self.keys], dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape[-1] != len(self.keys):
+            raise ValueError(f"The weights must have {len(self.keys)} columns, got {weights.shape}.")
+        return weights
+
+    def _weighted_sums(self, weighted_values: np.ndarray, total_weights: np.ndarray) -> np.ndarray:
+        # Like `Report.get_grade`, the weights are only normalized if they don't already sum to 1 and an empty
+        # report has a weighted sum of 0.
+        normalized = np.isclose(total_weights, 1.0)
+        safe_total_weights = np.where(normalized | (total_weights == 0.0), 1.0, total_weights)
+        return np.where(normalized, weighted_values, weighted_values / safe_total_weights)
+
+    def scale_grades(self, weighted_sums: np.ndarray) -> np.ndarray:
+        r"""
+        Scale the weighted sums of the values to grades and apply `grade_norm_func`, like :meth:`Report.get_grade`.
+        """
+        grade_scale = self.grade_max - self.grade_min
+        grades = (self.grade_max - self.grade_min_value) * (weighted_sums - self.grade_min) / grade_scale
+        grades = grades + self.grade_min_value
+        if self.grade_norm_func is not None:
+            try:
+                normed_grades = np.asarray(self.grade_norm_func(grades), dtype=float)
+                if normed_grades.shape != grades.shape:
+                    raise ValueError("grade_norm_func changed the shape of the grades.")
+            except (TypeError, ValueError):
+                normed_grades = np.array(
+                    [self.grade_norm_func(grade) for grade in grades.ravel()], dtype=float
+                ).reshape(grades.shape)
+            grades = normed_grades
+        return grades
+
+    def get_grades(self, weights: Optional[WeightsType] = None) -> np.ndarray:
+        r"""
+        Compute the grades of the reports.
+
+        :param weights: The weights of the keys, shared by every report, as a mapping {key: weight} or an array of
+            shape (n_keys,). Defaults to the weights of each report.
+        :return: The grades, of shape (n_reports,).
+        """
+        if weights is None:
+            weights = self.weights
+        else:
+            weights = self.get_weights_array(weights)[np.newaxis, :] * self.mask
+        weighted_values = np.sum(weights * self.values, axis=1)
+        return self.scale_grades(self._weighted_sums(weighted_values, np.sum(weights, axis=1)))
+
+    @property
+    def grades(self) -> np.ndarray:
+        return self.get_grades()
+
+    def sweep(self, weights_grid: Union[Sequence[WeightsType], np.ndarray]) -> np.ndarray:
+        r"""
+        Compute the grades of the cohort for several candidate weightings at once, e.g. to see how a change of the
+        weight of the code coverage would move the grades.
+
+        :param weights_grid: The candidate weights of the keys, as a sequence of mappings {key: weight} or an array
+            of shape (n_candidates, n_keys).
+        :return: The grades, of shape (n_candidates, n_reports).
+        """
+        if isinstance(weights_grid, np.ndarray):
+            weights_grid = self.get_weights_array(np.atleast_2d(weights_grid))
+        else:
+            weights_grid = np.stack([self.get_weights_array(weights) for weights in weights_grid])
+        # (n_candidates, n_keys) @ (n_keys, n_reports): the masked values and weights of every report for every
+        # candidate in a single product.
+        weighted_values = weights_grid @ (self.values * self.mask).T
+        total_weights = weights_grid @ self.mask.T.astype(float)
+        return self.scale_grades(self._weighted_sums(weighted_values, total_weights))
+
+    def reweight(self, weights: WeightsType) -> "ReportBatch":
+        r"""
+        Return a copy of the batch with the same weights of the keys for every report.
+        """
+        return ReportBatch(
+            np.where(self.mask, self.values, np.nan),
+            self.get_weights_array(weights),
+            self.keys,
+            names=self.names,
+            mask=self.mask,
+            grade_min=self.grade_min,
+            grade_min_value=self.grade_min_value,
+            grade_max=self.grade_max,
+            grade_norm_func=self.grade_norm_func,
+            **self.kwargs
+        )
+
+    def get_grades_by_name(self, weights: Optional[WeightsType] = None) -> Dict[str, float]:
+        return dict(zip(self.names, self.get_grades(weights).tolist()))
+
+    def to_reports(self) -> List[Report]:
+        r"""
+        Return the reports of the batch, e.g. to save them after a reweighting.
+        """
+        return [
+            Report(
+                {
+                    key: {Report.VALUE_KEY: float(self.values[i, j]), Report.WEIGHT_KEY: float(self.weights[i, j])}
+                    for j, key in enumerate(self.keys) if self.mask[i, j]
+                },
+                grade_min=self.grade_min,
+                grade_min_value=self.grade_min_value,
+                grade_max=self.grade_max,
+                grade_norm_func=self.grade_norm_func,
+            )
+            for i in range(self.n_reports)
+        ]
+
+    def __len__(self):
+        return self.n_reports
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(n_reports={self.n_reports}, keys={self.keys})"
@@ -0,0 +1,428 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .report import Report
+
+
+class ReportStore:
+    r"""
+    SQLite database of the reports of a cohort, so the reports of hundreds of submissions can be queried without
+    walking the report directories and parsing every json report.
+
+    A report is identified by its student, its assignment and its run. Saving a report again with the same identity
+    replaces it. Besides the state of the report, the database holds indexed tables of the values of the report,
+    of the summaries of its test suites and of the timings of its stages:
+
+        - `reports`: the identity, the grade, the path of the json report, the save time and the state of the
+          report;
+        - `report_values`: the value and the weight of each key of the report, e.g. `code_coverage`;
+        - `test_summaries`: the number of passed, failed and total tests of each suite, e.g. `tests` and
+          `master_tests`;
+        - `timings`: the wall-clock and CPU times of each section of the run, e.g. `student_tests`.
+
+    The reports are written in batches, each in a single transaction. The database is in WAL mode, so several
+    processes, e.g. the workers of a :class:`BatchTester`, can write to it while dashboards read it.
+
+    :param path: The path of the database.
+    :param kwargs: Additional keyword arguments.
+
+    :keyword batch_size: The number of reports buffered by :meth:`add` before they are written.
+    :type batch_size: int
+    :keyword timeout: The number of seconds to wait for the lock of another writer.
+    :type timeout: float
+    """
+    SCHEMA_VERSION = 1
+    DEFAULT_FILENAME = "reports.sqlite"
+    DEFAULT_BATCH_SIZE = 100
+    DEFAULT_TIMEOUT = 60.0
+    TEST_SUMMARY_SUFFIX = "test_cases_summary"
+    TOTAL_TIMING_SECTION = "total"
+    REPORT_COLUMNS = ("id", "run", "assignment", "student", "grade", "report_filepath", "saved_at")
+    SCHEMA = r"""
+    CREATE TABLE IF NOT EXISTS reports (
+        id INTEGER PRIMARY KEY,
+        run TEXT NOT NULL,
+        assignment TEXT NOT NULL,
+        student TEXT NOT NULL,
+        grade REAL,
+        report_filepath TEXT,
+        saved_at REAL NOT NULL,
+        state TEXT NOT NULL,
+        UNIQUE (run, assignment, student)
+    );
+    CREATE INDEX IF NOT EXISTS reports_student ON reports (student);
+    CREATE INDEX IF NOT EXISTS reports_assignment_run ON reports (assignment, run);
+    CREATE INDEX IF NOT EXISTS reports_grade ON reports (grade);
+    CREATE TABLE IF NOT EXISTS report_values (
+        report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,
+        key TEXT NOT NULL,
+        value REAL,
+        weight REAL,
+        PRIMARY KEY (report_id, key)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS test_summaries (
+        report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,
+        suite TEXT NOT NULL,
+        passed INTEGER,
+        failed INTEGER,
+        total INTEGER,
+        percent_passed REAL,
+        PRIMARY KEY (report_id, suite)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS timings (
+        report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,
+        section TEXT NOT NULL,
+        start REAL,
+        wall REAL,
+        cpu REAL,
+        PRIMARY KEY (report_id, section)
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: str, **kwargs):
+        self.path = os.path.abspath(path)
+        self.kwargs = kwargs
+        self._pending: List[Tuple[Report, str, str, str]] = []
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def batch_size(self) -> int:
+        return self.kwargs.get("batch_size", self.DEFAULT_BATCH_SIZE)
+
+    @property
+    def timeout(self) -> float:
+        return self.kwargs.get("timeout", self.DEFAULT_TIMEOUT)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # The transactions are managed explicitly with `BEGIN IMMEDIATE` so concurrent writers wait for the
+            # lock instead of failing when they upgrade a read transaction.
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                connection.execute("BEGIN IMMEDIATE")
+                # `executescript` would commit first, so the statements are run one by one in the transaction.
+                for statement in filter(str.strip, self.SCHEMA.split(";")):
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+                connection.execute("COMMIT")
+            self._connection = connection
+        return self._connection
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    @classmethod
+    def get_test_summaries(cls, report: Report) -> Dict[str, dict]:
+        r"""
+        Return the summaries of the test suites saved by a :class:`Tester` in the metadata of a report, by stage.
+        """
+        summaries = {}
+        for stage, results in report.metadata.get("stages", {}).items():
+            for key, value in (results or {}).items():
+                if key.endswith(cls.TEST_SUMMARY_SUFFIX) and isinstance(value, dict):
+                    summaries[stage] = value
+        return summaries
+
+    @classmethod
+    def get_timings(cls, report: Report) -> Dict[str, dict]:
+        timings = dict(report.timings.get("sections", {}))
+        if report.timings.get(cls.TOTAL_TIMING_SECTION):
+            timings[cls.TOTAL_TIMING_SECTION] = report.timings[cls.TOTAL_TIMING_SECTION]
+        return timings
+
+    def _insert(self, connection: sqlite3.Connection, report: Report, student: str, assignment: str, run: str):
+        connection.execute(
+            "DELETE FROM reports WHERE run = ? AND assignment = ? AND student = ?", (run, assignment, student)
+        )
+        state = report.get_state()
+        report_id = connection.execute(
+            "INSERT INTO reports (run, assignment, student, grade, report_filepath, saved_at, state) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                run, assignment, student, state["grade"], report.report_filepath, time.time(),
+                json.dumps(state, separators=(",", ":")),
+            ),
+        ).lastrowid
+        connection.executemany(
+            "INSERT INTO report_values (report_id, key, value, weight) VALUES (?, ?, ?, ?)",
+            [(report_id, key, report.get_value(key), report.get_weight(key)) for key in report.keys()],
+        )
+        connection.executemany(
+            "INSERT INTO test_summaries (report_id, suite, passed, failed, total, percent_passed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    report_id, suite, summary.get("passed"), summary.get("failed"), summary.get("total"),
+                    summary.get("percent_passed"),
+                )
+                for suite, summary in self.get_test_summaries(report).items()
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO timings (report_id, section, start, wall, cpu) VALUES (?, ?, ?, ?, ?)",
+            [
+                (report_id, section, timing.get("start"), timing.get("wall"), timing.get("cpu"))
+                for section, timing in self.get_timings(report).items()
+            ],
+        )
+        return report_id
+
+    def save_many(self, reports: Iterable[Tuple[Report, str, str, str]]) -> "ReportStore":
+        r"""
+        Save reports in a single transaction.
+
+        :param reports: The reports with their identity, as tuples (report, student, assignment, run).
+        :return: The store.
+        """
+        reports = list(reports)
+        if not reports:
+            return self
+        with self.transaction() as connection:
+            for report, student, assignment, run in reports:
+                self._insert(connection, report, student, assignment or "", run or "")
+        return self
+
+    def save(self, report: Report, student: str, assignment: str = "", run: str = "") -> "ReportStore":
+        return self.save_many([(report, student, assignment, run)])
+
+    def add(self, report: Report, student: str, assignment: str = "", run: str = "") -> "ReportStore":
+        r"""
+        Buffer a report. The buffered reports are written in a single transaction once there are `batch_size` of
+        them or when :meth:`flush` is called.
+        """
+        with self._lock:
+            self._pending.append((report, student, assignment, run))
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+        return self
+
+    def flush(self) -> "ReportStore":
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self.save_many(pending)
+        return self
+
+    def save_report_files(
+            self,
+            report_filepaths: Dict[str, str],
+            assignment: str = "",
+            run: str = "",
+    ) -> "ReportStore":
+        r"""
+        Import json reports saved by :meth:`Report.save`, e.g. the reports of the previous cohorts.
+
+        :param report_filepaths: The path of the json report of each student.
+        :param assignment: The assignment of the reports.
+        :param run: The run of the reports.
+        :return: The store.
+        """
+        return self.save_many(
+            (Report().load(filepath), student, assignment, run) for student, filepath in report_filepaths.items()
+        )
+
+    @staticmethod
+    def _make_where(
+            student: Optional[str] = None,
+            assignment: Optional[str] = None,
+            run: Optional[str] = None,
+            grade_min: Optional[float] = None,
+            grade_max: Optional[float] = None,
+            table: str = "reports",
+    ) -> Tuple[str, list]:
+        conditions, params = [], []
+        for column, value in [("student", student), ("assignment", assignment), ("run", run)]:
+            if value is not None:
+                conditions.append(f"{table}.{column} = ?")
+                params.append(value)
+        if grade_min is not None:
+            conditions.append(f"{table}.grade >= ?")
+            params.append(grade_min)
+        if grade_max is not None:
+            conditions.append(f"{table}.grade <= ?")
+            params.append(grade_max)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def _select(self, sql: str, params: Sequence) -> List[sqlite3.Row]:
+        with self._lock:
+            connection = self.connection
+            connection.row_factory = sqlite3.Row
+            try:
+                return connection.execute(sql, params).fetchall()
+            finally:
+                connection.row_factory = None
+
+    def query(self, **filters) -> List[dict]:
+        r"""
+        Return the identity and the grade of the reports matching the filters, sorted by assignment, run and
+        student. The states of the reports are not loaded.
+
+        :keyword student: The student of the reports.
+        :keyword assignment: The assignment of the reports.
+        :keyword run: The run of the reports.
+        :keyword grade_min: The minimum grade of the reports, included.
+        :keyword grade_max: The maximum grade of the reports, included.
+        :return: The reports as dicts with the columns `id`, `run`, `assignment`, `student`, `grade`,
+            `report_filepath` and `saved_at`.
+        """
+        where, params = self._make_where(**filters)
+        rows = self._select(
+            f"SELECT {', '.join(self.REPORT_COLUMNS)} FROM reports{where} ORDER BY assignment, run, student", params
+        )
+        return [dict(row) for row in rows]
+
+    def get_summary(self, **filters) -> List[dict]:
+        r"""
+        Return the summary of the reports matching the filters: the columns of :meth:`query`, the value of each
+        key of the reports and the number of passed and total tests of each suite, e.g. `tests/passed`.
+
+        :keyword student: The student of the reports.
+        :keyword assignment: The assignment of the reports.
+        :keyword run: The run of the reports.
+        :keyword grade_min: The minimum grade of the reports, included.
+        :keyword grade_max: The maximum grade of the reports, included.
+        :return: The summary of each report.
+        """
+        summaries = {row["id"]: row for row in self.query(**filters)}
+        if not summaries:
+            return []
+        where, params = self._make_where(**filters)
+        for row in self._select(
+                f"SELECT v.report_id, v.key, v.value FROM report_values v JOIN reports ON reports.id = v.report_id"
+                f"{where}",
+                params,
+        ):
+            summaries[row["report_id"]][row["key"]] = row["value"]
+        for row in self._select(
+                f"SELECT t.report_id, t.suite, t.passed, t.failed, t.total FROM test_summaries t "
+                f"JOIN reports ON reports.id = t.report_id{where}",
+                params,
+        ):
+            for column in ("passed", "failed", "total"):
+                summaries[row["report_id"]][f"{row['suite']}/{column}"] = row[column]
+        return list(summaries.values())
+
+    def get_report_values(self, **filters) -> List[dict]:
+        r"""
+        Return the value and the weight of each key of the reports matching the filters, without loading the
+        states of the reports, e.g. to build a :class:`ReportBatch`.
+
+        :return: The values as dicts with the columns `report_id`, `student`, `assignment`, `run`, `key`, `value`
+            and `weight`, sorted like the reports of :meth:`query`.
+        """
+        where, params = self._make_where(**filters)
+        rows = self._select(
+            f"SELECT v.report_id, reports.student, reports.assignment, reports.run, v.key, v.value, v.weight "
+            f"FROM report_values v JOIN reports ON reports.id = v.report_id{where} "
+            f"ORDER BY reports.assignment, reports.run, reports.student",
+            params,
+        )
+        return [dict(row) for row in rows]
+
+    def get_stage_timings(self, section: Optional[str] = None, **filters) -> List[dict]:
+        r"""
+        Return the timings of the reports matching the filters, e.g. to find the stragglers of a cohort.
+
+        :param section: The section of the timings, e.g. `student_tests`. If None, the timings of every section
+            are returned.
+        :return: The timings as dicts with the columns `student`, `assignment`, `run`, `section`, `start`, `wall`
+            and `cpu`.
+        """
+        where, params = self._make_where(**filters)
+        if section is not None:
+            where = f"{where} AND t.section = ?" if where else " WHERE t.section = ?"
+            params.append(section)
+        rows = self._select(
+            f"SELECT reports.student, reports.assignment, reports.run, t.section, t.start, t.wall, t.cpu "
+            f"FROM timings t JOIN reports ON reports.id = t.report_id{where} "
+            f"ORDER BY reports.assignment, reports.run, reports.student, t.start",
+            params,
+        )
+        return [dict(row) for row in rows]
+
+    def load_reports(self, **filters) -> List[Tuple[dict, Report]]:
+        r"""
+        Load the reports matching the filters.
+
+        :return: The reports with their identity, as tuples (columns of :meth:`query`, report).
+        """
+        where, params = self._make_where(**filters)
+        rows = self._select(
+            f"SELECT {', '.join(self.REPORT_COLUMNS)}, state FROM reports{where} "
+            f"ORDER BY assignment, run, student",
+            params,
+        )
+        reports = []
+        for row in rows:
+            report = Report()
+            report.set_state(json.loads(row["state"]))
+            reports.append(({column: row[column] for column in self.REPORT_COLUMNS}, report))
+        return reports
+
+    def get_report(self, student: str, assignment: str = "", run: str = "") -> Optional[Report]:
+        reports = self.load_reports(student=student, assignment=assignment, run=run)
+        return reports[0][1] if reports else None
+
+    def delete(self, **filters) -> int:
+        where, params = self._make_where(**filters)
+        with self.transaction() as connection:
+            return connection.execute(f"DELETE FROM reports{where}", params).rowcount
+
+    def export_csv(self, filepath: str, **filters) -> str:
+        r"""
+        Export the summary of the reports matching the filters (see :meth:`get_summary`) to a csv file.
+
+        :param filepath: The path of the csv file.
+        :return: The path of the csv file.
+        """
+        summaries = self.get_summary(**filters)
+        columns = list(self.REPORT_COLUMNS)
+        for summary in summaries:
+            columns += [column for column in summary if column not in columns]
+        with open(filepath, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(summaries)
+        return filepath
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._select("SELECT COUNT(*) FROM reports", [])[0][0]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path})"
@@ -0,0 +1,316 @@
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from .timings import add_children_cpu_time
+
+
+class ResourceLimits:
+    r"""
+    Limits of a student-controlled subprocess, e.g. a pytest session or a pip install.
+
+    The CPU time and the address space are enforced by the kernel through rlimits set by a `/bin/sh` wrapper
+    (`ulimit -t` and `ulimit -v`) which then `exec`s the command, so the limits are inherited by every process the
+    command starts. The wrapper is used instead of a `preexec_fn` because the testers run their subprocesses from
+    several threads. The rlimits are only supported on POSIX systems, elsewhere only the wall-clock timeout applies.
+
+    On timeout, the whole process group of the command is killed, including the processes it left behind.
+
+    :param timeout: The maximum wall-clock duration of the command in seconds.
+    :param cpu_time: The maximum CPU time of each process of the command in seconds.
+    :param memory: The maximum address space of each process of the command in bytes.
+    """
+    def __init__(
+            self,
+            timeout: Optional[float] = None,
+            cpu_time: Optional[int] = None,
+            memory: Optional[int] = None,
+    ):
+        self.timeout = timeout
+        self.cpu_time = cpu_time
+        self.memory = memory
+
+    @classmethod
+    def from_value(cls, value: Optional[Union["ResourceLimits", Dict[str, Optional[float]]]]) -> "ResourceLimits":
+        r"""
+        Build the limits from None (no limits), a dict of the arguments of the constructor or the limits themselves.
+        """
+        if value is None:
+            return cls()
+        if isinstance(value, ResourceLimits):
+            return value
+        return cls(**value)
+
+    @staticmethod
+    def is_rlimit_supported() -> bool:
+        return sys.platform != "win32" and os.path.exists("/bin/sh")
+
+    @property
+    def has_rlimits(self) -> bool:
+        return self.is_rlimit_supported() and (self.cpu_time is not None or self.memory is not None)
+
+    def get_ulimit_cmd(self) -> str:
+        cmds = []
+        if self.cpu_time is not None:
+            # The hard limit is one second above the soft limit, so the process first gets SIGXCPU and is only
+            # killed with SIGKILL if it ignores it.
+            cpu_time = int(max(1, self.cpu_time))
+            cmds.append(f"ulimit -H -t {cpu_time + 1}; ulimit -S -t {cpu_time}")
+        if self.memory is not None:
+            cmds.append(f"ulimit -v {int(max(1, self.memory // 1024))}")
+        return "; ".join(cmds)
+
+    def wrap_args(self, args: List[str]) -> List[str]:
+        r"""
+        Return the arguments running the given ones under the rlimits.
+        """
+        if not self.has_rlimits:
+            return list(args)
+        return ["/bin/sh", "-c", f'{self.get_ulimit_cmd()}; exec "$0" "$@"', *args]
+
+    def wrap_cmd(self, cmd: str) -> List[str]:
+        r"""
+        Return the arguments running the given command line through the shell under the rlimits.
+        """
+        if sys.platform == "win32":
+            return [os.environ.get("COMSPEC", "cmd.exe"), "/c", cmd]
+        if self.has_rlimits:
+            cmd = f"{self.get_ulimit_cmd()}; {cmd}"
+        return ["/bin/sh", "-c", cmd]
+
+    def get_child_rlimits(self) -> Dict[str, Optional[int]]:
+        r"""
+        Return the rlimits to set in a forked child, e.g. by a warm pytest worker.
+        """
+        return {"cpu_time": self.cpu_time, "memory": self.memory}
+
+    def to_dict(self) -> Dict[str, Optional[float]]:
+        return {"timeout": self.timeout, "cpu_time": self.cpu_time, "memory": self.memory}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(timeout={self.timeout}, cpu_time={self.cpu_time}, memory={self.memory})"
+
+
+class ProcessOutcome:
+    r"""
+    Outcome of a subprocess run under :class:`ResourceLimits`.
+
+    :param status: How the process ended:
+        - `ok`: the process exited by itself, whatever its return code;
+        - `timeout`: the process group was killed at the wall-clock timeout;
+        - `cpu_limit`: the process was killed by the kernel at its CPU time limit (SIGXCPU);
+        - `oom`: the process ran out of memory, either killed with SIGKILL (e.g. by the OOM killer) or exited
+          with a MemoryError at its address space limit;
+        - `crash`: the process was killed by another signal, e.g. a segmentation fault, or could not be started,
+          e.g. because its executable is missing.
+    :param returncode: The return code of the process. Negative for a signal, None if it never finished.
+    :param duration: The wall-clock duration of the process in seconds.
+    :param stdout: The captured output of the process, if any.
+    :param cmd: The command, for the logs and the report.
+    :param cpu_time: The CPU time used by the process and its descendants in seconds, if measured.
+    """
+    OK = "ok"
+    TIMEOUT = "timeout"
+    CPU_LIMIT = "cpu_limit"
+    OOM = "oom"
+    CRASH = "crash"
+    SHELL_NOT_EXECUTED_RETURNCODES = (126, 127)
+
+    def __init__(
+            self,
+            status: str,
+            returncode: Optional[int] = None,
+            duration: float = 0.0,
+            stdout: Optional[str] = None,
+            cmd: Optional[str] = None,
+            cpu_time: Optional[float] = None,
+    ):
+        self.status = status
+        self.returncode = returncode
+        self.duration = duration
+        self.stdout = stdout
+        self.cmd = cmd
+        self.cpu_time = cpu_time
+
+    @classmethod
+    def from_returncode(
+            cls,
+            returncode: Optional[int],
+            timed_out: bool = False,
+            duration: float = 0.0,
+            stdout: Optional[str] = None,
+            cmd: Optional[str] = None,
+            shell: bool = False,
+            cpu_time: Optional[float] = None,
+    ) -> "ProcessOutcome":
+        r"""
+        Classify the end of a process from its return code.
+
+        :param shell: If True, the command ran through a shell, which reports a child killed by a signal with the
+            return code 128 + signal and a command it could not execute with the return code 126 or 127.
+        """
+        signum = None
+        if returncode is not None and returncode < 0:
+            signum = -returncode
+        elif shell and returncode is not None and 128 < returncode < 128 + 65:
+            signum = returncode - 128
+        if timed_out:
+            status = cls.TIMEOUT
+        elif signum is not None:
+            status = {
+                signal.SIGKILL: cls.OOM,
+                getattr(signal, "SIGXCPU", None): cls.CPU_LIMIT,
+            }.get(signum, cls.CRASH)
+        elif shell and returncode in cls.SHELL_NOT_EXECUTED_RETURNCODES:
+            status = cls.CRASH
+        elif returncode and stdout is not None and "MemoryError" in stdout:
+            status = cls.OOM
+        else:
+            status = cls.OK
+        return cls(status, returncode=returncode, duration=duration, stdout=stdout, cmd=cmd, cpu_time=cpu_time)
+
+    @classmethod
+    def from_os_error(
+            cls,
+            error: OSError,
+            cmd: Optional[Union[str, List[str]]] = None,
+            duration: float = 0.0,
+    ) -> "ProcessOutcome":
+        r"""
+        Make the outcome of a process that could not be started, e.g. because its executable is missing.
+        """
+        return cls(
+            cls.CRASH,
+            duration=duration,
+            stdout=f"{type(error).__name__}: {error}",
+            cmd=None if cmd is None else format_cmd(cmd),
+        )
+
+    @property
+    def ok(self) -> bool:
+        return self.status == self.OK
+
+    def to_dict(self) -> dict:
+        return {
+            "status"    : self.status,
+            "returncode": self.returncode,
+            "duration"  : self.duration,
+            "cpu_time"  : self.cpu_time,
+            "cmd"       : self.cmd,
+        }
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(status={self.status}, returncode={self.returncode}, "
+            f"duration={self.duration:.2f})"
+        )
+
+
+def format_cmd(cmd: Union[str, List[str]]) -> str:
+    return cmd if isinstance(cmd, str) else shlex.join(cmd)
+
+
+def kill_process_group(pid: int):
+    r"""
+    Kill the process group led by the given process, or the process alone where process groups don't exist.
+    """
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(pid, signal.SIGKILL)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def run_governed(
+        cmd: Union[str, List[str]],
+        limits: Optional[ResourceLimits] = None,
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        capture_output: bool = True,
+) -> ProcessOutcome:
+    r"""
+    Run a command in a new process group under the given limits. The process group is killed at the timeout and
+    once the command ends, so no process started by the command outlives it.
+
+    :param cmd: The arguments of the command, or a command line run through the shell.
+    :param limits: The limits of the command.
+    :param cwd: The working directory of the command.
+    :param env: The environment of the command. The one of the current process if None.
+    :param capture_output: If True, the stdout and the stderr of the command are captured in the outcome.
+        Otherwise, they are inherited from the current process.
+    :return: The outcome of the command, with the status `crash` if the command could not be started.
+    """
+    limits = limits or ResourceLimits()
+    args = limits.wrap_cmd(cmd) if isinstance(cmd, str) else limits.wrap_args(cmd)
+    pipe = subprocess.PIPE if capture_output else None
+    start = time.perf_counter()
+    try:
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=pipe,
+            stderr=subprocess.STDOUT if capture_output else None,
+            cwd=cwd,
+            env=env,
+            universal_newlines=True,
+            encoding="utf8",
+            errors="ignore",
+            start_new_session=True,
+        )
+    except OSError as err:
+        return ProcessOutcome.from_os_error(err, cmd, duration=time.perf_counter() - start)
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        kill_process_group(process.pid)
+
+    timer = None
+    if limits.timeout is not None:
+        timer = threading.Timer(limits.timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+    try:
+        stdout = None
+        if capture_output:
+            with process.stdout:
+                stdout = process.stdout.read()
+        cpu_time = _wait(process)
+    except BaseException:
+        kill_process_group(process.pid)
+        process.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+    kill_process_group(process.pid)
+    add_children_cpu_time(cpu_time)
+    return ProcessOutcome.from_returncode(
+        None if timed_out.is_set() else process.returncode,
+        timed_out=timed_out.is_set(),
+        duration=time.perf_counter() - start,
+        stdout=stdout,
+        cmd=format_cmd(cmd),
+        shell=isinstance(cmd, str) or limits.has_rlimits,
+        cpu_time=cpu_time,
+    )
+
+
+def _wait(process: subprocess.Popen) -> Optional[float]:
+    r"""
+    Wait for the process and return the CPU time used by the process and the descendants it waited for, or None
+    where it can't be measured.
+    """
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return None
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return rusage.ru_utime + rusage.ru_stime
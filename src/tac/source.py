@@ -1,23 +1,37 @@
+import asyncio
 import logging
 import os
+import pathlib
 import shutil
-import subprocess
 import sys
-from typing import Optional, List
+from typing import Optional, List, Union
 
 from . import utils
+from .async_utils import AsyncLimits, get_default_async_limits, run_cmd_async, run_governed_async
+from .git_mirror_cache import GitMirrorCache
+from .resource_governor import ProcessOutcome, ResourceLimits, run_governed
+from .venv_cache import VenvBuildError, VenvCache
+from .wheelhouse import Wheelhouse
 
 
 class Source:
     DEFAULT_SRC_DIRNAME = "src"
-    DEFAULT_LOGGING_FUNC = logging.info
+    DEFAULT_LOGGING_FUNC = staticmethod(logging.info)
     
     # Git
     DEFAULT_REPO_URL = "https://github.com/{}.git"
     DEFAULT_REPO_BRANCH = "main"
+    DEFAULT_CLONE_DEPTH = 1
+    DEFAULT_CLONE_FILTER = "blob:none"
+    DEFAULT_SPARSE_CHECKOUT = True
+    DEFAULT_INCREMENTAL_COPY = True
+    DEFAULT_LOCAL_REPO_TMP_DIRNAME = "tmp_git"
     
     def __init__(self, src_path: Optional[str] = None, *args, **kwargs):
         self._src_path = src_path
+        # The source path relative to the root of the repo of a remote source, kept since the source path is
+        # replaced by its location in the clone.
+        self._repo_src_path = src_path
         self.args = args
         self.kwargs = kwargs
         
@@ -31,10 +45,24 @@ class Source:
         
         self.repo_branch = kwargs.get("repo_branch", self.DEFAULT_REPO_BRANCH)
         self.repo = None
-        self.local_repo_tmp_dirname = kwargs.get("local_repo_tmp_dirname", "tmp_git")
+        self.local_repo_tmp_dirname = kwargs.get("local_repo_tmp_dirname", self.DEFAULT_LOCAL_REPO_TMP_DIRNAME)
+        self.clone_depth = kwargs.get("clone_depth", self.DEFAULT_CLONE_DEPTH)
+        self.clone_filter = kwargs.get("clone_filter", self.DEFAULT_CLONE_FILTER)
+        self.sparse_checkout = kwargs.get("sparse_checkout", self.DEFAULT_SPARSE_CHECKOUT)
+        self.sparse_checkout_paths = list(kwargs.get("sparse_checkout_paths", []))
+        git_mirror_cache: Optional[Union[GitMirrorCache, str]] = kwargs.get("git_mirror_cache", None)
+        if isinstance(git_mirror_cache, str):
+            git_mirror_cache = GitMirrorCache(git_mirror_cache)
+        self.git_mirror_cache = git_mirror_cache
         
         self.working_dir = kwargs.get("working_dir", None)
+        self.incremental_copy = kwargs.get("incremental_copy", self.DEFAULT_INCREMENTAL_COPY)
+        self.link_patterns = list(kwargs.get("link_patterns", []))
+        self.use_reflinks = kwargs.get("use_reflinks", True)
+        self.copy_stats = {}
         self.working_dirname = kwargs.get("working_dirname", None)
+        self.resource_limits = ResourceLimits.from_value(kwargs.get("resource_limits", None))
+        self.process_outcomes: List[ProcessOutcome] = []
         
         self.logging_func = kwargs.get("logging_func", self.DEFAULT_LOGGING_FUNC)
     
@@ -117,18 +145,126 @@ class Source:
             )
         return dirpath
     
+    def get_fingerprint(self) -> Optional[str]:
+        r"""
+        Return a fingerprint of the content of the source without setting it up. For a local source, it is the hash
+        of the files of the source path. For a remote source, it is the hash of the url, the branch, the source path
+        and the sha of the head of the branch.
+        
+        :return: The fingerprint or None if it could not be computed.
+        :rtype: Optional[str]
+        """
+        if self.is_remote:
+            head = utils.get_remote_head(self.repo_url, self.repo_branch)
+            if head is None:
+                return None
+            return utils.hash_obj(self.repo_url, self.repo_branch, self._repo_src_path, head)
+        try:
+            return utils.hash_dir(self.src_path)
+        except (OSError, ValueError):
+            return None
+    
     def copy_to_working_dir(self, overwrite=False):
-        if self.is_setup and overwrite:
+        r"""
+        Copy the source files to the local path. In incremental mode (the default), the local path is synchronized
+        with the source files: only the changed files are written and the stale ones are deleted, even with
+        `overwrite`. The files matching `link_patterns` are hardlinked and the others are cloned as reflinks when
+        the filesystem allows it. Otherwise, the local path is removed with `overwrite` and fully copied again.
+        The statistics of the copy, including the number of bytes written, are kept in :attr:`copy_stats`.
+        """
+        if self.is_setup and overwrite and not self.incremental_copy:
             utils.try_rmtree(self.local_path, ignore_errors=True)
         if self.is_remote:
             self._clone_repo()
+        self.copy_src_files()
+    
+    async def copy_to_working_dir_async(self, overwrite=False):
+        r"""
+        Asynchronous version of :meth:`copy_to_working_dir`. The clone of a remote source runs in a git subprocess
+        limited by the `clone` semaphore of :attr:`async_limits` and the file operations run in a thread.
+        """
+        if self.is_setup and overwrite and not self.incremental_copy:
+            await asyncio.to_thread(utils.try_rmtree, self.local_path, ignore_errors=True)
+        if self.is_remote:
+            async with self.async_limits.get_semaphore(AsyncLimits.CLONE):
+                await self._clone_repo_async()
+        await asyncio.to_thread(self.copy_src_files)
+    
+    def copy_src_files(self):
+        r"""
+        Copy the source files to the local path, from the clone of the repo for a remote source. See
+        :meth:`copy_to_working_dir`.
+        """
         if self._src_path is None:
             self._src_path = self._try_find_default_src_dir()
-        shutil.copytree(self.src_path, self.local_path, dirs_exist_ok=True)
+        if self.incremental_copy:
+            self.copy_stats = utils.sync_tree(
+                self.src_path, self.local_path, link_patterns=self.link_patterns, use_reflinks=self.use_reflinks,
+                # A fresh checkout resets the modification times, so the content of the files is compared.
+                compare_hash=self.is_remote,
+            )
+        else:
+            shutil.copytree(self.src_path, self.local_path, dirs_exist_ok=True)
+            self.copy_stats = {"bytes_written": utils.get_dir_size(self.local_path)}
+        self.logging_func(
+            f"Copied {self.src_path} to {self.local_path}: {self.copy_stats['bytes_written']} bytes written."
+        )
+    
+    @property
+    def clone_url(self) -> str:
+        r"""
+        Return the url from which the repo is cloned. A repo on the local filesystem is cloned through the file://
+        transport when the clone is shallow or filtered, since git ignores the depth and the filter of local clones.
+        
+        :return: The url to clone.
+        :rtype: str
+        """
+        if (self.clone_depth or self.clone_filter) and os.path.isdir(self.repo_url):
+            return pathlib.Path(os.path.abspath(self.repo_url)).as_uri()
+        return self.repo_url
+    
+    def get_sparse_checkout_paths(self) -> Optional[List[str]]:
+        r"""
+        Return the directories of the repo to check out: the source path and the additional `sparse_checkout_paths`.
+        The files directly in the parent directories of these paths, like a requirements file, are checked out as
+        well. Return None if the whole repo must be checked out, i.e. if the sparse checkout is disabled or if the
+        source path is not known and has to be searched for in the repo.
+        
+        :return: The paths to check out or None.
+        :rtype: Optional[List[str]]
+        """
+        if not self.sparse_checkout or self._repo_src_path is None:
+            return None
+        return [p.replace(os.sep, "/") for p in [self._repo_src_path, *self.sparse_checkout_paths]]
+    
+    def get_clone_options(self) -> dict:
+        r"""
+        Return the options of `git clone`. By default, only the last commit of the branch is fetched (depth), the
+        blobs are fetched on demand (partial clone filter) and the checkout is deferred to the sparse checkout.
+        
+        :return: The options as keyword arguments of :meth:`git.Repo.clone_from`.
+        :rtype: dict
+        """
+        options = {"branch": self.repo_branch}
+        if self.clone_depth:
+            options["depth"] = self.clone_depth
+        if self.clone_filter:
+            options["filter"] = self.clone_filter
+        if self.get_sparse_checkout_paths() is not None:
+            options["no_checkout"] = True
+        return options
     
     def _clone_repo(self):
         import git
-        if os.path.exists(self.local_repo_tmp_dirpath):
+        if self.git_mirror_cache is not None:
+            self.logging_func(
+                f"Cloning repo {self.repo_name} from the mirror of {self.repo_url} to {self.local_repo_tmp_dirpath}."
+            )
+            self.repo = self.git_mirror_cache.clone(
+                self.repo_url, self.repo_branch, self.local_repo_tmp_dirpath,
+                sparse_checkout_paths=self.get_sparse_checkout_paths(),
+            )
+        elif os.path.exists(self.local_repo_tmp_dirpath):
             self.logging_func(
                 f"No need to clone repo {self.repo_name} from {self.repo_url} to {self.local_repo_tmp_dirpath}."
                 f" Repo already exists."
@@ -138,48 +274,156 @@ class Source:
             self.logging_func(
                 f"Cloning repo {self.repo_name} from {self.repo_url} to {self.local_repo_tmp_dirpath} ..."
             )
-            self.repo = git.Repo.clone_from(self.repo_url, self.local_repo_tmp_dirpath, branch=self.repo_branch)
+            self.repo = git.Repo.clone_from(
+                self.clone_url, self.local_repo_tmp_dirpath, **self.get_clone_options()
+            )
+            sparse_checkout_paths = self.get_sparse_checkout_paths()
+            if sparse_checkout_paths is not None:
+                self.repo.git.sparse_checkout("init", "--cone")
+                self.repo.git.sparse_checkout("set", *sparse_checkout_paths)
             self.logging_func(
                 f"Cloning repo {self.repo_name} from {self.repo_url} to {self.local_repo_tmp_dirpath}. Done."
             )
-        self.repo.git.checkout(self.repo_branch)
-        self.repo.git.pull()
-        if self._src_path is None:
-            self._src_path = self._try_find_default_src_dir(root=self.local_repo_tmp_dirpath)
+        if self.git_mirror_cache is None:
+            self.repo.git.checkout(self.repo_branch)
+            self.repo.git.pull()
+        self._set_src_path_in_repo()
+        return self.repo
+    
+    async def _clone_repo_async(self):
+        import git
+        if self.git_mirror_cache is not None:
+            # The mirror cache synchronizes the processes with blocking file locks.
+            return await asyncio.to_thread(self._clone_repo)
+        repo_path = self.local_repo_tmp_dirpath
+        if os.path.exists(repo_path):
+            self.logging_func(
+                f"No need to clone repo {self.repo_name} from {self.repo_url} to {repo_path}. Repo already exists."
+            )
         else:
-            self._src_path = os.path.join(self.local_repo_tmp_dirpath, self.src_path)
+            self.logging_func(f"Cloning repo {self.repo_name} from {self.repo_url} to {repo_path} ...")
+            clone_args = [
+                f"--{name.replace('_', '-')}" if value is True else f"--{name.replace('_', '-')}={value}"
+                for name, value in self.get_clone_options().items()
+            ]
+            await self._run_git_async("clone", *clone_args, self.clone_url, repo_path)
+            sparse_checkout_paths = self.get_sparse_checkout_paths()
+            if sparse_checkout_paths is not None:
+                await self._run_git_async("-C", repo_path, "sparse-checkout", "init", "--cone")
+                await self._run_git_async("-C", repo_path, "sparse-checkout", "set", *sparse_checkout_paths)
+            self.logging_func(f"Cloning repo {self.repo_name} from {self.repo_url} to {repo_path}. Done.")
+        await self._run_git_async("-C", repo_path, "checkout", self.repo_branch)
+        await self._run_git_async("-C", repo_path, "pull")
+        self.repo = git.Repo(repo_path)
+        self._set_src_path_in_repo()
         return self.repo
     
+    async def _run_git_async(self, *args: str) -> str:
+        import git
+        cmd = ["git", *args]
+        returncode, stdout = await run_cmd_async(cmd)
+        if returncode != 0:
+            raise git.GitCommandError(cmd, returncode, stdout)
+        return stdout
+    
+    def _set_src_path_in_repo(self):
+        if self._repo_src_path is None:
+            self._src_path = self._try_find_default_src_dir(root=self.local_repo_tmp_dirpath)
+            if self._src_path is not None:
+                self._repo_src_path = os.path.relpath(self._src_path, self.local_repo_tmp_dirpath)
+        else:
+            self._src_path = os.path.join(self.local_repo_tmp_dirpath, self._repo_src_path)
+    
     def setup_at(self, dst_path: str = None, overwrite=False, **kwargs) -> str:
+        dst_path = self.fetch_at(dst_path, overwrite=overwrite)
+        self.copy_src_files()
+        if kwargs.get("debug", False):
+            self.logging_func(self)
+        return dst_path
+    
+    def fetch_at(self, dst_path: str = None, overwrite=False) -> str:
+        r"""
+        First step of :meth:`setup_at`: set the working directory, clear the previous setup with `overwrite` and
+        clone the repo of a remote source. The source files are then copied with :meth:`copy_src_files`.
+        
+        :return: The working directory.
+        """
         dst_path = dst_path or self.working_dir
         self.working_dir = dst_path
+        self.process_outcomes = []
         if overwrite:
-            self.clear_temporary_files()
-        self.copy_to_working_dir(overwrite=overwrite)
+            self.clear_previous_setup()
+        if self.is_remote:
+            self._clone_repo()
+        return dst_path
+    
+    async def setup_at_async(self, dst_path: str = None, overwrite=False, **kwargs) -> str:
+        r"""
+        Asynchronous version of :meth:`setup_at`.
+        """
+        dst_path = dst_path or self.working_dir
+        self.working_dir = dst_path
+        self.process_outcomes = []
+        if overwrite:
+            await asyncio.to_thread(self.clear_previous_setup)
+        await self.copy_to_working_dir_async(overwrite=overwrite)
         if kwargs.get("debug", False):
             self.logging_func(self)
         return dst_path
     
+    @property
+    def async_limits(self) -> AsyncLimits:
+        return self.kwargs.get("async_limits", None) or get_default_async_limits()
+    
     def send_cmd_to_process(
             self,
             cmd: str,
             timeout: Optional[int] = None,
             **kwargs
     ):
-        fmt_cmd = f"{cmd}" + ('\n' if not cmd.endswith('\n') else '')
-        process = subprocess.Popen(
-            fmt_cmd,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            shell=True,
-            universal_newlines=True,
-            encoding="utf8",
-            errors='ignore',
-            cwd=kwargs.get("cwd", os.path.normpath(self.working_dir))
+        r"""
+        Run a command line through the shell under the :attr:`resource_limits` of the source. The outcome of the
+        command is kept in :attr:`process_outcomes`: a command that reaches a limit is killed with its whole
+        process group instead of hanging.
+        
+        :param cmd: The command to run.
+        :param timeout: The maximum duration of the command in seconds. Default to the timeout of the limits.
+        :return: The stdout and stderr of the command.
+        """
+        outcome = run_governed(
+            cmd, limits=self.get_resource_limits(timeout), cwd=kwargs.get("cwd", os.path.normpath(self.working_dir))
         )
-        stdout, stderr = process.communicate(timeout=timeout)
-        return stdout
+        return self._record_process_outcome(outcome).stdout
+    
+    def get_resource_limits(self, timeout: Optional[float] = None) -> ResourceLimits:
+        if timeout is None:
+            return self.resource_limits
+        return ResourceLimits(timeout, cpu_time=self.resource_limits.cpu_time, memory=self.resource_limits.memory)
+    
+    def _record_process_outcome(self, outcome: ProcessOutcome) -> ProcessOutcome:
+        self.process_outcomes.append(outcome)
+        if not outcome.ok:
+            self.logging_func(f"The command {outcome.cmd} of {self.__class__.__name__} ended with: {outcome.status}.")
+        return outcome
+    
+    async def send_cmd_to_process_async(
+            self,
+            cmd: Union[str, List[str]],
+            timeout: Optional[int] = None,
+            **kwargs
+    ) -> str:
+        r"""
+        Asynchronous version of :meth:`send_cmd_to_process` built on :func:`asyncio.create_subprocess_exec`. The
+        command is either a list of arguments or a command line run through the shell.
+        
+        :param cmd: The command to run.
+        :param timeout: The maximum duration of the command in seconds. Default to the timeout of the limits.
+        :return: The stdout and stderr of the command.
+        """
+        outcome = await run_governed_async(
+            cmd, limits=self.get_resource_limits(timeout), cwd=kwargs.get("cwd", os.path.normpath(self.working_dir))
+        )
+        return self._record_process_outcome(outcome).stdout
     
     def clear_git_repo(self):
         if self.local_repo_tmp_dirpath is None:
@@ -194,11 +438,18 @@ class Source:
                     f"Please remove it manually."
                 )
     
-    def clear_temporary_files(self):
-        if self.is_setup:
+    def clear_temporary_files(self, keep_local_path: bool = False):
+        if self.is_setup and not keep_local_path:
             utils.try_rmtree(self.local_path, ignore_errors=True)
         self.clear_git_repo()
     
+    def clear_previous_setup(self):
+        r"""
+        Clear the files of the previous setup before a new one with `overwrite`. The incremental copy reuses the
+        previous copy of the source files.
+        """
+        self.clear_temporary_files(keep_local_path=self.incremental_copy)
+    
     def extra_repr(self) -> str:
         return ""
     
@@ -242,6 +493,7 @@ class SourceCode(Source):
     }
     DEFAULT_SETUP_CMDS = "pip install -r requirements.txt"
     DEFAULT_RECREATE_VENV = True
+    DEFAULT_SINGLE_SHOT_INSTALL = True
     
     def __init__(self, src_path: Optional[str] = None, *args, **kwargs):
         super().__init__(src_path, *args, **kwargs)
@@ -249,6 +501,17 @@ class SourceCode(Source):
         self.venv = kwargs.get("venv", self.DEFAULT_VENV)
         self.reqs_path = kwargs.get("requirements_path", None)
         self.additional_requirements = kwargs.get("additional_requirements", [])
+        self.recreate_venv = kwargs.get("recreate_venv", self.DEFAULT_RECREATE_VENV)
+        venv_cache: Optional[Union[VenvCache, str]] = kwargs.get("venv_cache", None)
+        if isinstance(venv_cache, str):
+            venv_cache = VenvCache(venv_cache)
+        self.venv_cache = venv_cache
+        self.are_requirements_installed = False
+        wheelhouse: Optional[Union[Wheelhouse, str]] = kwargs.get("wheelhouse", None)
+        if isinstance(wheelhouse, str):
+            wheelhouse = Wheelhouse(wheelhouse)
+        self.wheelhouse = wheelhouse
+        self.single_shot_install = kwargs.get("single_shot_install", self.DEFAULT_SINGLE_SHOT_INSTALL)
     
     @property
     def venv_path(self) -> Optional[str]:
@@ -259,6 +522,18 @@ class SourceCode(Source):
     @property
     def is_venv_created(self) -> bool:
         return os.path.exists(self.venv_path)
+    
+    @property
+    def requirements(self) -> List[str]:
+        r"""
+        Return all the requirements of the source code: the ones of the requirements file and the additional ones.
+        
+        :return: The list of requirements.
+        :rtype: List[str]
+        """
+        if self.reqs_path is None:
+            self.reqs_path = self.find_requirements_path()
+        return utils.read_requirements(self.reqs_path) + list(self.additional_requirements)
 
     def add_requirements(self, requirements: List[str]):
         self.additional_requirements.extend(requirements)
@@ -271,44 +546,182 @@ class SourceCode(Source):
     def setup_at(self, dst_path: str = None, overwrite=True, **kwargs):
         dst_path = super().setup_at(dst_path, overwrite=overwrite)
         venv_stdout = self.maybe_create_venv()
-        reqs_stdout = self.install_requirements()
+        reqs_stdout = self.maybe_install_requirements()
         if kwargs.get("debug", False):
             self.logging_func(f"venv_stdout: {venv_stdout}")
             self.logging_func(f"reqs_stdout: {reqs_stdout}")
         return dst_path
     
+    async def setup_at_async(self, dst_path: str = None, overwrite=True, **kwargs):
+        r"""
+        Asynchronous version of :meth:`setup_at`. The venv creation and the installation of the requirements are
+        limited by the `pip` semaphore of :attr:`async_limits`.
+        """
+        dst_path = await super().setup_at_async(dst_path, overwrite=overwrite)
+        async with self.async_limits.get_semaphore(AsyncLimits.PIP):
+            venv_stdout = await self.maybe_create_venv_async()
+            if self.are_requirements_installed:
+                reqs_stdout = "Requirements already installed."
+            else:
+                reqs_stdout = await self.install_requirements_async()
+        if kwargs.get("debug", False):
+            self.logging_func(f"venv_stdout: {venv_stdout}")
+            self.logging_func(f"reqs_stdout: {reqs_stdout}")
+        return dst_path
+    
+    async def maybe_create_venv_async(self):
+        r"""
+        Asynchronous version of :meth:`maybe_create_venv`.
+        """
+        if self.venv_cache is not None or os.path.lexists(self.venv_path):
+            # The venv cache synchronizes the processes with blocking file locks.
+            return await asyncio.to_thread(self.maybe_create_venv)
+        self.are_requirements_installed = False
+        self.logging_func(f"Creating venv at {self.venv_path} ...")
+        stdout = await self.send_cmd_to_process_async(f"python -m venv {self.venv}", cwd=self.working_dir)
+        self.logging_func(f"Creating venv -> Done. stdout: {stdout}")
+        return stdout
+    
     def maybe_create_venv(self):
         stdout = ""
-        if os.path.exists(self.venv_path):
+        self.are_requirements_installed = False
+        if os.path.lexists(self.venv_path):
+            if not self.recreate_venv:
+                self.logging_func(f"Reusing venv {self.venv} at {self.venv_path}.")
+                return stdout
             self.logging_func(f"Recreating venv {self.venv} ...")
-            shutil.rmtree(self.venv_path)
+            self.clear_venv()
+        if self.venv_cache is not None:
+            return self.create_venv_from_cache()
+        return self.create_venv_in_place()
+    
+    def create_venv_in_place(self):
+        stdout = ""
         if not os.path.exists(self.venv_path):
             self.logging_func(f"Creating venv at {self.venv_path} ...")
             stdout = self.send_cmd_to_process(f"python -m venv {self.venv}", cwd=self.working_dir)
             self.logging_func(f"Creating venv -> Done. stdout: {stdout}")
         return stdout
     
-    def get_venv_scripts_folder(self) -> str:
-        return self.VENV_SCRIPTS_FOLDER_BY_OS[sys.platform].format(self.venv_path)
+    def maybe_install_requirements(self):
+        if self.are_requirements_installed:
+            return "Requirements already installed."
+        return self.install_requirements()
+    
+    def get_fingerprint(self) -> Optional[str]:
+        fingerprint = super().get_fingerprint()
+        if fingerprint is None:
+            return None
+        if self.is_remote:
+            return utils.hash_obj(fingerprint, sorted(self.additional_requirements))
+        return utils.hash_obj(fingerprint, sorted(self.requirements))
+    
+    def get_venv_cache_key(self) -> str:
+        return self.venv_cache.make_key(self.requirements)
+    
+    def create_venv_from_cache(self):
+        r"""
+        Link or copy the venv from the venv cache. The venv is built and its requirements are installed in the cache
+        first if needed.
+        
+        :return: The stdout of the build or a message if the venv was found in the cache.
+        """
+        key = self.get_venv_cache_key()
+        stdout = "Venv found in the venv cache."
+        n_outcomes = len(self.process_outcomes)
+        
+        def build_func(venv_path: str) -> str:
+            nonlocal stdout
+            self.logging_func(f"Creating venv at {venv_path} for the venv cache ...")
+            stdout = self.send_cmd_to_process(f"python -m venv {venv_path}", cwd=self.working_dir)
+            stdout += self.install_requirements(python_path=self.get_venv_python_path(venv_path))
+            failed = [o for o in self.process_outcomes[n_outcomes:] if not o.ok or o.returncode]
+            if failed:
+                raise VenvBuildError(
+                    f"The command {failed[0].cmd} ended with: {failed[0].status} (returncode={failed[0].returncode})."
+                )
+            return stdout
+        
+        try:
+            hit = self.venv_cache.get_or_create(key, self.venv_path, build_func)
+        except VenvBuildError as err:
+            # The failed build is not cached: the venv is built again in place so the failure is graded as without
+            # the venv cache.
+            self.logging_func(f"Could not build the venv {key} of the venv cache -> {err}")
+            del self.process_outcomes[n_outcomes:]
+            return self.create_venv_in_place()
+        self.logging_func(f"Venv {self.venv} from the venv cache {key} (hit={hit}) -> Done.")
+        self.are_requirements_installed = True
+        return stdout
+    
+    def get_venv_scripts_folder(self, venv_path: Optional[str] = None) -> str:
+        venv_path = venv_path or self.venv_path
+        return self.VENV_SCRIPTS_FOLDER_BY_OS[sys.platform].format(venv_path)
 
-    def get_venv_python_path(self) -> str:
-        return self.get_venv_module_path("python")
+    def get_venv_python_path(self, venv_path: Optional[str] = None) -> str:
+        return self.get_venv_module_path("python", venv_path=venv_path)
 
-    def get_venv_module_path(self, module_name: str) -> str:
-        return os.path.join(self.get_venv_scripts_folder(), module_name)
+    def get_venv_module_path(self, module_name: str, venv_path: Optional[str] = None) -> str:
+        return os.path.join(self.get_venv_scripts_folder(venv_path), module_name)
     
-    def install_requirements(self):
+    def get_pip_install_args(self, python_path: Optional[str] = None) -> List[str]:
+        r"""
+        Return the arguments of the single pip invocation installing the requirements file and the additional
+        requirements. If a wheelhouse is given, the requirements are resolved from it only.
+        
+        :param python_path: The python interpreter of the venv.
+        :return: The arguments of the pip command.
+        """
+        python_path = python_path or self.get_venv_python_path()
         if self.reqs_path is None:
             self.reqs_path = self.find_requirements_path()
+        args = [python_path, "-m", "pip", "install"]
+        if self.wheelhouse is not None:
+            args += self.wheelhouse.get_install_options()
+        if self.reqs_path is not None:
+            args += ["-r", self.reqs_path]
+        args += list(self.additional_requirements)
+        return args
+    
+    def install_requirements(self, python_path: Optional[str] = None):
+        if not self.single_shot_install:
+            return self.install_requirements_per_package(python_path=python_path)
         if self.reqs_path is None:
+            self.reqs_path = self.find_requirements_path()
+        if self.reqs_path is None and not self.additional_requirements:
             return "No requirements.txt file found."
-        std_out = self.send_cmd_to_process(
-            f"{self.get_venv_python_path()} -m pip install -r {self.reqs_path}",
-            # cwd=self.working_dir
-            cwd=os.getcwd()
-        )
+        return self.send_cmd_to_process(utils.join_cmd(self.get_pip_install_args(python_path)), cwd=os.getcwd())
+    
+    async def install_requirements_async(self, python_path: Optional[str] = None):
+        r"""
+        Asynchronous version of :meth:`install_requirements`.
+        """
+        if not self.single_shot_install:
+            return await asyncio.to_thread(self.install_requirements_per_package, python_path=python_path)
+        if self.reqs_path is None:
+            self.reqs_path = self.find_requirements_path()
+        if self.reqs_path is None and not self.additional_requirements:
+            return "No requirements.txt file found."
+        return await self.send_cmd_to_process_async(self.get_pip_install_args(python_path), cwd=os.getcwd())
+    
+    def install_requirements_per_package(self, python_path: Optional[str] = None):
+        r"""
+        Install the requirements file and then each additional requirement with a separate pip invocation.
+        Prefer :meth:`install_requirements` which resolves all of them at once.
+        """
+        python_path = python_path or self.get_venv_python_path()
+        if self.reqs_path is None:
+            self.reqs_path = self.find_requirements_path()
+        if self.reqs_path is None:
+            std_out = "No requirements.txt file found."
+        else:
+            std_out = self.send_cmd_to_process(
+                f"{python_path} -m pip install -r {self.reqs_path}",
+                # cwd=self.working_dir
+                cwd=os.getcwd()
+            )
         for req in self.additional_requirements:
-            self.send_cmd_to_process(f"{self.get_venv_python_path()} -m pip install {req}",  cwd=os.getcwd())
+            std_out += self.send_cmd_to_process(f"{python_path} -m pip install {req}",  cwd=os.getcwd())
         return std_out
     
     def send_cmd_to_process(
@@ -317,20 +730,46 @@ class SourceCode(Source):
             timeout: Optional[int] = None,
             **kwargs
     ):
+        return super().send_cmd_to_process(self._format_venv_cmd(cmd), timeout=timeout, **kwargs)
+    
+    async def send_cmd_to_process_async(
+            self,
+            cmd: Union[str, List[str]],
+            timeout: Optional[int] = None,
+            **kwargs
+    ) -> str:
+        if isinstance(cmd, str):
+            cmd = self._format_venv_cmd(cmd)
+        return await super().send_cmd_to_process_async(cmd, timeout=timeout, **kwargs)
+    
+    def _format_venv_cmd(self, cmd: str) -> str:
+        r"""
+        Replace the python and pip commands at the start of the command by the ones of the venv if it exists.
+        """
         if self.is_venv_created:
             if cmd.startswith("python"):
                 cmd = cmd.replace("python", self.get_venv_python_path())
             if cmd.startswith("pip"):
                 cmd = cmd.replace("pip", os.path.join(self.get_venv_scripts_folder(), "pip"))
-        return super().send_cmd_to_process(cmd, timeout=timeout, **kwargs)
+        return cmd
     
     def clear_venv(self):
-        if os.path.exists(self.venv_path):
+        if os.path.islink(self.venv_path):
+            os.unlink(self.venv_path)
+        elif os.path.exists(self.venv_path):
             shutil.rmtree(self.venv_path)
     
-    def clear_temporary_files(self):
-        super().clear_temporary_files()
-        self.clear_venv()
+    def clear_temporary_files(self, keep_local_path: bool = False, keep_venv: bool = False):
+        super().clear_temporary_files(keep_local_path=keep_local_path)
+        if not keep_venv:
+            self.clear_venv()
+    
+    def clear_previous_setup(self):
+        r"""
+        Clear the files of the previous setup. The venv is kept if it is not recreated, so it is reused by
+        :meth:`maybe_create_venv`.
+        """
+        self.clear_temporary_files(keep_local_path=self.incremental_copy, keep_venv=not self.recreate_venv)
     
     def extra_repr(self) -> str:
         return f", venv={self.venv_path}, reqs={self.reqs_path}"
@@ -338,6 +777,7 @@ class SourceCode(Source):
 
 class SourceTests(Source):
     DEFAULT_SRC_DIRNAME = "tests"
+    DEFAULT_LOCAL_REPO_TMP_DIRNAME = "tmp_git_tests"
     
     def __init__(self, src_path: Optional[str] = None, *args, **kwargs):
         super().__init__(src_path, *args, **kwargs)
@@ -362,6 +802,7 @@ class SourceTests(Source):
 class SourceMasterCode(SourceCode):
     DEFAULT_VENV = "master_venv"
     DEFAULT_WORKING_DIRNAME = "master_src"
+    DEFAULT_LOCAL_REPO_TMP_DIRNAME = "tmp_git_master_src"
     
     def __init__(self, src_path: Optional[str] = None, *args, **kwargs):
         kwargs.setdefault("working_dirname", self.DEFAULT_WORKING_DIRNAME)
@@ -370,6 +811,7 @@ class SourceMasterCode(SourceCode):
 
 class SourceMasterTests(SourceTests):
     DEFAULT_WORKING_DIRNAME = "master_tests"
+    DEFAULT_LOCAL_REPO_TMP_DIRNAME = "tmp_git_master_tests"
     
     def __init__(self, src_path: Optional[str] = None, *args, **kwargs):
         kwargs.setdefault("working_dirname", self.DEFAULT_WORKING_DIRNAME)
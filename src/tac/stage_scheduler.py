@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+from .async_utils import AsyncLimits
+
+
+class Stage:
+    r"""
+    Named step of a :class:`StageGraph`. A stage runs once all the stages it depends on succeeded and while a slot
+    of its resource class is free in the :class:`StageScheduler`.
+
+    :param name: The name of the stage, unique in its graph.
+    :param func: The function of the stage, called without arguments. Its return value is the result of the stage.
+    :param deps: The names of the stages that must succeed before this one.
+    :param resource: The resource class of the stage, e.g. `pip` or `pytest`, whose limit bounds the number of
+        stages of this class running at the same time.
+    """
+    DEFAULT_RESOURCE = "default"
+
+    def __init__(
+            self,
+            name: str,
+            func: Callable[[], Any],
+            deps: Iterable[str] = (),
+            resource: Optional[str] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.resource = resource or self.DEFAULT_RESOURCE
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name}, deps={self.deps}, resource={self.resource})"
+
+
+class StageGraph:
+    r"""
+    Directed acyclic graph of the stages of a job, e.g. the grading of a submission.
+
+    :param name: The name of the job, used in the logs.
+    :param stages: The initial stages of the graph.
+    """
+    def __init__(self, name: Optional[str] = None, stages: Iterable[Stage] = ()):
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            self.add_stage(stage)
+
+    def add_stage(self, stage: Stage) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError(f"The stage {stage.name} is already in the graph {self.name}.")
+        self.stages[stage.name] = stage
+        return stage
+
+    def add(
+            self,
+            name: str,
+            func: Callable[[], Any],
+            deps: Iterable[str] = (),
+            resource: Optional[str] = None,
+    ) -> Stage:
+        return self.add_stage(Stage(name, func, deps=deps, resource=resource))
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.stages.keys())
+
+    def get_order(self) -> List[str]:
+        r"""
+        Sort the stages so every stage comes after its dependencies. The stages without order constraints keep
+        their insertion order.
+
+        :raises ValueError: If a dependency is missing or if the graph has a cycle.
+        """
+        for stage in self.stages.values():
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(
+                    f"The stage {stage.name} of the graph {self.name} depends on unknown stages {missing}."
+                )
+        order, done = [], set()
+        remaining = list(self.stages.values())
+        while remaining:
+            ready = [stage for stage in remaining if all(dep in done for dep in stage.deps)]
+            if not ready:
+                raise ValueError(f"The stages {[s.name for s in remaining]} of the graph {self.name} form a cycle.")
+            for stage in ready:
+                order.append(stage.name)
+                done.add(stage.name)
+            remaining = [stage for stage in remaining if stage.name not in done]
+        return order
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name}, stages={self.names})"
+
+
+class GraphRun:
+    r"""
+    Outcome of the stages of a :class:`StageGraph` run by a :class:`StageScheduler`.
+
+    :ivar results: The result of each stage that succeeded.
+    :ivar errors: The exception raised by each stage that failed.
+    :ivar skipped: The stages not run because one of their dependencies failed.
+    :ivar durations: The wall time of each stage that ran, in seconds.
+    """
+    def __init__(self, graph: StageGraph):
+        self.graph = graph
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, BaseException] = {}
+        self.skipped: List[str] = []
+        self.durations: Dict[str, float] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and not self.skipped
+
+    def format_errors(self) -> str:
+        return "\n".join(
+            f"Stage {name} failed:\n" + "".join(traceback.format_exception(type(err), err, err.__traceback__))
+            for name, err in self.errors.items()
+        )
+
+    def raise_errors(self):
+        r"""
+        Raise the exception of the first stage that failed, if any.
+        """
+        for err in self.errors.values():
+            raise err
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(graph={self.graph.name}, done={list(self.results)}, "
+            f"errors={list(self.errors)}, skipped={self.skipped})"
+        )
+
+
+class StageScheduler:
+    r"""
+    Run the stages of many graphs at once in a pool of threads. A stage is ready when all its dependencies
+    succeeded, and it starts as soon as a slot of its resource class is free, so the stages bound by different
+    resources overlap across the jobs, e.g. the pip installs of some submissions while the tests of others run. The
+    ready stages start in the order of their graphs, so the first jobs finish first instead of all the jobs
+    progressing at the same pace.
+
+    When a stage fails, the stages depending on it are skipped and the other stages of its graph still run.
+
+    :param limits: The maximum number of stages running at the same time by resource class, e.g.
+        `{"pip": 4, "pytest": 32}`, or the :class:`AsyncLimits` whose limits to use. The classes not given keep
+        their default limit, see :attr:`DEFAULT_LIMITS`.
+    :param max_workers: The number of threads. Default to the sum of the limits.
+    :raises ValueError: If a limit or the number of threads is lower than 1.
+    """
+    IO = "io"
+    DEFAULT_LIMITS = {
+        **AsyncLimits.DEFAULT_LIMITS,
+        IO                    : 2 * (os.cpu_count() or 1),
+        Stage.DEFAULT_RESOURCE: os.cpu_count() or 1,
+    }
+    DEFAULT_LOGGING_FUNC = staticmethod(logging.info)
+
+    def __init__(
+            self,
+            limits: Optional[Union[Mapping[str, int], AsyncLimits]] = None,
+            max_workers: Optional[int] = None,
+            **kwargs
+    ):
+        if isinstance(limits, AsyncLimits):
+            limits = limits.limits
+        self.limits = {**self.DEFAULT_LIMITS, **(limits or {})}
+        invalid_limits = {resource: limit for resource, limit in self.limits.items() if limit is None or limit < 1}
+        if invalid_limits:
+            raise ValueError(f"The limits must be at least 1, got {invalid_limits}.")
+        self.max_workers = max_workers or sum(self.limits.values())
+        if self.max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {self.max_workers}.")
+        self.kwargs = kwargs
+        self.logging_func = kwargs.get("logging_func", self.DEFAULT_LOGGING_FUNC)
+
+    def get_limit(self, resource: str) -> int:
+        return self.limits.get(resource, self.limits[Stage.DEFAULT_RESOURCE])
+
+    def run(self, graphs: Sequence[StageGraph]) -> List[GraphRun]:
+        r"""
+        Run all the stages of the given graphs.
+
+        :param graphs: The graphs to run.
+        :return: The outcome of each graph, in the same order.
+        :raises ValueError: If a graph is invalid. No stage runs in that case.
+        :raises RuntimeError: If pending stages can never start while no stage is running.
+        """
+        orders = [graph.get_order() for graph in graphs]
+        runs = [GraphRun(graph) for graph in graphs]
+        pending = [(i, name) for i, order in enumerate(orders) for name in order]
+        running_by_resource: Dict[str, int] = {}
+        futures = {}
+        lock = threading.Lock()
+
+        def run_stage(i: int, stage: Stage):
+            start = time.perf_counter()
+            try:
+                return stage.func()
+            finally:
+                with lock:
+                    runs[i].durations[stage.name] = time.perf_counter() - start
+
+        def pop_ready():
+            ready, still_pending = [], []
+            for i, name in pending:
+                stage = runs[i].graph.stages[name]
+                if any(dep in runs[i].errors or dep in runs[i].skipped for dep in stage.deps):
+                    runs[i].skipped.append(name)
+                elif not all(dep in runs[i].results for dep in stage.deps):
+                    still_pending.append((i, name))
+                elif running_by_resource.get(stage.resource, 0) < self.get_limit(stage.resource):
+                    running_by_resource[stage.resource] = running_by_resource.get(stage.resource, 0) + 1
+                    ready.append((i, stage))
+                else:
+                    still_pending.append((i, name))
+            pending[:] = still_pending
+            return ready
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or futures:
+                for i, stage in pop_ready():
+                    futures[executor.submit(run_stage, i, stage)] = (i, stage)
+                if not futures:
+                    # The stages depending on failed ones were just skipped, transitively since the pending stages
+                    # are in the order of their graphs, so any stage left could never start.
+                    if pending:
+                        stuck = [f"{runs[i].graph.name}.{name}" for i, name in pending]
+                        raise RuntimeError(f"The stages {stuck} can't start and no stage is running.")
+                    continue
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, stage = futures.pop(future)
+                    running_by_resource[stage.resource] -= 1
+                    err = future.exception()
+                    if err is None:
+                        runs[i].results[stage.name] = future.result()
+                    else:
+                        runs[i].errors[stage.name] = err
+                        self.logging_func(f"Stage {stage.name} of {runs[i].graph.name} failed: {err!r}")
+        return runs
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(limits={self.limits}, max_workers={self.max_workers})"
@@ -0,0 +1,400 @@
+import ast
+import difflib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from . import utils
+
+
+class TestImpactIndex:
+    r"""
+    Index of the dependencies of the tests of the previous runs, used to rerun only the tests impacted by a change.
+
+    The coverage of every test is recorded with the dynamic contexts of pytest-cov and mapped to the functions of the
+    code that the test executed. On the next run, a test is reused without being executed if:
+
+        - it passed;
+        - its test module is unchanged;
+        - every function it executed is unchanged, line for line.
+
+    Any other change (module level code, new or removed files of the code, helpers or conftest of the tests, the
+    environment, ...) makes the whole suite run again, so the merged results match the ones of a full run as long
+    as the tests are deterministic.
+
+    The index is a json file holding, for each suite of tests, the snapshots of the code and of the tests and the
+    outcome and covered lines of every test.
+
+    :param path: The path of the json file of the index.
+    """
+    __test__ = False  # Not a test class for pytest despite its name.
+    FORMAT_VERSION = 1
+    MODULE_SCOPE = "<module>"
+    CONTEXT_PHASES = ("|setup", "|run", "|teardown")
+    REUSABLE_OUTCOMES = ("passed",)
+    TEST_MODULE_PATTERNS = (("test_", ".py"), ("", "_test.py"))
+    SKIP_DIRNAMES = ("__pycache__", ".pytest_cache", ".git")
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.data = {"version": self.FORMAT_VERSION, "suites": {}}
+        self._lock = threading.Lock()
+
+    @property
+    def suites(self) -> Dict[str, dict]:
+        return self.data["suites"]
+
+    def load(self) -> "TestImpactIndex":
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return self
+        if data.get("version") == self.FORMAT_VERSION:
+            self.data = data
+        return self
+
+    def save(self) -> "TestImpactIndex":
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+        return self
+
+    def drop(self, suite: str) -> "TestImpactIndex":
+        with self._lock:
+            self.suites.pop(suite, None)
+        return self
+
+    @staticmethod
+    def hash_bytes(content: bytes) -> str:
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    @classmethod
+    def snapshot_python_file(cls, filepath: str) -> dict:
+        r"""
+        Snapshot a python file: the hash of its content and of each of its lines, the hash of its module level
+        code (the code without the bodies of the functions) and the line range and hash of each function.
+
+        :param filepath: The path of the python file.
+        :return: The snapshot of the file.
+        """
+        with open(filepath, "rb") as f:
+            content = f.read()
+        lines = content.decode("utf-8", errors="replace").splitlines()
+        snapshot = {
+            "hash"     : cls.hash_bytes(content),
+            "lines"    : [cls.hash_bytes(line.encode("utf-8"))[:16] for line in lines],
+            "skeleton" : None,
+            "functions": {},
+        }
+        try:
+            tree = ast.parse("\n".join(lines))
+        except (SyntaxError, ValueError):
+            return snapshot
+        functions = {}
+
+        def visit(node, prefix):
+            for child in ast.iter_child_nodes(node):
+                if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    visit(child, prefix)
+                    continue
+                qualname = f"{prefix}{child.name}"
+                while qualname in functions:
+                    qualname += "'"
+                if not isinstance(child, ast.ClassDef):
+                    functions[qualname] = {
+                        "start": child.lineno,
+                        "end"  : child.end_lineno,
+                        "hash" : cls.hash_bytes("\n".join(lines[child.lineno - 1:child.end_lineno]).encode("utf-8")),
+                    }
+                visit(child, f"{qualname}.")
+
+        visit(tree, "")
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                node.body = []
+        snapshot["skeleton"] = cls.hash_bytes(ast.dump(tree).encode("utf-8"))
+        snapshot["functions"] = functions
+        return snapshot
+
+    @classmethod
+    def snapshot_dir(cls, root: str) -> Dict[str, dict]:
+        r"""
+        Snapshot all the files of a directory. The python files are snapshot with :meth:`snapshot_python_file` and
+        the other files by the hash of their content. The venvs and the cache directories are ignored.
+
+        :param root: The directory to snapshot.
+        :return: The snapshots by path relative to the root.
+        """
+        snapshots = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [
+                d for d in dirnames
+                if d not in cls.SKIP_DIRNAMES and not utils.is_venv_dir(os.path.join(dirpath, d))
+            ]
+            for filename in filenames:
+                if filename.endswith((".pyc", ".pyo")):
+                    continue
+                filepath = os.path.join(dirpath, filename)
+                relpath = os.path.relpath(filepath, root).replace(os.sep, "/")
+                if filename.endswith(".py"):
+                    snapshots[relpath] = cls.snapshot_python_file(filepath)
+                else:
+                    with open(filepath, "rb") as f:
+                        snapshots[relpath] = {"hash": cls.hash_bytes(f.read())}
+        return snapshots
+
+    @classmethod
+    def is_test_module(cls, relpath: str) -> bool:
+        filename = os.path.basename(relpath)
+        return any(
+            filename.startswith(prefix) and filename.endswith(suffix) for prefix, suffix in cls.TEST_MODULE_PATTERNS
+        )
+
+    @classmethod
+    def get_scope(cls, functions: Dict[str, dict], line: int) -> str:
+        r"""
+        Return the qualified name of the innermost function containing the given line, or :attr:`MODULE_SCOPE`.
+        """
+        scope, scope_size = cls.MODULE_SCOPE, None
+        for qualname, function in functions.items():
+            if function["start"] <= line <= function["end"]:
+                size = function["end"] - function["start"]
+                if scope_size is None or size < scope_size:
+                    scope, scope_size = qualname, size
+        return scope
+
+    @staticmethod
+    def get_lines_map(old_lines: List[str], new_lines: List[str]) -> Dict[int, int]:
+        r"""
+        Map the numbers of the lines of an old version of a file to the ones of the same lines in its new version.
+        The lines that changed are absent from the map.
+        """
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        return {
+            old_start + i + 1: new_start + i + 1
+            for old_start, new_start, size in matcher.get_matching_blocks()
+            for i in range(size)
+        }
+
+    def select(
+            self,
+            suite: str,
+            env: str,
+            code_snapshot: Dict[str, dict],
+            tests_snapshot: Dict[str, dict],
+    ) -> Optional[Dict[str, dict]]:
+        r"""
+        Select the tests of the previous run of the suite that are not impacted by the changes.
+
+        :param suite: The name of the suite of tests.
+        :param env: The fingerprint of everything else the outcome of the tests depends on (requirements, ...).
+        :param code_snapshot: The snapshot of the code, see :meth:`snapshot_dir`.
+        :param tests_snapshot: The snapshot of the tests, see :meth:`snapshot_dir`.
+        :return: The previous results of the reusable tests by node id, with their covered lines mapped to the new
+            line numbers, or None if the whole suite must be run.
+        """
+        previous = self.suites.get(suite)
+        if previous is None or previous["env"] != env or set(previous["code"]) != set(code_snapshot):
+            return None
+        changed_scopes: Dict[str, set] = {}
+        lines_maps: Dict[str, Dict[int, int]] = {}
+        for relpath, new in code_snapshot.items():
+            old = previous["code"][relpath]
+            if old["hash"] == new["hash"]:
+                continue
+            if old.get("skeleton") is None or old["skeleton"] != new.get("skeleton"):
+                return None
+            changed_scopes[relpath] = {
+                qualname for qualname, function in old["functions"].items()
+                if new["functions"].get(qualname, {}).get("hash") != function["hash"]
+            }
+            lines_maps[relpath] = self.get_lines_map(old["lines"], new["lines"])
+
+        test_modules = {result["file"] for result in previous["results"].values()}
+        changed_test_modules = set()
+        for relpath in set(previous["tests"]) | set(tests_snapshot):
+            if previous["tests"].get(relpath, {}).get("hash") == tests_snapshot.get(relpath, {}).get("hash"):
+                continue
+            is_new_test_module = relpath not in previous["tests"] and self.is_test_module(relpath)
+            if relpath not in test_modules and not is_new_test_module:
+                return None
+            changed_test_modules.add(relpath)
+
+        reusable = {}
+        for nodeid, result in previous["results"].items():
+            if result["outcome"] not in self.REUSABLE_OUTCOMES or result["file"] in changed_test_modules:
+                continue
+            mapped_lines = self._map_test_lines(result["lines"], previous["code"], changed_scopes, lines_maps)
+            if mapped_lines is not None:
+                reusable[nodeid] = {**result, "lines": mapped_lines}
+        return reusable
+
+    def _map_test_lines(
+            self,
+            test_lines: Dict[str, List[int]],
+            old_code_snapshot: Dict[str, dict],
+            changed_scopes: Dict[str, set],
+            lines_maps: Dict[str, Dict[int, int]],
+    ) -> Optional[Dict[str, List[int]]]:
+        mapped_lines = {}
+        for relpath, lines in test_lines.items():
+            if relpath not in lines_maps:
+                mapped_lines[relpath] = lines
+                continue
+            functions = old_code_snapshot[relpath]["functions"]
+            new_lines = []
+            for line in lines:
+                if self.get_scope(functions, line) in changed_scopes[relpath] or line not in lines_maps[relpath]:
+                    return None
+                new_lines.append(lines_maps[relpath][line])
+            mapped_lines[relpath] = new_lines
+        return mapped_lines
+
+    def record(
+            self,
+            suite: str,
+            env: str,
+            code_snapshot: Dict[str, dict],
+            tests_snapshot: Dict[str, dict],
+            results: Dict[str, dict],
+    ) -> "TestImpactIndex":
+        r"""
+        Record the results of a run of a suite.
+
+        :param suite: The name of the suite of tests.
+        :param env: The fingerprint of the environment of the run, see :meth:`select`.
+        :param code_snapshot: The snapshot of the code.
+        :param tests_snapshot: The snapshot of the tests.
+        :param results: The results of all the tests by node id, see :meth:`get_results`.
+        """
+        with self._lock:
+            self.suites[suite] = {
+                "env"    : env,
+                "code"   : code_snapshot,
+                "tests"  : tests_snapshot,
+                "results": results,
+            }
+        return self
+
+    @classmethod
+    def get_results(
+            cls,
+            report_data: dict,
+            coverage_data: Optional[dict],
+            tests_root: str,
+            code_root: str,
+            coverage_root: str,
+    ) -> Dict[str, dict]:
+        r"""
+        Extract the outcome, the test module and the covered lines of every test of a run.
+
+        :param report_data: The json report of pytest-json-report with the tests.
+        :param coverage_data: The json report of coverage with the contexts of the lines.
+        :param tests_root: The directory of the tests.
+        :param code_root: The directory of the code.
+        :param coverage_root: The directory the paths of the coverage report are relative to.
+        :return: The results by node id.
+        """
+        tests_lines: Dict[str, Dict[str, set]] = {}
+        for filepath, file_data in (coverage_data or {}).get("files", {}).items():
+            relpath = os.path.relpath(os.path.join(coverage_root, filepath), code_root).replace(os.sep, "/")
+            if relpath.startswith(".."):
+                continue
+            for line, contexts in file_data.get("contexts", {}).items():
+                for context in contexts:
+                    nodeid = cls.strip_context_phase(context)
+                    if nodeid:
+                        tests_lines.setdefault(nodeid, {}).setdefault(relpath, set()).add(int(line))
+        results = {}
+        for test in report_data.get("tests", []):
+            nodeid = test["nodeid"]
+            test_module = os.path.join(report_data.get("root", ""), nodeid.split("::")[0])
+            results[nodeid] = {
+                "file"   : os.path.relpath(test_module, tests_root).replace(os.sep, "/"),
+                "outcome": test["outcome"],
+                "lines"  : {
+                    relpath: sorted(lines) for relpath, lines in tests_lines.get(nodeid, {}).items()
+                },
+            }
+        return results
+
+    @classmethod
+    def strip_context_phase(cls, context: str) -> str:
+        for phase in cls.CONTEXT_PHASES:
+            if context.endswith(phase):
+                return context[:-len(phase)]
+        return context
+
+    @classmethod
+    def merge_report_data(cls, report_data: dict, reused: Dict[str, dict]) -> dict:
+        r"""
+        Add the reused tests to the json report of pytest-json-report and recompute its summary as if they had
+        been run.
+        """
+        tests = [test for test in report_data.get("tests", []) if test["nodeid"] not in reused]
+        tests += [{"nodeid": nodeid, "outcome": result["outcome"], "reused": True} for nodeid, result in reused.items()]
+        report_data["tests"] = tests
+        summary = dict(Counter(test["outcome"] for test in tests))
+        summary["total"] = len(tests)
+        # The reused tests were not collected by the session that ran the impacted ones.
+        summary["collected"] = max(report_data.get("summary", {}).get("collected", 0), len(tests))
+        report_data["summary"] = summary
+        return report_data
+
+    @classmethod
+    def merge_coverage_data(
+            cls,
+            coverage_data: dict,
+            reused: Dict[str, dict],
+            code_root: str,
+            coverage_root: str,
+    ) -> dict:
+        r"""
+        Add the lines covered by the reused tests to the json report of coverage and recompute its summaries the
+        way coverage does.
+        """
+        reused_lines: Dict[str, Dict[int, List[str]]] = {}
+        for nodeid, result in reused.items():
+            for relpath, lines in result["lines"].items():
+                for line in lines:
+                    reused_lines.setdefault(relpath, {}).setdefault(line, []).append(f"{nodeid}|run")
+        totals = {"covered_lines": 0, "num_statements": 0}
+        for filepath, file_data in coverage_data.get("files", {}).items():
+            relpath = os.path.relpath(os.path.join(coverage_root, filepath), code_root).replace(os.sep, "/")
+            statements = set(file_data["executed_lines"]) | set(file_data["missing_lines"])
+            file_reused_lines = reused_lines.get(relpath, {})
+            executed = (set(file_data["executed_lines"]) | set(file_reused_lines)) & statements
+            file_data["executed_lines"] = sorted(executed)
+            file_data["missing_lines"] = sorted(statements - executed)
+            if "contexts" in file_data:
+                for line, contexts in file_reused_lines.items():
+                    if line in statements:
+                        file_data["contexts"].setdefault(str(line), []).extend(contexts)
+            cls._update_coverage_summary(file_data["summary"], len(executed), len(statements))
+            totals["covered_lines"] += len(executed)
+            totals["num_statements"] += len(statements)
+        if "totals" in coverage_data:
+            cls._update_coverage_summary(coverage_data["totals"], totals["covered_lines"], totals["num_statements"])
+        return coverage_data
+
+    @staticmethod
+    def _update_coverage_summary(summary: dict, n_executed: int, n_statements: int):
+        percent_covered = 100.0 * n_executed / n_statements if n_statements > 0 else 100.0
+        summary.update({
+            "covered_lines"          : n_executed,
+            "num_statements"         : n_statements,
+            "missing_lines"          : n_statements - n_executed,
+            "percent_covered"        : percent_covered,
+            "percent_covered_display": f"{percent_covered:.0f}",
+        })
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path}, suites={list(self.suites)})"
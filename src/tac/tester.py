@@ -1,16 +1,28 @@
+import asyncio
 import json
 import logging
 import os
 import shutil
+import threading
+import time
 import warnings
 from copy import deepcopy
-from typing import Optional
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 from . import utils
-from .perf_test_case import PEP8TestCase
+from .artifacts import ArtifactManifest
+from .async_utils import AsyncLimits, get_default_async_limits, run_governed_async
+from .lint_cache import LintCache
+from .perf_test_case import PEP8TestCase, TestCase, TestResult, pylint_version
+from .pytest_results import PytestResults
+from .pytest_worker import PytestWorker, PytestWorkerError, get_default_pool, split_options
 from .report import Report
+from .resource_governor import ProcessOutcome, ResourceLimits, format_cmd, run_governed
 from .source import SourceCode, SourceTests
-from .utils import find_filepath, rm_pycache, rm_pyc_files, rm_pytest_cache
+from .stage_scheduler import StageGraph, StageScheduler
+from .test_impact import TestImpactIndex
+from .timings import Timings, add_children_cpu_time
 
 
 class Tester:
@@ -27,9 +39,57 @@ class Tester:
     MASTER_TESTS_RENAME_PATTERN = "{}_master.py"
     DOT_JSON_REPORT_NAME = ".tmp_report.json"
     MASTER_DOT_JSON_REPORT_NAME = ".tmp_master_report.json"
+    COVERAGE_JSON_NAME = "coverage.json"
+    DOT_COVERAGE_KEY = "dot_coverage"
+    COVERAGE_JSON_KEY = "coverage_json"
+    COVERAGE_XML_KEY = "coverage_xml"
+    DOT_REPORT_JSON_KEY = "dot_report_json"
+    MASTER_DOT_REPORT_JSON_KEY = "master_dot_report_json"
+    MASTER_DOT_COVERAGE_KEY = "master_dot_coverage"
+    MASTER_COVERAGE_JSON_KEY = "master_coverage_json"
+    COVERAGE_RC_KEY = "coverage_rc"
+    RESULTS_KEY = "results"
+    MASTER_RESULTS_KEY = "master_results"
+    DESELECT_JSON_KEY = "deselect_json"
+    MASTER_DESELECT_JSON_KEY = "master_deselect_json"
+    ARTIFACTS_FILENAMES = {
+        DOT_COVERAGE_KEY          : ".coverage",
+        COVERAGE_JSON_KEY         : COVERAGE_JSON_NAME,
+        COVERAGE_XML_KEY          : "coverage.xml",
+        DOT_REPORT_JSON_KEY       : DOT_JSON_REPORT_NAME,
+        MASTER_DOT_REPORT_JSON_KEY: MASTER_DOT_JSON_REPORT_NAME,
+        MASTER_DOT_COVERAGE_KEY   : ".master_coverage",
+        MASTER_COVERAGE_JSON_KEY  : "master_coverage.json",
+        COVERAGE_RC_KEY           : ".tmp_coveragerc",
+        DESELECT_JSON_KEY         : ".tmp_deselect.json",
+        MASTER_DESELECT_JSON_KEY  : ".tmp_master_deselect.json",
+        RESULTS_KEY               : ".tmp_results.jsonl",
+        MASTER_RESULTS_KEY        : ".tmp_master_results.jsonl",
+    }
     DEFAULT_REPORT_FILENAME = "report.json"
     DEFAULT_PASSED_RATIO_ZERO_TESTS = 0.0
-    DEFAULT_LOGGING_FUNC = logging.info
+    DEFAULT_LOGGING_FUNC = staticmethod(logging.info)
+    DEFAULT_WARM_WORKERS = False
+    DEFAULT_CONCURRENT_STAGES = True
+    DEFAULT_REUSE_RESULTS = True
+    FINGERPRINTS_METADATA_KEY = "fingerprints"
+    STAGES_METADATA_KEY = "stages"
+    TEST_CASES_METADATA_KEY = "test_cases"
+    PROCESSES_METADATA_KEY = "processes"
+    DEFAULT_TRACE = False
+    TRACE_FILENAME = "trace.json"
+    DEFAULT_INCREMENTAL = False
+    DEFAULT_COVERAGE_BY_STATEMENTS = False
+    DEFAULT_TEST_IMPACT_INDEX_FILENAME = ".test_impact.json"
+    TESTS_SUITE = "tests"
+    MASTER_TESTS_SUITE = "master_tests"
+    IMPACT_PLUGIN_NAME = "_pytest_impact_plugin"
+    RESULTS_PLUGIN_NAME = PytestResults.PLUGIN_NAME
+    DEFAULT_JSON_REPORT = False
+    DEFAULT_TEST_WORKERS = None
+    XDIST_MODULE_NAME = "xdist"
+    # Whether pytest-xdist is installed, by venv state, see :meth:`has_xdist`.
+    _VENVS_WITH_XDIST: Dict[Tuple[str, Optional[int], Tuple[str, ...]], bool] = {}
     
     def __init__(
             self,
@@ -54,71 +114,179 @@ class Tester:
         
         self.test_cases_summary = None
         self.master_test_cases_summary = None
+        self.pep8_results = None
+        self.fingerprints: Dict[str, Optional[str]] = {}
+        self.previous_report: Optional[Report] = None
         self.report_dir = self.kwargs.get("report_dir")
         if self.report_dir is None:
             self.report_dir = os.path.join(os.getcwd(), "report_dir")
+        # The pytest sessions are run from the report directory so the paths must not depend on the cwd.
+        self.report_dir = os.path.abspath(self.report_dir)
         self.report_filepath = self.kwargs.get(
             "report_filepath", os.path.join(self.report_dir, self.DEFAULT_REPORT_FILENAME)
         )
         report_kwargs = report_kwargs or {}
         self.report = Report(report_filepath=self.report_filepath, **report_kwargs)
         self.weights = self.kwargs.get("weights", self.DEFAULT_WEIGHTS)
+        self.test_cases: Dict[str, Tuple[Union[TestCase, Callable], List[str], Optional[str]]] = {}
+        self.test_cases_results: Dict[str, TestResult] = {}
+        for name, test_case in self.kwargs.get("test_cases", {}).items():
+            self.add_test_case(name, test_case, weight=self.weights.get(name, 1.0))
+        self._reused = False
+        self._needs_setup = True
+        self._stages_to_run: List[str] = []
+        self._stages_results: Dict[str, dict] = {}
+        self.process_outcomes: Dict[str, ProcessOutcome] = {}
+        self.timings = Timings(os.path.basename(self.report_dir))
+        self.artifacts = ArtifactManifest(self.report_dir, self.ARTIFACTS_FILENAMES)
+        self._test_impact_index: Optional[TestImpactIndex] = None
     
     @property
     def dot_coverage_path(self):
-        return self._find_temp_filepath(".coverage")
+        return self.artifacts.get(self.DOT_COVERAGE_KEY)
     
     @property
     def coverage_json_path(self):
-        return self._find_temp_filepath("coverage.json")
+        return self.artifacts.get(self.COVERAGE_JSON_KEY)
     
     @property
     def coverage_xml_path(self):
-        return self._find_temp_filepath("coverage.xml")
+        return self.artifacts.get(self.COVERAGE_XML_KEY)
     
     @property
     def dot_report_json_path(self):
-        return self._find_temp_filepath(self.DOT_JSON_REPORT_NAME)
+        return self.artifacts.get(self.DOT_REPORT_JSON_KEY)
     
     @property
     def master_dot_report_json_path(self):
-        return self._find_temp_filepath(self.MASTER_DOT_JSON_REPORT_NAME)
+        return self.artifacts.get(self.MASTER_DOT_REPORT_JSON_KEY)
+    
+    @property
+    def results_path(self):
+        return self.artifacts.get(self.RESULTS_KEY)
+    
+    @property
+    def master_results_path(self):
+        return self.artifacts.get(self.MASTER_RESULTS_KEY)
+    
+    @property
+    def json_report(self) -> bool:
+        return self.kwargs.get("json_report", self.DEFAULT_JSON_REPORT)
+    
+    @property
+    def test_workers(self) -> Optional[Union[int, str]]:
+        return self.kwargs.get("test_workers", self.DEFAULT_TEST_WORKERS)
     
     @property
     def temp_files(self):
-        tmp_files = [
-            self.dot_coverage_path,
-            self.coverage_json_path,
-            self.coverage_xml_path,
-            self.dot_report_json_path,
-            self.master_dot_report_json_path,
-        ]
-        return [f for f in tmp_files if f is not None]
+        return self.artifacts.existing_paths
     
     def get_pytest_plugins_options(
             self,
             add_cov: bool = True,
-            add_json_report: bool = True,
+            add_json_report: Optional[bool] = None,
             json_report_file: Optional[str] = None,
+            coverage_json_key: Optional[str] = None,
             **kwargs
     ):
-        options = []
+        # The artifacts are written at known paths in the report directory so that concurrent sessions don't
+        # overwrite each other's files. The results of the tests are collected by the tac results plugin, the json
+        # report of pytest-json-report is only written on demand.
+        options = ["-p no:cacheprovider", f"-p {self.RESULTS_PLUGIN_NAME}"]
+        if add_json_report is None:
+            add_json_report = self.json_report
+        coverage_json_key = coverage_json_key or self.COVERAGE_JSON_KEY
         if add_cov:
-            options += [
-                f"--cov={self.code_src.local_path}",
-                "--cov-report=json",
-                "-p no:cacheprovider",
-            ]
+            options += [f"--cov={self.code_src.local_path}"]
+            if self.incremental:
+                # The coverage of the reused tests is merged in the json report.
+                options += [f"--cov-report=json:{self.artifacts.get_path(coverage_json_key)}"]
+            else:
+                # The coverage is read from the data file, so no report is written.
+                options += ["--cov-report="]
+            if self.incremental:
+                # The coverage of each test is recorded to know which tests a change impacts.
+                options += ["--cov-context=test", f"--cov-config={self.write_coverage_rc()}"]
         if add_json_report:
             json_report_file = json_report_file or self.DOT_JSON_REPORT_NAME
             options += [
                 "--json-report",
-                f"--json-report-file={json_report_file}",
-                f"--json-report-summary",
+                f"--json-report-file={os.path.join(self.artifacts.root, json_report_file)}",
                 f"--json-report-indent=4",
+                "--json-report-summary",
             ]
+        if self.incremental:
+            options += [f"-p {self.IMPACT_PLUGIN_NAME}"]
         return options
     
+    @staticmethod
+    def get_venv_state(venv_src: SourceCode) -> Tuple[str, Optional[int], Tuple[str, ...]]:
+        r"""
+        Identify the content of the venv of the given source: its real path, the creation time of its pyvenv.cfg
+        file, which changes when the venv is recreated, and its requirements.
+        """
+        venv_path = os.path.realpath(venv_src.venv_path)
+        try:
+            created = os.stat(os.path.join(venv_path, "pyvenv.cfg")).st_mtime_ns
+        except OSError:
+            created = None
+        return venv_path, created, tuple(sorted(venv_src.requirements))
+    
+    def has_xdist(self, venv_src: SourceCode) -> bool:
+        r"""
+        Return whether pytest-xdist is installed in the venv of the given source. The interpreter of the venv looks
+        for it in isolated mode under the :attr:`resource_limits`, since the venv holds the requirements of the
+        tested code. The answer is cached by venv for all the testers until the venv is recreated or its
+        requirements change. If the check doesn't end by itself, pytest-xdist is considered missing.
+        """
+        venv_state = self.get_venv_state(venv_src)
+        if venv_state not in self._VENVS_WITH_XDIST:
+            check = (
+                f"import importlib.util, sys; "
+                f"sys.exit(importlib.util.find_spec({self.XDIST_MODULE_NAME!r}) is None)"
+            )
+            outcome = run_governed([venv_src.get_venv_python_path(), "-I", "-c", check], limits=self.resource_limits)
+            if not outcome.ok:
+                self.logging_func(f"Could not look for pytest-xdist in {venv_src.venv_path}: {outcome.status}.")
+                return False
+            self._VENVS_WITH_XDIST[venv_state] = outcome.returncode == 0
+        return self._VENVS_WITH_XDIST[venv_state]
+    
+    def get_xdist_options(self, venv_src: SourceCode) -> List[str]:
+        r"""
+        Return the options distributing the tests of a pytest session across the `test_workers` processes of
+        pytest-xdist, or no option if there is a single worker or if pytest-xdist is not installed in the venv.
+        pytest-cov combines the coverage data of the workers in the data file of the session, so the code coverage
+        is computed the same way.
+        """
+        if self.test_workers in (None, 0, 1, "0", "1"):
+            return []
+        if not self.has_xdist(venv_src):
+            warnings.warn(
+                f"pytest-xdist is not installed in the venv {venv_src.venv_path}, the tests are run in a single "
+                f"process. Add pytest-xdist to the requirements to run them in {self.test_workers} workers.",
+                RuntimeWarning,
+            )
+            return []
+        return [f"-n {self.test_workers}"]
+    
+    def write_coverage_rc(self) -> str:
+        coverage_rc_path = self.artifacts.get_path(self.COVERAGE_RC_KEY)
+        os.makedirs(os.path.dirname(coverage_rc_path), exist_ok=True)
+        with open(coverage_rc_path, "w") as f:
+            f.write("[json]\nshow_contexts = True\n")
+        return coverage_rc_path
+    
+    @property
+    def named_sources(self) -> Dict[str, Union[SourceCode, SourceTests]]:
+        sources = {
+            "code_src"        : self.code_src,
+            "tests_src"       : self.tests_src,
+            "master_code_src" : self.master_code_src,
+            "master_tests_src": self.master_tests_src,
+        }
+        return {name: src for name, src in sources.items() if src is not None}
+    
     @property
     def all_sources(self):
         sources = [self.code_src, self.tests_src, self.master_code_src, self.master_tests_src]
@@ -128,12 +296,6 @@ class Tester:
     def is_setup(self):
         return all([s.is_setup for s in self.all_sources])
     
-    def _find_temp_filepath(self, filename: str):
-        roots = [self.report_dir, os.getcwd()]
-        found_files = [find_filepath(filename, root=root) for root in roots]
-        found_files = [f for f in found_files if f is not None] + [None]
-        return found_files[0]
-    
     def setup_at(self, **kwargs):
         force = kwargs.pop("force_setup", False)
         debug = kwargs.get("debug", False)
@@ -153,104 +315,1007 @@ class Tester:
         return self
     
     def run(self, *args, **kwargs):
+        r"""
+        Grade the sources by running the stages of :meth:`get_stage_graph`. If the option `concurrent_stages` is
+        enabled, the independent stages run at the same time within the limits of `stage_limits`, otherwise they
+        run one after the other.
+        
+        :return: The report.
+        """
+        graph = self.get_stage_graph(**kwargs)
+        max_workers = None if self.kwargs.get("concurrent_stages", self.DEFAULT_CONCURRENT_STAGES) else 1
+        graph_run = StageScheduler(self.stage_limits, max_workers=max_workers, logging_func=self.logging_func).run(
+            [graph]
+        )[0]
+        self.maybe_save_trace()
+        graph_run.raise_errors()
+        return self.report
+    
+    @property
+    def trace_filepath(self) -> Optional[str]:
+        r"""
+        Return the path of the Chrome trace file of the stages if the option `trace` is enabled, None otherwise.
+        """
+        if not self.kwargs.get("trace", self.DEFAULT_TRACE):
+            return None
+        return os.path.join(self.report_dir, self.TRACE_FILENAME)
+    
+    def maybe_save_trace(self) -> Optional[str]:
+        if self.trace_filepath is None or not self.timings.sections:
+            return None
+        return self.timings.save_trace(self.trace_filepath)
+    
+    @property
+    def stage_limits(self) -> Optional[Dict[str, int]]:
+        return self.kwargs.get("stage_limits", None)
+    
+    def get_stage_graph(self, **kwargs) -> StageGraph:
+        r"""
+        Model the grading as a graph of stages that a :class:`StageScheduler` can run together with the stages of
+        other testers:
+        
+            - `prepare`: reuse the previous report if nothing changed and find the stages to run;
+            - `clone`, `copy`: clone the remote sources and copy the sources to the report directory;
+            - `venv`, `install`: create the venvs and install the requirements;
+            - `student_tests`, `coverage`: run the tests on the code and measure the coverage;
+            - `master_tests`: run the master tests on the code;
+            - `lint`: score the PEP8 compliance of the code and of the tests;
+            - a stage for each custom test case, see :meth:`add_test_case`;
+            - `report`: add the results to the report and save it.
+        
+        Every stage of a reused run or of a reused result returns immediately.
+        
+        :param kwargs: The keyword arguments of :meth:`run`.
+        :return: The graph of the stages.
+        """
         self.weights.update(kwargs.pop("weights", {}))
         save_report = kwargs.pop("save_report", True)
         clear_pytest_temporary_files = kwargs.pop("clear_pytest_temporary_files", False)
         clear_temporary_files = kwargs.pop("clear_temporary_files", False)
-        self.setup_at(**kwargs)
-        self._run(**kwargs)
-        if save_report:
-            self.report.save(self.report_filepath)
-        if clear_pytest_temporary_files:
-            self.clear_pytest_temporary_files()
-        if clear_temporary_files:
-            self.clear_temporary_files()
-    
-    def _run(self, **kwargs):
-        self.clear_pycache()
-        self._run_pytest(**kwargs)
-        self.report.add(
-            self.CODE_COVERAGE_KEY,
-            self.get_code_coverage(),
-            weight=self.weights[self.CODE_COVERAGE_KEY],
+        self.timings = Timings(os.path.basename(self.report_dir))
+        graph = StageGraph(name=self.report_dir)
+        graph.add("prepare", partial(self._prepare_stage, **kwargs), resource=StageScheduler.IO)
+        graph.add("clone", partial(self._clone_stage, **kwargs), deps=["prepare"], resource=AsyncLimits.CLONE)
+        graph.add("copy", partial(self._copy_stage, **kwargs), deps=["clone"], resource=StageScheduler.IO)
+        graph.add("venv", self._venv_stage, deps=["copy"], resource=AsyncLimits.PIP)
+        graph.add("install", self._install_stage, deps=["venv"], resource=AsyncLimits.PIP)
+        graph.add(
+            "student_tests", partial(self._student_tests_stage, **kwargs), deps=["install"],
+            resource=AsyncLimits.PYTEST,
         )
-        self.test_cases_summary = deepcopy(self.get_test_cases_summary(self.dot_report_json_path))
-        self.report.add(
-            self.PERCENT_PASSED_KEY,
-            self.test_cases_summary[self.PERCENT_PASSED_KEY],
-            weight=self.weights[self.PERCENT_PASSED_KEY],
+        graph.add("coverage", self._coverage_stage, deps=["student_tests"], resource=StageScheduler.IO)
+        graph.add(
+            "master_tests", partial(self._master_tests_stage, **kwargs), deps=["install"],
+            resource=AsyncLimits.PYTEST,
         )
-        self.report.add(
-            self.PEP8_KEY,
-            self.get_pep8_score(),
-            weight=self.weights[self.PEP8_KEY],
+        graph.add("lint", partial(self._lint_stage, **kwargs), deps=["copy"], resource=AsyncLimits.LINT)
+        for name, (_, deps, resource) in self.test_cases.items():
+            graph.add(name, partial(self._test_case_stage, name), deps=deps, resource=resource)
+        graph.add(
+            "report",
+            partial(
+                self._report_stage,
+                save_report=save_report,
+                clear_pytest_temporary_files=clear_pytest_temporary_files,
+                clear_temporary_files=clear_temporary_files,
+                **kwargs
+            ),
+            deps=[name for name in graph.names],
+            resource=StageScheduler.IO,
         )
+        for stage in graph.stages.values():
+            stage.func = partial(self._run_timed, stage.name, stage.func)
+        return graph
+    
+    def _run_timed(self, name: str, func: Callable, *args, **kwargs):
+        with self.timings.record(name):
+            return func(*args, **kwargs)
+    
+    def _prepare_stage(self, force_setup: bool = False, **kwargs):
+        self._reused = self._reuse_previous_run()
+        self._stages_to_run = [] if self._reused else self.get_stages_to_run()
+        # The custom test cases are not fingerprinted so they need the sources whenever the run is not reused.
+        needs_sources = bool(self._stages_to_run) or (bool(self.test_cases) and not self._reused)
+        self._needs_setup = needs_sources and (force_setup or not self.is_setup)
+    
+    def _clone_stage(self, overwrite: bool = True, **kwargs):
+        if not self._needs_setup:
+            return
+        # Each kind of source clones its repo into its own temporary directory of the report directory, so the
+        # clones fetched here are all still there for the copy stage.
+        for name, src in self.named_sources.items():
+            with self.timings.record(name):
+                src.fetch_at(self.report_dir, overwrite=overwrite)
+    
+    def _copy_stage(self, **kwargs):
+        if self._needs_setup:
+            for name, src in self.named_sources.items():
+                with self.timings.record(name):
+                    src.copy_src_files()
+                if kwargs.get("debug", False):
+                    self.logging_func(src)
+        if not self._reused:
+            self._stages_to_run, self._stages_results = self._start_stages()
+    
+    def _venv_stage(self):
+        if self._needs_setup:
+            for name, src in self.named_sources.items():
+                if isinstance(src, SourceCode):
+                    with self.timings.record(name):
+                        src.maybe_create_venv()
+    
+    def _install_stage(self):
+        if self._needs_setup:
+            for name, src in self.named_sources.items():
+                if isinstance(src, SourceCode):
+                    with self.timings.record(name):
+                        src.maybe_install_requirements()
+    
+    def _student_tests_stage(self, **kwargs):
+        if "tests" in self._stages_to_run:
+            self._run_pytest(**kwargs)
+    
+    def _coverage_stage(self):
+        if "tests" in self._stages_to_run:
+            self._stages_results["tests"] = self._get_tests_stage_results()
+    
+    def _master_tests_stage(self, **kwargs):
+        if "master_tests" in self._stages_to_run:
+            self._stages_results["master_tests"] = self._run_master_tests_stage(**kwargs)
+    
+    def _lint_stage(self, **kwargs):
+        if "pep8" in self._stages_to_run:
+            self._stages_results["pep8"] = self._run_pep8_stage(**kwargs)
+    
+    def _test_case_stage(self, name: str):
+        if not self._reused:
+            self.test_cases_results[name] = self.run_test_case(name)
+    
+    def _report_stage(
+            self,
+            save_report: bool = True,
+            clear_pytest_temporary_files: bool = False,
+            clear_temporary_files: bool = False,
+            **kwargs
+    ):
+        if self._reused:
+            return
+        self._finish_stages(self._stages_to_run, self._stages_results, **kwargs)
+        with self.timings.record("clear_temporary_files"):
+            if clear_pytest_temporary_files:
+                self.clear_pytest_temporary_files()
+            if clear_temporary_files:
+                self.clear_temporary_files()
+        # The timings saved with the report end with the cleanup, the save itself is only in the trace.
+        self.report.timings = self.timings.to_dict()
+        if save_report:
+            self.report.save(self.report_filepath)
+    
+    def add_test_case(
+            self,
+            name: str,
+            test_case: Union[TestCase, Callable[["Tester"], TestCase]],
+            weight: float = 1.0,
+            deps: Iterable[str] = ("copy",),
+            resource: Optional[str] = None,
+    ) -> "Tester":
+        r"""
+        Add a custom metric to the grading. The test case runs as a stage of :meth:`get_stage_graph` and the
+        percent value of its result is added to the report under its name.
+        
+        :param name: The name of the stage and of the value in the report.
+        :param test_case: The test case, or a function building it from the tester once the sources are set up,
+            e.g. `lambda tester: PEP8TestCasePyCodeStyle("pycodestyle", tester.code_src.local_path)`.
+        :param weight: The weight of the value in the report.
+        :param deps: The stages that must run before the test case, e.g. `("install",)` if it needs the venv.
+        :param resource: The resource class of the stage in the :class:`StageScheduler`.
+        :return: The tester.
+        """
+        self.test_cases[name] = (test_case, list(deps), resource)
+        self.weights = {**self.weights, name: weight}
+        return self
+    
+    def run_test_case(self, name: str) -> TestResult:
+        test_case = self.test_cases[name][0]
+        if not isinstance(test_case, TestCase):
+            test_case = test_case(self)
+        return test_case.run()
+    
+    async def run_async(self, *args, **kwargs):
+        r"""
+        Asynchronous version of :meth:`run` to grade many submissions from the same event loop. The clones, the
+        pip installs and the pytest sessions run in subprocesses limited by the semaphores of :attr:`async_limits`
+        and the blocking file operations and lints run in threads.
+        
+        :return: The report.
+        """
+        self.weights.update(kwargs.pop("weights", {}))
+        save_report = kwargs.pop("save_report", True)
+        clear_pytest_temporary_files = kwargs.pop("clear_pytest_temporary_files", False)
+        clear_temporary_files = kwargs.pop("clear_temporary_files", False)
+        self.timings = Timings(os.path.basename(self.report_dir))
+        with self.timings.record("prepare", measure_thread_cpu=False):
+            reused = await asyncio.to_thread(self._reuse_previous_run)
+        if reused:
+            return self.report
+        if self.get_stages_to_run() or self.test_cases:
+            with self.timings.record("setup", measure_thread_cpu=False):
+                await self.setup_at_async(**kwargs)
+        await self._run_async(**kwargs)
+        with self.timings.record("clear_temporary_files", measure_thread_cpu=False):
+            if clear_pytest_temporary_files:
+                await asyncio.to_thread(self.clear_pytest_temporary_files)
+            if clear_temporary_files:
+                await asyncio.to_thread(self.clear_temporary_files)
+        self.report.timings = self.timings.to_dict()
+        if save_report:
+            await asyncio.to_thread(self.report.save, self.report_filepath)
+        await asyncio.to_thread(self.maybe_save_trace)
+        return self.report
+    
+    @property
+    def async_limits(self) -> AsyncLimits:
+        return self.kwargs.get("async_limits", None) or get_default_async_limits()
+    
+    async def setup_at_async(self, **kwargs):
+        r"""
+        Asynchronous version of :meth:`setup_at`. The sources are set up one after the other, like the clone and copy
+        stages of :meth:`run`.
+        """
+        force = kwargs.pop("force_setup", False)
+        if self.is_setup and (not force):
+            return self
+        for name, src in self.named_sources.items():
+            with self.timings.record(name, measure_thread_cpu=False):
+                await src.setup_at_async(self.report_dir, **kwargs)
+        return self
+    
+    def _reuse_previous_run(self) -> bool:
+        r"""
+        Load the previous report if the option `reuse_results` is enabled and reuse it as is if nothing changed.
         
+        :return: True if the previous report was reused.
+        """
+        if self.reuse_results:
+            self.fingerprints = self.get_fingerprints()
+            self.previous_report = self.load_previous_report()
+        if not self._is_previous_run_reusable():
+            return False
+        self.logging_func(f"Nothing changed since the report {self.report_filepath}, reusing it.")
+        self.report = self.previous_report
+        self._restore_stages_attributes(self.report.metadata.get(self.STAGES_METADATA_KEY, {}))
+        return True
+    
+    @property
+    def reuse_results(self) -> bool:
+        return self.kwargs.get("reuse_results", self.DEFAULT_REUSE_RESULTS)
+    
+    @property
+    def stages_names(self) -> List[str]:
+        names = ["tests", "pep8"]
         if self.master_tests_src is not None:
-            self.master_tests_src.rename_test_files(pattern=self.MASTER_TESTS_RENAME_PATTERN)
-            self._run_master_pytest(**kwargs)
-            self.master_test_cases_summary = deepcopy(self.get_test_cases_summary(self.master_dot_report_json_path))
-            self.report.add(
-                self.MASTER_PERCENT_PASSED_KEY,
-                self.master_test_cases_summary[self.PERCENT_PASSED_KEY],
-                weight=self.weights[self.MASTER_PERCENT_PASSED_KEY],
+            names.append("master_tests")
+        return names
+    
+    def get_fingerprints(self) -> Dict[str, Optional[str]]:
+        r"""
+        Compute the fingerprint of the whole run and of each stage from the content of their inputs. A fingerprint
+        is None if one of its inputs could not be fingerprinted, in which case it never matches.
+        
+        :return: The fingerprints by stage name and the fingerprint of the run under the key "run".
+        """
+        from . import __version__
+        sources = {
+            "code"        : self.code_src,
+            "tests"       : self.tests_src,
+            "master_code" : self.master_code_src,
+            "master_tests": self.master_tests_src,
+        }
+        sources_fingerprints = {
+            name: (src.get_fingerprint() if src is not None else "") for name, src in sources.items()
+        }
+        stages_inputs = {
+            "tests"       : ["code", "tests"],
+            "pep8"        : ["code", "tests"],
+            "master_tests": ["code", "master_code", "master_tests"],
+        }
+        # The resource limits change the outcome of the processes, e.g. a test that passes without a timeout.
+        limits = sorted(self.resource_limits.to_dict().items())
+        stages_options = {
+            "tests"       : [self.coverage_by_statements, limits],
+            "pep8"        : [PEP8TestCase.MAX_LINE_LENGTH, PEP8TestCase.STATS_KEYS, pylint_version],
+            "master_tests": [limits],
+        }
+        
+        def combine(*parts):
+            if any(part is None for part in parts):
+                return None
+            return utils.hash_obj(__version__, *parts)
+        
+        fingerprints = {
+            stage: combine(stage, stages_options.get(stage, []), *[sources_fingerprints[k] for k in inputs])
+            for stage, inputs in stages_inputs.items()
+        }
+        # The run also depends on the options of each stage, e.g. `coverage_by_statements`.
+        fingerprints["run"] = combine(
+            "run", sorted(self.weights.items()), self.get_test_cases_state(), limits,
+            *[sources_fingerprints[k] for k in sorted(sources)],
+            *[fingerprints[stage] for stage in sorted(stages_inputs)]
+        )
+        return fingerprints
+    
+    def get_test_cases_state(self) -> Optional[Dict[str, list]]:
+        r"""
+        Return the state of the custom test cases for the fingerprint of the run, so a change of their parameters,
+        of their expected values or of their code invalidates the previous report, not only a change of their names.
+        
+        :return: The state of each test case with its dependencies and its resource class, or None if one of them
+            could not be fingerprinted.
+        """
+        try:
+            return {
+                name: [utils.get_obj_state(test_case), deps, resource]
+                for name, (test_case, deps, resource) in sorted(self.test_cases.items())
+            }
+        except (ValueError, RecursionError) as err:
+            self.logging_func(f"Could not fingerprint the test cases: {err}")
+            return None
+    
+    def get_stage_processes_names(self, stage: str) -> List[str]:
+        r"""
+        Return the names under which the processes whose outcome the results of the given stage depend on are
+        recorded in the report: the pytest session of the stage and the venv and pip install of its source.
+        """
+        if stage == self.TESTS_SUITE:
+            return [self.TESTS_SUITE, "code_src"]
+        if stage == self.MASTER_TESTS_SUITE:
+            return [self.MASTER_TESTS_SUITE, "master_code_src" if self.master_code_src is not None else "code_src"]
+        return []
+    
+    def get_failed_stages(self, processes: Dict[str, List[dict]]) -> List[str]:
+        r"""
+        Return the stages for which a process didn't end by itself, e.g. was killed at a resource limit. Their
+        results must not be reused since they don't depend on the inputs of the stage only.
+        
+        :param processes: The outcomes of the processes by name, as saved in the report.
+        """
+        return [
+            stage for stage in self.stages_names
+            if any(
+                outcome.get("status") != ProcessOutcome.OK
+                for name in self.get_stage_processes_names(stage) for outcome in processes.get(name, [])
             )
+        ]
+    
+    def load_previous_report(self) -> Optional[Report]:
+        if not os.path.exists(self.report_filepath):
+            return None
+        try:
+            return deepcopy(self.report).load(self.report_filepath)
+        except Exception as err:
+            self.logging_func(f"Could not load the previous report {self.report_filepath}: {err}")
+            return None
+    
+    def _is_previous_run_reusable(self) -> bool:
+        if self.previous_report is None or self.fingerprints.get("run") is None:
+            return False
+        previous_fingerprints = self.previous_report.metadata.get(self.FINGERPRINTS_METADATA_KEY, {})
+        if self.get_failed_stages(self.previous_report.metadata.get(self.PROCESSES_METADATA_KEY, {})):
+            return False
+        return previous_fingerprints.get("run") == self.fingerprints["run"]
+    
+    def get_reusable_stage_results(self, stage: str) -> Optional[dict]:
+        r"""
+        Return the results of the given stage in the previous report if the fingerprint of its inputs didn't change.
+        """
+        if self.previous_report is None or self.fingerprints.get(stage) is None:
+            return None
+        previous_fingerprints = self.previous_report.metadata.get(self.FINGERPRINTS_METADATA_KEY, {})
+        if previous_fingerprints.get(stage) != self.fingerprints[stage]:
+            return None
+        if stage in self.get_failed_stages(self.previous_report.metadata.get(self.PROCESSES_METADATA_KEY, {})):
+            return None
+        return self.previous_report.metadata.get(self.STAGES_METADATA_KEY, {}).get(stage)
+    
+    def get_stages_to_run(self) -> List[str]:
+        return [name for name in self.stages_names if self.get_reusable_stage_results(name) is None]
+    
+    def _restore_stages_attributes(self, stages_results: Dict[str, dict]):
+        for results in stages_results.values():
+            self.test_cases_summary = results.get("test_cases_summary", self.test_cases_summary)
+            self.master_test_cases_summary = results.get(
+                "master_test_cases_summary", self.master_test_cases_summary
+            )
+            self.pep8_results = results.get("pep8_results", self.pep8_results)
+    
+    async def _run_async(self, **kwargs):
+        stages_funcs = {
+            "tests"       : self._run_tests_stage_async,
+            "pep8"        : self._run_pep8_stage_async,
+            "master_tests": self._run_master_tests_stage_async,
+        }
+        stages_to_run, stages_results = await asyncio.to_thread(self._start_stages)
+        if stages_to_run:
+            # The sections are named like the stages of the graph of the synchronous runs.
+            sections = {"tests": "student_tests", "pep8": "lint", "master_tests": "master_tests"}
+            stages = {
+                name: partial(self._run_timed_async, sections[name], stages_funcs[name]) for name in stages_to_run
+            }
+            if self.kwargs.get("concurrent_stages", self.DEFAULT_CONCURRENT_STAGES):
+                results = await asyncio.gather(*[stage(**kwargs) for stage in stages.values()])
+                stages_results.update(zip(stages, results))
+            else:
+                for name, stage in stages.items():
+                    stages_results[name] = await stage(**kwargs)
+        for name in self.test_cases:
+            with self.timings.record(name, measure_thread_cpu=False):
+                self.test_cases_results[name] = await asyncio.to_thread(self.run_test_case, name)
+        with self.timings.record("report", measure_thread_cpu=False):
+            await asyncio.to_thread(self._finish_stages, stages_to_run, stages_results, **kwargs)
+    
+    async def _run_timed_async(self, name: str, func: Callable, *args, **kwargs):
+        # The thread of the event loop runs the other coroutines meanwhile, so only the subprocesses are counted.
+        with self.timings.record(name, measure_thread_cpu=False):
+            return await func(*args, **kwargs)
+    
+    def _start_stages(self) -> Tuple[List[str], Dict[str, dict]]:
+        r"""
+        Prepare the report directory for the stages to run.
         
-        self.clear_pycache()
+        :return: The names of the stages to run and the reused results of the other stages.
+        """
+        self.process_outcomes = {}
+        stages_to_run = self.get_stages_to_run()
+        stages_results = {
+            name: self.get_reusable_stage_results(name)
+            for name in self.stages_names if name not in stages_to_run
+        }
+        if stages_results:
+            self.logging_func(f"Reusing the results of the unchanged stages: {list(stages_results)}.")
+        if stages_to_run:
+            self.clear_pycache()
+            if "master_tests" in stages_to_run:
+                self.master_tests_src.rename_test_files(pattern=self.MASTER_TESTS_RENAME_PATTERN)
+        return stages_to_run, stages_results
+    
+    def _finish_stages(self, stages_to_run: List[str], stages_results: Dict[str, dict], **kwargs):
+        r"""
+        Add the results of all the stages to the report and clean the report directory.
+        """
+        self._restore_stages_attributes(stages_results)
+        
+        # The results are added in a fixed order so the report doesn't depend on which stage finished first.
+        results = {}
+        for name in self.stages_names:
+            results.update(stages_results[name])
+        for key in [self.CODE_COVERAGE_KEY, self.PERCENT_PASSED_KEY, self.PEP8_KEY, self.MASTER_PERCENT_PASSED_KEY]:
+            if key in results:
+                self.report.add(key, results[key], weight=self.weights[key])
+        for name, result in self.test_cases_results.items():
+            self.report.add(name, result.percent_value, weight=self.weights.get(name, 1.0))
+        processes = self.get_process_outcomes()
+        failed_stages = self.get_failed_stages(processes)
+        if failed_stages:
+            self.logging_func(f"The results of the stages {failed_stages} won't be reused: a process was killed.")
+        # The fingerprints of the stages whose processes were killed are dropped, so they are run again next time.
+        fingerprints = dict(self.fingerprints)
+        for name in failed_stages + (["run"] if failed_stages else []):
+            fingerprints[name] = None
+        self.report.metadata[self.FINGERPRINTS_METADATA_KEY] = fingerprints
+        self.report.metadata[self.STAGES_METADATA_KEY] = {name: stages_results[name] for name in self.stages_names}
+        self.report.metadata[self.PROCESSES_METADATA_KEY] = processes
+        self.report.metadata[self.TEST_CASES_METADATA_KEY] = {
+            name: {"percent_value": result.percent_value, "message": result.message, "details": result.details}
+            for name, result in self.test_cases_results.items()
+        }
+        
+        if stages_to_run:
+            with self.timings.record("cleanup"):
+                self.move_temp_files_to_report_dir(**kwargs)
+                self.clear_pycache()
+    
+    def _run_tests_stage(self, **kwargs) -> dict:
+        self._run_pytest(**kwargs)
+        return self._get_tests_stage_results()
+    
+    async def _run_tests_stage_async(self, **kwargs) -> dict:
+        await self._run_pytest_suite_async(self.TESTS_SUITE, **kwargs)
+        return await asyncio.to_thread(self._get_tests_stage_results)
+    
+    def _get_tests_stage_results(self) -> dict:
+        self.test_cases_summary = deepcopy(self.get_test_cases_summary(self.results_path))
+        return {
+            self.CODE_COVERAGE_KEY : self.get_code_coverage(),
+            self.PERCENT_PASSED_KEY: self.test_cases_summary[self.PERCENT_PASSED_KEY],
+            "test_cases_summary"   : self.test_cases_summary,
+        }
+    
+    def _run_pep8_stage(self, **kwargs) -> dict:
+        return {self.PEP8_KEY: self.get_pep8_score(), "pep8_results": self.pep8_results}
+    
+    async def _run_pep8_stage_async(self, **kwargs) -> dict:
+        async with self.async_limits.get_semaphore(AsyncLimits.LINT):
+            return await asyncio.to_thread(self._run_pep8_stage, **kwargs)
+    
+    def _run_master_tests_stage(self, **kwargs) -> dict:
+        self._run_master_pytest(**kwargs)
+        return self._get_master_tests_stage_results()
+    
+    async def _run_master_tests_stage_async(self, **kwargs) -> dict:
+        await self._run_pytest_suite_async(self.MASTER_TESTS_SUITE, **kwargs)
+        return await asyncio.to_thread(self._get_master_tests_stage_results)
+    
+    def _get_master_tests_stage_results(self) -> dict:
+        self.master_test_cases_summary = deepcopy(self.get_test_cases_summary(self.master_results_path))
+        return {
+            self.MASTER_PERCENT_PASSED_KEY: self.master_test_cases_summary[self.PERCENT_PASSED_KEY],
+            "master_test_cases_summary"   : self.master_test_cases_summary,
+        }
     
     def _run_pytest(self, **kwargs):
-        options = self.get_pytest_plugins_options(
-            add_cov=True, add_json_report=True, json_report_file=self.DOT_JSON_REPORT_NAME, **kwargs
-        )
-        pytest_path = self.code_src.get_venv_module_path("pytest")
-        cmd = f"{pytest_path} {' '.join(options)} {self.tests_src.local_path}"
-        if kwargs.get("debug", False):
-            self.logging_func(f"os.system: {cmd}")
-        os.system(cmd)
-        self.clear_pycache()
-        self.move_temp_files_to_report_dir(**kwargs)
+        self._run_pytest_suite(self.TESTS_SUITE, **kwargs)
     
     def _run_master_pytest(self, **kwargs):
+        self._run_pytest_suite(self.MASTER_TESTS_SUITE, **kwargs)
+    
+    def get_pytest_suite(self, suite: str, **kwargs) -> Optional[dict]:
+        r"""
+        Return everything needed to run the pytest session of the given suite: the source of the venv, the tests,
+        the options, the environment and the keys of the artifacts. Return None if the suite has no tests.
+        """
+        if suite == self.TESTS_SUITE:
+            return {
+                "venv_src"           : self.code_src,
+                "tests_src"          : self.tests_src,
+                "options"            : self.get_pytest_plugins_options(
+                    add_cov=True, json_report_file=self.DOT_JSON_REPORT_NAME, **kwargs
+                ) + self.get_xdist_options(self.code_src),
+                "env"                : self.get_pytest_env_vars(
+                    deselect_json_key=self.DESELECT_JSON_KEY, results_key=self.RESULTS_KEY
+                ),
+                "results_key"        : self.RESULTS_KEY,
+                "deselect_json_key"  : self.DESELECT_JSON_KEY,
+                "dot_report_json_key": self.DOT_REPORT_JSON_KEY,
+                "coverage_json_key"  : self.COVERAGE_JSON_KEY,
+                "dot_coverage_key"   : self.DOT_COVERAGE_KEY,
+            }
         if self.master_tests_src is None:
+            return None
+        return {
+            "venv_src"           : self.master_venv_src,
+            "tests_src"          : self.master_tests_src,
+            # The incremental runs need the coverage of the master tests to know which ones a change impacts.
+            "options"            : self.get_pytest_plugins_options(
+                add_cov=self.incremental, json_report_file=self.MASTER_DOT_JSON_REPORT_NAME,
+                coverage_json_key=self.MASTER_COVERAGE_JSON_KEY, **kwargs
+            ) + self.get_xdist_options(self.master_venv_src),
+            "env"                : self.get_pytest_env_vars(
+                dot_coverage_key=self.MASTER_DOT_COVERAGE_KEY, deselect_json_key=self.MASTER_DESELECT_JSON_KEY,
+                results_key=self.MASTER_RESULTS_KEY,
+            ),
+            "results_key"        : self.MASTER_RESULTS_KEY,
+            "deselect_json_key"  : self.MASTER_DESELECT_JSON_KEY,
+            "dot_report_json_key": self.MASTER_DOT_REPORT_JSON_KEY,
+            "coverage_json_key"  : self.MASTER_COVERAGE_JSON_KEY,
+            "dot_coverage_key"   : self.MASTER_DOT_COVERAGE_KEY,
+        }
+    
+    def _run_pytest_suite(self, suite: str, **kwargs):
+        pytest_suite = self.get_pytest_suite(suite, **kwargs)
+        if pytest_suite is None:
             return
-        options = self.get_pytest_plugins_options(
-            add_cov=False, add_json_report=True, json_report_file=self.MASTER_DOT_JSON_REPORT_NAME, **kwargs
+        impact = self._select_impacted_tests(suite, pytest_suite["tests_src"], pytest_suite["deselect_json_key"])
+        # The results of a previous session must not be taken for the ones of a session that couldn't start.
+        utils.rm_file(self.artifacts.get_path(pytest_suite["results_key"]))
+        outcome = self._run_pytest_session(
+            pytest_suite["venv_src"], pytest_suite["options"], pytest_suite["tests_src"].local_path,
+            results_file=self.artifacts.get_path(pytest_suite["results_key"]), env=pytest_suite["env"], **kwargs
+        )
+        self._record_process_outcome(suite, outcome, pytest_suite)
+        self._record_impacted_tests(
+            suite, pytest_suite["tests_src"], impact, pytest_suite["results_key"], pytest_suite["coverage_json_key"],
         )
-        pytest_path = self.master_code_src.get_venv_module_path("pytest")
-        cmd = f"{pytest_path} {' '.join(options)} {self.master_tests_src.local_path}"
+    
+    async def _run_pytest_suite_async(self, suite: str, **kwargs):
+        pytest_suite = await asyncio.to_thread(self.get_pytest_suite, suite, **kwargs)
+        if pytest_suite is None:
+            return
+        impact = await asyncio.to_thread(
+            self._select_impacted_tests, suite, pytest_suite["tests_src"], pytest_suite["deselect_json_key"]
+        )
+        utils.rm_file(self.artifacts.get_path(pytest_suite["results_key"]))
+        outcome = await self._run_pytest_session_async(
+            pytest_suite["venv_src"], pytest_suite["options"], pytest_suite["tests_src"].local_path,
+            results_file=self.artifacts.get_path(pytest_suite["results_key"]), env=pytest_suite["env"], **kwargs
+        )
+        self._record_process_outcome(suite, outcome, pytest_suite)
+        await asyncio.to_thread(
+            self._record_impacted_tests, suite, pytest_suite["tests_src"], impact,
+            pytest_suite["results_key"], pytest_suite["coverage_json_key"],
+        )
+    
+    @property
+    def incremental(self) -> bool:
+        return self.kwargs.get("incremental", self.DEFAULT_INCREMENTAL)
+    
+    @property
+    def test_impact_index(self) -> TestImpactIndex:
+        if self._test_impact_index is None:
+            path = self.kwargs.get(
+                "test_impact_index_path", os.path.join(self.report_dir, self.DEFAULT_TEST_IMPACT_INDEX_FILENAME)
+            )
+            self._test_impact_index = TestImpactIndex(path).load()
+        return self._test_impact_index
+    
+    def get_test_impact_env(self, suite: str) -> str:
+        r"""
+        Return the fingerprint of what the outcome of the tests of the given suite depends on, apart from the code
+        and the tests themselves. The whole suite is run again when it changes.
+        """
+        from . import __version__
+        venv_src = self.master_venv_src if suite == self.MASTER_TESTS_SUITE else self.code_src
+        parts = [__version__, suite, sorted(venv_src.requirements)]
+        if suite == self.MASTER_TESTS_SUITE and self.master_code_src is not None:
+            parts.append(self.master_code_src.get_fingerprint())
+        return utils.hash_obj(*parts)
+    
+    def _select_impacted_tests(self, suite: str, tests_src: SourceTests, deselect_json_key: str) -> Optional[dict]:
+        r"""
+        Select the tests of the suite impacted by the changes since the previous run and write the node ids of the
+        others in the deselect file read by the impact plugin.
+        
+        :return: The snapshots and the reused results of the run, or None if the run is not incremental.
+        """
+        deselect_json_path = self.artifacts.get_path(deselect_json_key)
+        utils.rm_file(deselect_json_path)
+        if not self.incremental:
+            return None
+        impact = {
+            "env"           : self.get_test_impact_env(suite),
+            "code_snapshot" : TestImpactIndex.snapshot_dir(self.code_src.local_path),
+            "tests_snapshot": TestImpactIndex.snapshot_dir(tests_src.local_path),
+        }
+        reused = self.test_impact_index.select(
+            suite, impact["env"], impact["code_snapshot"], impact["tests_snapshot"]
+        )
+        impact["reused"] = reused or {}
+        if reused is None:
+            self.logging_func(f"Running all the {suite}: no reusable previous run.")
+        else:
+            self.logging_func(f"Running the impacted {suite} only: reusing the results of {len(reused)} tests.")
+            os.makedirs(self.report_dir, exist_ok=True)
+            with open(deselect_json_path, "w") as f:
+                json.dump(sorted(reused), f)
+        return impact
+    
+    def _record_impacted_tests(
+            self,
+            suite: str,
+            tests_src: SourceTests,
+            impact: Optional[dict],
+            results_key: str,
+            coverage_json_key: str,
+    ):
+        r"""
+        Merge the results of the reused tests into the results and the json coverage report of the run so they
+        match the ones of a full run and record the results of all the tests in the test impact index.
+        """
+        if impact is None:
+            return
+        results_path = self.artifacts.get(results_key)
+        coverage_json_path = self.artifacts.get(coverage_json_key)
+        if results_path is None or coverage_json_path is None:
+            self.test_impact_index.drop(suite).save()
+            return
+        report_data = PytestResults.load(results_path)
+        with open(coverage_json_path, "r") as f:
+            coverage_data = json.load(f)
+        reused = impact["reused"]
+        # Pytest exits with 5 when no test is run, e.g. when all the tests are reused.
+        ok_exit_codes = (0, 1, 5) if reused else (0, 1)
+        if report_data.get("exitcode") not in ok_exit_codes or any(
+                collector.get("outcome") != "passed" for collector in report_data.get("collectors", [])
+        ):
+            # The results of a run interrupted by an error are not reliable enough to be reused.
+            self.test_impact_index.drop(suite).save()
+            return
+        if reused:
+            report_data = TestImpactIndex.merge_report_data(report_data, reused)
+            coverage_data = TestImpactIndex.merge_coverage_data(
+                coverage_data, reused, self.code_src.local_path, self.report_dir
+            )
+            PytestResults.save(results_path, report_data)
+            with open(coverage_json_path, "w") as f:
+                json.dump(coverage_data, f)
+        results = TestImpactIndex.get_results(
+            report_data, coverage_data, tests_src.local_path, self.code_src.local_path, self.report_dir
+        )
+        results.update(reused)
+        self.test_impact_index.record(
+            suite, impact["env"], impact["code_snapshot"], impact["tests_snapshot"], results
+        ).save()
+    
+    @property
+    def master_venv_src(self) -> SourceCode:
+        r"""
+        Return the source whose venv runs the master tests: the master code if given, the code otherwise.
+        """
+        return self.master_code_src if self.master_code_src is not None else self.code_src
+    
+    @property
+    def use_warm_workers(self) -> bool:
+        return self.kwargs.get("warm_workers", self.DEFAULT_WARM_WORKERS) and PytestWorker.is_supported()
+    
+    def _run_pytest_session(
+            self,
+            venv_src: SourceCode,
+            options: List[str],
+            tests_path: str,
+            results_file: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None,
+            **kwargs
+    ):
+        r"""
+        Run a pytest session with the venv of the given source from the report directory, either in a new process
+        or in a child of a warm pytest worker if the option `warm_workers` is enabled.
+        """
+        if env is None:
+            env = self.get_pytest_env_vars()
+        if self.use_warm_workers:
+            args = split_options(options) + [tests_path]
+            os.makedirs(self.report_dir, exist_ok=True)
+            acquire_worker = get_default_pool().acquire(
+                venv_src.venv_path, venv_src.get_venv_python_path(), self.kwargs.get("preload_modules")
+            )
+            with acquire_worker as worker:
+                if kwargs.get("debug", False):
+                    self.logging_func(f"{worker}.run: {args}")
+                start = time.perf_counter()
+                try:
+                    result = worker.run(
+                        args, cwd=self.report_dir, results_file=results_file, env=env,
+                        timeout=self.resource_limits.timeout, rlimits=self.resource_limits.get_child_rlimits(),
+                    )
+                except TimeoutError:
+                    # The worker and its children were killed.
+                    return ProcessOutcome(
+                        ProcessOutcome.TIMEOUT, duration=time.perf_counter() - start, cmd=format_cmd(args)
+                    )
+                except PytestWorkerError as err:
+                    # The worker died during the session, e.g. killed by the tested code or out of memory. The pool
+                    # drops it and the next session starts a new one.
+                    return ProcessOutcome(
+                        ProcessOutcome.CRASH, duration=time.perf_counter() - start,
+                        stdout=f"{type(err).__name__}: {err}", cmd=format_cmd(args),
+                    )
+            returncode = -result["signal"] if "signal" in result else result.get("exit_code")
+            add_children_cpu_time(result.get("cpu_time"))
+            return ProcessOutcome.from_returncode(
+                returncode, duration=time.perf_counter() - start, cmd=format_cmd(args), cpu_time=result.get("cpu_time")
+            )
+        args = [venv_src.get_venv_module_path("pytest"), *split_options(options), tests_path]
         if kwargs.get("debug", False):
-            self.logging_func(f"os.system: {cmd}")
-        os.system(cmd)
-        self.clear_pycache()
-        self.move_temp_files_to_report_dir(**kwargs)
+            self.logging_func(f"run_governed: {args}")
+        return self._run_cmd_in_report_dir(args, env=env)
+    
+    async def _run_pytest_session_async(
+            self,
+            venv_src: SourceCode,
+            options: List[str],
+            tests_path: str,
+            results_file: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None,
+            **kwargs
+    ):
+        r"""
+        Asynchronous version of :meth:`_run_pytest_session` limited by the `pytest` semaphore of
+        :attr:`async_limits`.
+        """
+        if env is None:
+            env = self.get_pytest_env_vars()
+        async with self.async_limits.get_semaphore(AsyncLimits.PYTEST):
+            if self.use_warm_workers:
+                return await asyncio.to_thread(
+                    self._run_pytest_session, venv_src, options, tests_path, results_file, env=env, **kwargs
+                )
+            args = [venv_src.get_venv_module_path("pytest"), *split_options(options), tests_path]
+            if kwargs.get("debug", False):
+                self.logging_func(f"run_governed_async: {args}")
+            os.makedirs(self.report_dir, exist_ok=True)
+            return await run_governed_async(
+                args, limits=self.resource_limits, cwd=self.report_dir, env={**os.environ, **env},
+                capture_output=False,
+            )
+    
+    def get_pytest_env_vars(
+            self,
+            dot_coverage_key: Optional[str] = None,
+            deselect_json_key: Optional[str] = None,
+            results_key: Optional[str] = None,
+    ) -> Dict[str, str]:
+        r"""
+        Return the environment variables of the pytest sessions. They set the path of the coverage data file
+        which can't be given as an option of pytest-cov and the optional bytecode prefix. They also make the plugins
+        of tac importable and give the results plugin its results file. In incremental mode, they give the impact
+        plugin its deselect file.
+        """
+        env = {"COVERAGE_FILE": self.artifacts.get_path(dot_coverage_key or self.DOT_COVERAGE_KEY)}
+        if self.pycache_prefix is not None:
+            env["PYTHONPYCACHEPREFIX"] = self.pycache_prefix
+        plugins_dir = self.install_plugins()
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [plugins_dir, os.environ.get("PYTHONPATH")]))
+        env[PytestResults.FILE_ENV_VAR] = self.artifacts.get_path(results_key or self.RESULTS_KEY)
+        if self.incremental:
+            env["TAC_DESELECT_FILE"] = self.artifacts.get_path(deselect_json_key or self.DESELECT_JSON_KEY)
+        return env
+    
+    def install_plugins(self) -> str:
+        r"""
+        Copy the pytest plugins of tac alone in a directory of the report directory. The directory of the plugins is
+        added to the python path of the pytest sessions, so it must not contain anything that could shadow the
+        modules of the tested code.
+        
+        :return: The directory of the plugins.
+        """
+        plugins_dir = os.path.join(self.report_dir, ".tac_plugins")
+        os.makedirs(plugins_dir, exist_ok=True)
+        for plugin_name in [self.RESULTS_PLUGIN_NAME, self.IMPACT_PLUGIN_NAME]:
+            plugin_filename = f"{plugin_name}.py"
+            # The plugin is replaced atomically since the concurrent sessions may import it at the same time.
+            tmp_path = os.path.join(plugins_dir, f".{plugin_filename}.{os.getpid()}.{threading.get_ident()}.tmp")
+            shutil.copyfile(os.path.join(os.path.dirname(os.path.abspath(__file__)), plugin_filename), tmp_path)
+            os.replace(tmp_path, os.path.join(plugins_dir, plugin_filename))
+        return plugins_dir
+    
+    def _run_cmd_in_report_dir(
+            self,
+            cmd: Union[str, List[str]],
+            env: Optional[Dict[str, str]] = None,
+    ) -> ProcessOutcome:
+        r"""
+        Run a command from the report directory under the :attr:`resource_limits`. This way the temporary files
+        written by pytest and its plugins in the cwd are isolated from the ones of any other tester running at the
+        same time.
+        """
+        os.makedirs(self.report_dir, exist_ok=True)
+        if env is not None:
+            env = {**os.environ, **env}
+        return run_governed(cmd, limits=self.resource_limits, cwd=self.report_dir, env=env, capture_output=False)
+    
+    @property
+    def resource_limits(self) -> ResourceLimits:
+        return ResourceLimits.from_value(self.kwargs.get("resource_limits", None))
+    
+    def _record_process_outcome(self, suite: str, outcome: ProcessOutcome, pytest_suite: dict):
+        r"""
+        Keep the outcome of the pytest session of the given suite. If the session didn't end by itself, its reports
+        are removed so the suite is graded as if it had no result instead of with stale or partial ones.
+        """
+        self.process_outcomes[suite] = outcome
+        if outcome.ok:
+            return
+        self.logging_func(f"The pytest session of the {suite} ended with: {outcome.status}.")
+        if outcome.returncode is None and outcome.stdout:
+            self.logging_func(outcome.stdout)
+        for key in ["results_key", "dot_report_json_key", "coverage_json_key", "dot_coverage_key"]:
+            key = pytest_suite[key]
+            utils.rm_file(self.artifacts.get_path(key))
+    
+    def get_process_outcomes(self) -> Dict[str, List[dict]]:
+        r"""
+        Return the outcomes of the pytest sessions and of the commands of the sources (venvs and pip installs) of
+        the current run, by suite and by source.
+        """
+        outcomes = {suite: [outcome.to_dict()] for suite, outcome in self.process_outcomes.items()}
+        for name, src in self.named_sources.items():
+            if src.process_outcomes:
+                outcomes.setdefault(name, []).extend(outcome.to_dict() for outcome in src.process_outcomes)
+        return outcomes
+    
+    @property
+    def coverage_by_statements(self) -> bool:
+        return self.kwargs.get("coverage_by_statements", self.DEFAULT_COVERAGE_BY_STATEMENTS)
     
     def get_code_coverage(self) -> float:
         r"""
-        Use pytest-cov to get code coverage of the code source using the tests source.
+        Use pytest-cov to get code coverage of the code source using the tests source. The code coverage is the mean
+        of the percentages of covered statements of the python files of the code source or, with the option
+        `coverage_by_statements`, the percentage of covered statements of all these files together.
         
         :return: code coverage
         :rtype: float
         """
         try:
-            coverage_file = utils.reindent_json_file(self.coverage_json_path)
-            coverage_data = json.load(open(coverage_file))
+            if self.incremental:
+                files_counts = self.get_coverage_counts_from_json()
+            else:
+                files_counts = self.get_coverage_counts_from_data()
         except Exception as err:
-            warnings.warn(f"Could not reindent or load {self.coverage_json_path=} -> {err}")
+            warnings.warn(f"Could not load the coverage of {self.code_src.local_path} -> {err}")
+            return 0.0
+        if len(files_counts) == 0:
             return 0.0
-        summaries = [
-            d["summary"]
-            for f, d in coverage_data["files"].items()
-            if f.endswith(".py") and utils.is_subpath_in_path(self.code_src.local_path, f)
+        # A file without statements is fully covered, as in the reports of coverage.
+        if self.coverage_by_statements:
+            n_statements = sum(n_statements for n_statements, _ in files_counts.values())
+            n_covered = sum(n_covered for _, n_covered in files_counts.values())
+            return 100.0 * n_covered / n_statements if n_statements > 0 else 100.0
+        percents_covered = [
+            100.0 * n_covered / n_statements if n_statements > 0 else 100.0
+            for n_statements, n_covered in files_counts.values()
         ]
-        mean_percent_covered = sum([s["percent_covered"] for s in summaries]) / len(summaries)
-        return mean_percent_covered
-    
-    def get_test_cases_summary(self, dot_report_json_path: Optional[str] = None):
-        dot_report_json_path = dot_report_json_path or self.dot_report_json_path
-        json_plugin_report_data = json.load(open(dot_report_json_path))
-        passed_tests = json_plugin_report_data["summary"].get("passed", 0)
-        failed_tests = json_plugin_report_data["summary"].get("failed", 0)
-        total_tests = json_plugin_report_data["summary"]["total"]
+        return sum(percents_covered) / len(percents_covered)
+    
+    def get_coverage_counts_from_data(self) -> Dict[str, Tuple[int, int]]:
+        r"""
+        Read the numbers of statements and of covered statements of each python file of the code source from the
+        coverage data file of the tests through the API of coverage. The files never imported by the tests are
+        found the same way as coverage does for its reports, with no covered statement.
+        
+        :return: The numbers of statements and of covered statements by file path.
+        """
+        import coverage
+        from coverage.files import find_python_files
+        
+        if self.dot_coverage_path is None:
+            raise FileNotFoundError(f"The coverage data file of the tests does not exist in {self.report_dir}.")
+        code_root = os.path.abspath(self.code_src.local_path)
+        cov = coverage.Coverage(data_file=self.dot_coverage_path, config_file=False)
+        cov.load()
+        filepaths = {os.path.abspath(f) for f in cov.get_data().measured_files()}
+        try:
+            filepaths.update(find_python_files(code_root, False))
+        except TypeError:
+            # The versions of coverage before 6.4 don't have the option of the namespace packages.
+            filepaths.update(find_python_files(code_root))
+        files_counts = {}
+        for filepath in sorted(filepaths):
+            if not filepath.endswith(".py") or not filepath.startswith(code_root + os.sep):
+                continue
+            try:
+                _, statements, _, missing, _ = cov.analysis2(filepath)
+            except Exception as err:
+                # E.g. a file that is not valid python, which can't have been covered either.
+                warnings.warn(f"Could not analyse the coverage of {filepath} -> {err}")
+                continue
+            files_counts[filepath] = (len(statements), len(statements) - len(missing))
+        return files_counts
+    
+    def get_coverage_counts_from_json(self) -> Dict[str, Tuple[int, int]]:
+        r"""
+        Read the numbers of statements and of covered statements of each python file of the code source from the
+        json coverage report of the tests.
+        
+        :return: The numbers of statements and of covered statements by file path.
+        """
+        if self.coverage_json_path is None:
+            raise FileNotFoundError(f"The json coverage report of the tests does not exist in {self.report_dir}.")
+        with open(self.coverage_json_path, "r") as f:
+            coverage_data = json.load(f)
+        code_root = os.path.abspath(self.code_src.local_path)
+        files_counts = {}
+        # The paths of the files are relative to the report directory from which pytest is run.
+        for f, d in coverage_data["files"].items():
+            filepath = os.path.abspath(os.path.join(self.report_dir, f))
+            if f.endswith(".py") and filepath.startswith(code_root + os.sep):
+                files_counts[filepath] = (d["summary"]["num_statements"], d["summary"]["covered_lines"])
+        return files_counts
+    
+    def get_test_cases_summary(self, results_path: Optional[str] = None):
+        r"""
+        Summarize the outcomes of the tests of a pytest session from its results file or from its json report of
+        pytest-json-report.
+        """
+        results_path = results_path or self.results_path
+        if results_path is None or not os.path.exists(results_path):
+            # E.g. the pytest session was killed at a resource limit.
+            warnings.warn(f"The results file {results_path} does not exist, no test is counted.")
+            summary = {"total": 0}
+        else:
+            summary = PytestResults.load(results_path)["summary"]
+        passed_tests = summary.get("passed", 0)
+        failed_tests = summary.get("failed", 0)
+        total_tests = summary["total"]
         if total_tests > 0:
             ratio_passed = passed_tests / total_tests
             ratio_failed = failed_tests / total_tests
@@ -269,15 +1334,38 @@ class Tester:
             "percent_failed"       : percent_failed,
         }
     
+    @property
+    def lint_cache(self) -> Optional[LintCache]:
+        lint_cache = self.kwargs.get("lint_cache", None)
+        if isinstance(lint_cache, str):
+            lint_cache = LintCache(lint_cache)
+            self.kwargs["lint_cache"] = lint_cache
+        return lint_cache
+    
     def get_pep8_score(self):
-        src_test_case = PEP8TestCase(self.PEP8_KEY, self.code_src.local_path)
-        src_test_case_result = src_test_case.run()
-        tests_test_case = PEP8TestCase(self.PEP8_KEY, self.tests_src.local_path)
-        tests_test_case_result = tests_test_case.run()
+        r"""
+        Score the PEP8 compliance of the code and of the tests. Both directories are linted in parallel pylint
+        workers and the structured results are kept in :attr:`pep8_results`.
+        
+        :return: The mean of the scores of the code and of the tests.
+        :rtype: float
+        """
+        src_test_case_result, tests_test_case_result = PEP8TestCase.run_many(
+            self.PEP8_KEY,
+            [self.code_src.local_path, self.tests_src.local_path],
+            lint_cache=self.lint_cache,
+            jobs=self.kwargs.get("lint_jobs", None),
+        )
+        self.pep8_results = {
+            "src"  : src_test_case_result.details,
+            "tests": tests_test_case_result.details,
+        }
         return (src_test_case_result.percent_value + tests_test_case_result.percent_value) / 2.0
     
     def move_temp_files_to_report_dir(self, **kwargs):
         for f in self.temp_files:
+            if os.path.dirname(f) == self.report_dir:
+                continue
             try:
                 shutil.move(f, self.report_dir)
             except shutil.Error as e:
@@ -285,10 +1373,25 @@ class Tester:
                     self.logging_func(f"shutil.move({f},{self.report_dir}) -> raises: {e}")
         return self
     
+    @property
+    def pycache_prefix(self) -> Optional[str]:
+        r"""
+        Return the throwaway directory where the pytest sessions write their bytecode (PYTHONPYCACHEPREFIX) if the
+        option `pycache_prefix` is given. In that case, no bytecode is written in the report directory.
+        """
+        prefix = self.kwargs.get("pycache_prefix", None)
+        if prefix is None:
+            return None
+        return os.path.abspath(prefix)
+    
     def clear_pycache(self):
-        rm_pycache(self.report_dir)
-        rm_pytest_cache(self.report_dir)
-        rm_pyc_files(self.report_dir)
+        if self.pycache_prefix is not None:
+            utils.try_rmtree(self.pycache_prefix)
+            return
+        skip_paths = [
+            src.local_repo_tmp_dirpath for src in self.all_sources if src.working_dir is not None
+        ]
+        utils.clean_tree(self.report_dir, skip_paths=skip_paths)
     
     def clear_pytest_temporary_files(self):
         self.clear_pycache()
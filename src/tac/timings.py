@@ -0,0 +1,162 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+class _Section:
+    def __init__(self, timings: "Timings", name: str):
+        self.timings = timings
+        self.name = name
+        self.children_cpu_time = 0.0
+
+
+_active_sections: contextvars.ContextVar[Tuple[_Section, ...]] = contextvars.ContextVar(
+    "tac_active_sections", default=()
+)
+
+
+def add_children_cpu_time(cpu_time: Optional[float]):
+    r"""
+    Add the CPU time of a subprocess that ended to the sections being recorded in the current context, since the
+    CPU time of the current thread doesn't include it.
+    """
+    if cpu_time is None:
+        return
+    for section in _active_sections.get():
+        section.children_cpu_time += cpu_time
+
+
+class Timings:
+    r"""
+    Recorder of the wall-clock and CPU times of the named sections of a run, e.g. the stages of a :class:`Tester`.
+
+    The CPU time of a section is the CPU time of its thread during the section plus the CPU time of the
+    subprocesses that ended during the section (see :func:`add_children_cpu_time`). The sections can be nested in
+    the same context, in which case the name of a section is prefixed by the name of its parent, e.g.
+    `report/cleanup`.
+
+    The sections are also kept as complete events of the Chrome trace format, which can be loaded in a trace viewer
+    such as `chrome://tracing` or Perfetto. Each recorder is a process of the trace and each thread a thread.
+
+    :param name: The name of the process in the trace, e.g. the name of the submission.
+    """
+    TRACE_CATEGORY = "tac"
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self.trace_pid = self.make_trace_pid(name)
+        self.origin = time.time()
+        self.sections: Dict[str, dict] = {}
+        self.events: List[dict] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_trace_pid(name: Optional[str]) -> int:
+        if name is None:
+            return os.getpid()
+        return zlib.crc32(name.encode("utf-8")) & 0x7FFFFFFF
+
+    @contextmanager
+    def record(self, name: str, measure_thread_cpu: bool = True, **args):
+        r"""
+        Record the wall-clock and CPU times of the body of the `with` statement.
+
+        :param name: The name of the section.
+        :param measure_thread_cpu: If False, only the CPU time of the subprocesses is counted, e.g. for a coroutine
+            whose thread runs other coroutines at the same time.
+        :param args: Additional information shown with the section in the trace viewer.
+        """
+        stack = _active_sections.get()
+        parents = [section for section in stack if section.timings is self]
+        full_name = f"{parents[-1].name}/{name}" if parents else name
+        section = _Section(self, full_name)
+        token = _active_sections.set(stack + (section,))
+        start = time.time()
+        start_perf = time.perf_counter()
+        start_cpu = time.thread_time() if measure_thread_cpu else 0.0
+        try:
+            yield section
+        finally:
+            wall = time.perf_counter() - start_perf
+            cpu = (time.thread_time() - start_cpu) if measure_thread_cpu else 0.0
+            cpu += section.children_cpu_time
+            _active_sections.reset(token)
+            with self._lock:
+                self.sections[full_name] = {"start": start - self.origin, "wall": wall, "cpu": cpu}
+                self.events.append({
+                    "name": full_name,
+                    "cat" : self.TRACE_CATEGORY,
+                    "ph"  : "X",
+                    "ts"  : start * 1e6,
+                    "dur" : wall * 1e6,
+                    "pid" : self.trace_pid,
+                    "tid" : threading.get_native_id(),
+                    "args": {"cpu": cpu, **args},
+                })
+
+    def get_total(self) -> Dict[str, float]:
+        r"""
+        Return the wall-clock time from the start of the first section to the end of the last one and the CPU time
+        of the top level sections.
+        """
+        if not self.sections:
+            return {"wall": 0.0, "cpu": 0.0}
+        start = min(section["start"] for section in self.sections.values())
+        end = max(section["start"] + section["wall"] for section in self.sections.values())
+        cpu = sum(section["cpu"] for name, section in self.sections.items() if "/" not in name)
+        return {"wall": end - start, "cpu": cpu}
+
+    def to_dict(self) -> dict:
+        r"""
+        Return the timings as saved in the report: the total and the start (relative to the creation of the
+        recorder), the wall-clock time and the CPU time of each section, in seconds.
+        """
+        with self._lock:
+            sections = dict(sorted(self.sections.items(), key=lambda item: item[1]["start"]))
+        return {"total": self.get_total(), "sections": sections}
+
+    def get_trace_events(self) -> List[dict]:
+        with self._lock:
+            events = list(self.events)
+        metadata = {
+            "name": "process_name",
+            "ph"  : "M",
+            "pid" : self.trace_pid,
+            "args": {"name": self.name or str(os.getpid())},
+        }
+        return [metadata, *events]
+
+    def save_trace(self, trace_filepath: str) -> str:
+        r"""
+        Save the sections as a Chrome trace json file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(trace_filepath)), exist_ok=True)
+        with open(trace_filepath, "w") as f:
+            json.dump({"traceEvents": self.get_trace_events(), "displayTimeUnit": "ms"}, f)
+        return trace_filepath
+
+    @staticmethod
+    def merge_traces(trace_filepaths: List[str], trace_filepath: str) -> str:
+        r"""
+        Merge the Chrome trace files of several runs, e.g. the submissions of a batch, into one. The timestamps of
+        the events are absolute, so the runs are aligned in the trace viewer. The missing files are ignored.
+        """
+        events = []
+        for path in trace_filepaths:
+            try:
+                with open(path, "r") as f:
+                    events.extend(json.load(f).get("traceEvents", []))
+            except (FileNotFoundError, ValueError):
+                continue
+        os.makedirs(os.path.dirname(os.path.abspath(trace_filepath)), exist_ok=True)
+        with open(trace_filepath, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return trace_filepath
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name}, sections={list(self.sections)})"
@@ -1,9 +1,12 @@
+import json
 import os
 import sys
 import shutil
-from typing import Optional, Union, List
+import types
+from typing import Dict, Optional, Union, List, Sequence
 from importlib import util as importlib_util
 from contextlib import contextmanager
+from functools import partial
 
 
 def find_filepath(filename: str, root: Optional[str] = None) -> Optional[str]:
@@ -109,6 +112,68 @@ def rm_pytest_cache(root: Optional[str] = None):
     return rm_direnames_from_root(".pytest_cache", root=root)
 
 
+def is_venv_dir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "pyvenv.cfg"))
+
+
+def clean_tree(
+        root: Optional[str] = None,
+        dirnames: Sequence[str] = ("__pycache__", ".pytest_cache"),
+        file_exts: Sequence[str] = (".pyc", ".pyo"),
+        skip_dirnames: Sequence[str] = (".git",),
+        skip_paths: Sequence[str] = (),
+        skip_venvs: bool = True,
+        n_workers: Optional[int] = None,
+) -> List[str]:
+    r"""
+    Remove the directories named after `dirnames` and the files ending with `file_exts` in a single pass over the
+    tree of `root`. The trees that are known to be immutable (venvs, .git directories, the given paths) and the
+    symbolic links are not walked. The targets found are deleted in a thread pool.
+
+    This replaces the successive calls to :func:`rm_pycache`, :func:`rm_pytest_cache` and :func:`rm_pyc_files`
+    that each walk the whole tree.
+
+    :param root: The root of the tree. Default to the cwd.
+    :param dirnames: The names of the directories to remove.
+    :param file_exts: The extensions of the files to remove.
+    :param skip_dirnames: The names of the directories that are not walked.
+    :param skip_paths: The paths of the directories that are not walked.
+    :param skip_venvs: If True, the venvs (directories containing a pyvenv.cfg file) are not walked.
+    :param n_workers: The number of threads deleting the targets.
+    :return: The paths of the removed targets.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    root = root or os.getcwd()
+    dirnames, file_exts, skip_dirnames = set(dirnames), tuple(file_exts), set(skip_dirnames)
+    skip_paths = {os.path.abspath(p) for p in skip_paths}
+    dir_targets, file_targets = [], []
+    stack = [root]
+    while stack:
+        try:
+            iterator = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        with iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in dirnames:
+                        dir_targets.append(entry.path)
+                    elif entry.name in skip_dirnames or os.path.abspath(entry.path) in skip_paths:
+                        continue
+                    elif skip_venvs and is_venv_dir(entry.path):
+                        continue
+                    else:
+                        stack.append(entry.path)
+                elif file_exts and entry.name.endswith(file_exts):
+                    file_targets.append(entry.path)
+    if len(dir_targets) + len(file_targets) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        list(executor.map(try_rmtree, dir_targets))
+        list(executor.map(rm_file, file_targets))
+    return dir_targets + file_targets
+
+
 def reindent_json_file(filepath: str, indent: int = 4, dont_exist_ok: bool = True):
     import json
 
@@ -243,6 +308,248 @@ def import_obj_from_file(obj_name: str, filepath: str):
     return obj
 
 
+def hash_dir(path: str, skip_dirnames: Sequence[str] = ("__pycache__", ".pytest_cache", ".git")) -> str:
+    r"""
+    Hash the content of a directory: the relative paths and the content of its files. The bytecode and cache
+    directories are ignored.
+
+    :param path: The path of the directory or of a single file.
+    :param skip_dirnames: The names of the directories to ignore.
+    :return: The sha256 hex digest of the directory.
+    """
+    import hashlib
+    dir_hash = hashlib.sha256()
+    if os.path.isfile(path):
+        filepaths = [(os.path.basename(path), path)]
+    else:
+        filepaths = []
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in skip_dirnames]
+            for file in files:
+                if file.endswith((".pyc", ".pyo")):
+                    continue
+                filepath = os.path.join(root, file)
+                filepaths.append((os.path.relpath(filepath, path).replace(os.sep, "/"), filepath))
+    for relpath, filepath in sorted(filepaths):
+        dir_hash.update(relpath.encode("utf-8") + b"\0")
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                dir_hash.update(chunk)
+        dir_hash.update(b"\0")
+    return dir_hash.hexdigest()
+
+
+def hash_obj(*objs) -> str:
+    r"""
+    Hash json serializable objects.
+
+    :return: The sha256 hex digest of the objects.
+    """
+    import hashlib
+    import json
+    return hashlib.sha256(json.dumps(objs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def get_obj_state(obj, _path: Optional[set] = None):
+    r"""
+    Get a json serializable state of an object, e.g. of a custom test case, to fingerprint it: its class and its
+    attributes for an instance, the code of the methods and the class attributes for a class, the bytecode, the
+    constants, the defaults, the closure and the referenced globals for a function. Only the globals of the given
+    function are followed, not the ones of the functions it reaches. An object with a `get_fingerprint` method,
+    e.g. a source, is described by its fingerprint, and an object without attributes by its type.
+
+    :param obj: The object.
+    :return: The state of the object.
+    :raises ValueError: If the fingerprint of an object inside the given one could not be computed.
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, bytes):
+        return {"bytes": obj.hex()}
+    if isinstance(obj, os.PathLike):
+        return os.fspath(obj)
+    if isinstance(obj, types.ModuleType):
+        return {"module": obj.__name__}
+    if not isinstance(obj, type) and hasattr(obj, "dtype") and hasattr(obj, "tolist"):
+        # A numpy array or scalar.
+        return {"array": obj.tolist(), "dtype": str(obj.dtype)}
+    _path = set() if _path is None else _path
+    if id(obj) in _path:
+        return {"cycle": type(obj).__qualname__}
+    _path.add(id(obj))
+    try:
+        return _get_container_or_object_state(obj, _path, follow_globals=len(_path) == 1)
+    finally:
+        _path.discard(id(obj))
+
+
+# The attributes of the classes implemented in C, e.g. the methods of the numpy types.
+_DESCRIPTOR_TYPES = (
+    types.BuiltinFunctionType,
+    types.ClassMethodDescriptorType,
+    types.GetSetDescriptorType,
+    types.MemberDescriptorType,
+    types.MethodDescriptorType,
+    types.WrapperDescriptorType,
+)
+
+
+def _get_qualname(obj) -> str:
+    return f"{getattr(obj, '__module__', None)}.{getattr(obj, '__qualname__', type(obj).__qualname__)}"
+
+
+def _get_code_state(code) -> dict:
+    return {
+        "code"  : code.co_code.hex(),
+        "consts": [
+            _get_code_state(const) if isinstance(const, types.CodeType) else get_obj_state(const)
+            for const in code.co_consts
+        ],
+        "names" : list(code.co_names),
+    }
+
+
+def _get_code_names(code) -> List[str]:
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.extend(_get_code_names(const))
+    return names
+
+
+def _get_container_or_object_state(obj, _path: set, follow_globals: bool):
+    state = partial(get_obj_state, _path=_path)
+    if isinstance(obj, (list, tuple)):
+        return [state(item) for item in obj]
+    if isinstance(obj, (set, frozenset)):
+        return {"set": sorted((state(item) for item in obj), key=lambda item: json.dumps(item, sort_keys=True))}
+    if isinstance(obj, dict):
+        return {k if isinstance(k, str) else repr(k): state(v) for k, v in obj.items()}
+    if isinstance(obj, partial):
+        return {"partial": state(obj.func), "args": state(obj.args), "keywords": state(obj.keywords)}
+    if isinstance(obj, types.MethodType):
+        return {"method": state(obj.__func__), "self": state(obj.__self__)}
+    if isinstance(obj, types.FunctionType):
+        func_state = {
+            "function"  : _get_qualname(obj),
+            "code"      : _get_code_state(obj.__code__),
+            "defaults"  : state(obj.__defaults__),
+            "kwdefaults": state(obj.__kwdefaults__),
+            "closure"   : [state(cell.cell_contents) for cell in (obj.__closure__ or [])],
+        }
+        if follow_globals:
+            func_state["globals"] = {
+                name: state(obj.__globals__[name])
+                for name in sorted(set(_get_code_names(obj.__code__))) if name in obj.__globals__
+            }
+        return func_state
+    if isinstance(obj, type):
+        # The code of the methods and the class attributes, e.g. the expected values of a test case.
+        attributes = {}
+        for cls in obj.__mro__:
+            if cls.__module__ == "builtins":
+                continue
+            for name, attr in sorted(vars(cls).items()):
+                attr = getattr(attr, "__func__", getattr(attr, "fget", attr))
+                if isinstance(attr, types.FunctionType):
+                    attributes[f"{cls.__qualname__}.{name}"] = _get_code_state(attr.__code__)
+                elif not (name.startswith("__") and name.endswith("__")) and not isinstance(attr, _DESCRIPTOR_TYPES):
+                    attributes[f"{cls.__qualname__}.{name}"] = state(attr)
+        return {"class": _get_qualname(obj), "attributes": attributes}
+    if callable(getattr(obj, "get_fingerprint", None)):
+        fingerprint = obj.get_fingerprint()
+        if fingerprint is None:
+            raise ValueError(f"The fingerprint of {obj!r} could not be computed.")
+        return {"type": _get_qualname(type(obj)), "fingerprint": fingerprint}
+    attributes = getattr(obj, "__dict__", None)
+    if attributes is None:
+        return {"type": _get_qualname(type(obj))}
+    return {"type": state(type(obj)), "attributes": state(attributes)}
+
+
+def get_dir_size(path: str) -> int:
+    r"""
+    Get the total size in bytes of the files in a directory. Symbolic links are not followed.
+
+    :param path: The path of the directory.
+    :return: The size of the directory in bytes.
+    """
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            filepath = os.path.join(root, file)
+            if not os.path.islink(filepath):
+                size += os.path.getsize(filepath)
+    return size
+
+
+def read_requirements(filepath: Optional[str]) -> List[str]:
+    r"""
+    Read the requirements of a requirements file without the comments, the blank lines and the surrounding spaces.
+
+    :param filepath: The path of the requirements file.
+    :return: The list of requirements.
+    """
+    if filepath is None or not os.path.isfile(filepath):
+        return []
+    with open(filepath, "r") as f:
+        lines = [line.split("#", 1)[0].strip() for line in f.readlines()]
+    return [line for line in lines if line]
+
+
+@contextmanager
+def file_lock(lock_path: str, shared: bool = False, blocking: bool = True):
+    r"""
+    Inter-process lock based on a lock file. On Windows, the lock is always exclusive.
+
+    :param lock_path: The path of the lock file. It is created if it does not exist.
+    :param shared: If True, acquire a shared lock instead of an exclusive one.
+    :param blocking: If False, don't wait for the lock to be released by another process.
+    :return: A context manager yielding True if the lock was acquired, False otherwise.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, "a+") as lock_file:
+        if sys.platform == "win32":
+            import msvcrt
+            mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+            lock_func = lambda: msvcrt.locking(lock_file.fileno(), mode, 1)
+            unlock_func = lambda: msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            if not blocking:
+                mode |= fcntl.LOCK_NB
+            lock_func = lambda: fcntl.flock(lock_file.fileno(), mode)
+            unlock_func = lambda: fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        try:
+            lock_func()
+            acquired = True
+        except OSError:
+            if blocking:
+                raise
+            acquired = False
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                unlock_func()
+
+
+def join_cmd(args: List[str]) -> str:
+    r"""
+    Join the arguments of a command in a string that can be given to a shell, quoting them if needed.
+
+    :param args: The arguments of the command.
+    :return: The command as a string.
+    """
+    import subprocess
+    import shlex
+    args = [str(a) for a in args]
+    if sys.platform == "win32":
+        return subprocess.list2cmdline(args)
+    return " ".join(shlex.quote(a) for a in args)
+
+
 def push_file_to_git_repo(
         filepath: str,
         repo_url: str,
@@ -250,21 +557,46 @@ def push_file_to_git_repo(
         local_tmp_path: str = "tmp_repo",
         rm_tmp_repo: bool = True,
 ):
-    import git
-    from git import rmtree
-    repo = git.Repo.clone_from(repo_url, local_tmp_path)
-    repo.git.checkout(repo_branch)
-    file_basename = os.path.basename(filepath)
-    new_filepath = os.path.join(local_tmp_path, file_basename)
-    shutil.copy(filepath, new_filepath)
-    repo.git.add(file_basename)
-    repo.git.commit("-m", f"Add {file_basename}")
-    repo.git.push("origin", repo_branch)
+    r"""
+    Push a file at the root of a branch of a git repo. To publish many files, e.g. the reports of a cohort, use a
+    :class:`ReportPublisher` which commits them together and keeps its clone between the publications.
+
+    :param filepath: The path of the file.
+    :param repo_url: The url of the repo.
+    :param repo_branch: The branch.
+    :param local_tmp_path: The location of the clone.
+    :param rm_tmp_repo: If True, the clone is removed after the push.
+    :return: True.
+    """
+    from .report_publisher import ReportPublisher
+    publisher = ReportPublisher(
+        repo_url, repo_branch, clone_path=local_tmp_path,
+        commit_message=f"Add {os.path.basename(filepath)}",
+    )
+    publisher.add(filepath).publish()
     if rm_tmp_repo:
-        rmtree(local_tmp_path)
+        publisher.clear()
     return True
 
 
+def get_remote_head(repo_url: str, repo_branch: str = "main") -> Optional[str]:
+    r"""
+    Get the sha of the head of a branch of a remote repository without cloning it (git ls-remote).
+
+    :param repo_url: The url of the repository.
+    :param repo_branch: The branch.
+    :return: The sha of the head of the branch or None if it could not be found.
+    """
+    try:
+        import git
+        output = git.cmd.Git().ls_remote(repo_url, f"refs/heads/{repo_branch}")
+    except Exception:
+        return None
+    if not output:
+        return None
+    return output.split()[0]
+
+
 def get_git_repo_url(working_dir: str, search_parent_directories: bool = True) -> Optional[str]:
     try:
         import git
@@ -272,3 +604,139 @@ def get_git_repo_url(working_dir: str, search_parent_directories: bool = True) -
         return repo.remotes.origin.url
     except Exception:
         return None
+
+
+FICLONE = 0x40049409
+
+
+def reflink_file(src: str, dst: str) -> bool:
+    r"""
+    Clone a file as a copy-on-write reflink (FICLONE) when the filesystem supports it, e.g. btrfs or xfs. The clone
+    shares the blocks of the source until one of them is modified, so no data is written.
+
+    :param src: The path of the source file.
+    :param dst: The path of the clone. It must not exist.
+    :return: True if the file was cloned, False if reflinks are not supported.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        with open(src, "rb") as src_file, open(dst, "xb") as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            except OSError:
+                cloned = False
+            else:
+                cloned = True
+    except OSError:
+        return False
+    if not cloned:
+        rm_file(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _is_synced_file(src_file: str, dst_file: str, compare_hash: bool = False) -> bool:
+    import filecmp
+    try:
+        src_stat, dst_stat = os.stat(src_file), os.lstat(dst_file)
+    except FileNotFoundError:
+        return False
+    if not os.path.isfile(dst_file) or os.path.islink(dst_file):
+        return False
+    if os.path.samestat(src_stat, dst_stat):
+        return True
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return True
+    if compare_hash and filecmp.cmp(src_file, dst_file, shallow=False):
+        shutil.copystat(src_file, dst_file)
+        return True
+    return False
+
+
+def _rm_path(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        try_rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def sync_tree(
+        src: str,
+        dst: str,
+        link_patterns: Sequence[str] = (),
+        use_reflinks: bool = True,
+        compare_hash: bool = False,
+        skip_dirnames: Sequence[str] = ("__pycache__", ".pytest_cache", ".git"),
+) -> Dict[str, int]:
+    r"""
+    Incrementally synchronize the directory `dst` with the directory `src`. Only the files whose size or
+    modification time changed are written and the files of `dst` absent from `src` are deleted. The written files
+    are, in order of preference:
+
+        - hardlinked if they match one of `link_patterns`, which must only match read-only inputs since a hardlink
+          shares the content of the source file;
+        - cloned as reflinks if `use_reflinks` and the filesystem supports them;
+        - copied.
+
+    :param src: The source directory.
+    :param dst: The destination directory. It is created if it doesn't exist.
+    :param link_patterns: The glob patterns of the relative paths of the files to hardlink.
+    :param use_reflinks: If True, clone the files as reflinks when possible.
+    :param compare_hash: If True, the files with the same size but another modification time are compared by
+        content and kept if identical.
+    :param skip_dirnames: The names of the directories to neither copy nor delete.
+    :return: The statistics of the synchronization: the number of files copied, linked, deleted and unchanged and
+        the number of bytes written.
+    """
+    import fnmatch
+    stats = {"copied": 0, "linked": 0, "deleted": 0, "unchanged": 0, "bytes_written": 0}
+    src, dst = os.path.abspath(src), os.path.abspath(dst)
+    src_relpaths = set()
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [d for d in dirs if d not in skip_dirnames]
+        rel_root = os.path.relpath(root, src)
+        dst_root = os.path.join(dst, rel_root)
+        if os.path.lexists(dst_root) and not os.path.isdir(dst_root):
+            _rm_path(dst_root)
+        os.makedirs(dst_root, exist_ok=True)
+        src_relpaths.update(os.path.normpath(os.path.join(rel_root, d)) for d in dirs)
+        for file in files:
+            relpath = os.path.normpath(os.path.join(rel_root, file))
+            src_relpaths.add(relpath)
+            src_file, dst_file = os.path.join(src, relpath), os.path.join(dst, relpath)
+            if _is_synced_file(src_file, dst_file, compare_hash=compare_hash):
+                stats["unchanged"] += 1
+                continue
+            _rm_path(dst_file)
+            if any(fnmatch.fnmatch(relpath.replace(os.sep, "/"), pattern) for pattern in link_patterns):
+                try:
+                    os.link(src_file, dst_file)
+                    stats["linked"] += 1
+                    continue
+                except OSError:
+                    pass
+            if use_reflinks and reflink_file(src_file, dst_file):
+                stats["linked"] += 1
+                continue
+            shutil.copy2(src_file, dst_file)
+            stats["copied"] += 1
+            stats["bytes_written"] += os.path.getsize(dst_file)
+    for root, dirs, files in os.walk(dst):
+        rel_root = os.path.relpath(root, dst)
+        for d in list(dirs):
+            if d in skip_dirnames or is_venv_dir(os.path.join(root, d)):
+                dirs.remove(d)
+            elif os.path.normpath(os.path.join(rel_root, d)) not in src_relpaths:
+                dirs.remove(d)
+                stats["deleted"] += sum(len(f) for _, _, f in os.walk(os.path.join(root, d)))
+                _rm_path(os.path.join(root, d))
+        for file in files:
+            if os.path.normpath(os.path.join(rel_root, file)) not in src_relpaths:
+                _rm_path(os.path.join(root, file))
+                stats["deleted"] += 1
+    return stats
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from . import utils
+
+
+@lru_cache(maxsize=None)
+def get_interpreter_version(python: str = "python") -> str:
+    r"""
+    Get the full version string of the interpreter used to create the virtual environments.
+
+    :param python: The command of the interpreter.
+    :return: The output of `python -VV`.
+    """
+    result = subprocess.run(
+        f"{python} -VV", shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
+    )
+    return result.stdout.strip()
+
+
+class VenvBuildError(RuntimeError):
+    r"""
+    Raised by the build function of a :class:`VenvCache` entry when the virtual environment could not be created
+    or its requirements could not be installed, so the incomplete entry is removed instead of being cached.
+    """
+    pass
+
+
+class VenvCache:
+    r"""
+    Content-addressed cache of virtual environments. An entry is identified by a hash of the requirements installed
+    in the virtual environment and of the version of the interpreter that created it. On a cache hit, the cached
+    virtual environment is copied (or linked) to the requested location instead of being rebuilt.
+
+    The entries are stored in `root/<key>/venv` with a `root/<key>/meta.json` file written once the entry is
+    complete. If the build function raises, e.g. a :class:`VenvBuildError` because pip failed or was killed, the
+    entry is removed and the error is raised again, so a broken virtual environment is never cached.
+
+    Concurrent accesses to the same key are synchronized with a lock file `root/<key>.lock`: the hits hold a shared
+    lock while the builds and the evictions hold an exclusive one.
+
+    :param root: The directory of the cache.
+    :param max_size: The maximum size of the cache in bytes. When exceeded, the least recently used entries are
+        evicted. If None, the cache is never evicted.
+    :param link_mode: "copy" to copy the cached virtual environment or "symlink" to link it. The copy is relocated
+        by rewriting the absolute paths of its scripts. A link is faster but hands the same writable virtual
+        environment to every tester using the entry, so code under test could alter the entry for all the others:
+        only use it with trusted code.
+    """
+    DEFAULT_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "tac", "venvs")
+    ROOT_ENV_VAR = "TAC_VENV_CACHE_DIR"
+    VENV_DIRNAME = "venv"
+    META_FILENAME = "meta.json"
+    LOCK_PATTERN = "{}.lock"
+    LINK_MODES = ("symlink", "copy")
+    DEFAULT_LINK_MODE = "copy"
+    DEFAULT_EVICTION_GRACE_SECONDS = 60 * 60
+    SCRIPTS_DIRNAMES = ("bin", "Scripts")
+    MAX_RELOCATED_FILE_SIZE = 1024 * 1024
+
+    def __init__(
+            self,
+            root: Optional[str] = None,
+            max_size: Optional[int] = None,
+            link_mode: Optional[str] = None,
+            **kwargs
+    ):
+        self.root = os.path.abspath(root or os.environ.get(self.ROOT_ENV_VAR, self.DEFAULT_ROOT))
+        self.max_size = max_size
+        self.link_mode = link_mode or self.DEFAULT_LINK_MODE
+        if self.link_mode not in self.LINK_MODES:
+            raise ValueError(f"link_mode must be one of {self.LINK_MODES}, got {self.link_mode}.")
+        self.eviction_grace_seconds = kwargs.get("eviction_grace_seconds", self.DEFAULT_EVICTION_GRACE_SECONDS)
+        self.python = kwargs.get("python", "python")
+
+    def make_key(self, requirements: List[str]) -> str:
+        r"""
+        Make the key of a virtual environment from its requirements and the interpreter version.
+
+        :param requirements: The requirements installed in the virtual environment.
+        :return: The key of the entry.
+        """
+        content = {
+            "requirements": sorted(set(r.strip() for r in requirements if r.strip())),
+            "interpreter": get_interpreter_version(self.python),
+            "platform": sys.platform,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+    def get_entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get_venv_path(self, key: str) -> str:
+        return os.path.join(self.get_entry_path(key), self.VENV_DIRNAME)
+
+    def get_meta_path(self, key: str) -> str:
+        return os.path.join(self.get_entry_path(key), self.META_FILENAME)
+
+    def get_lock_path(self, key: str) -> str:
+        return os.path.join(self.root, self.LOCK_PATTERN.format(key))
+
+    def is_complete(self, key: str) -> bool:
+        return os.path.exists(self.get_meta_path(key))
+
+    @property
+    def keys(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return [key for key in os.listdir(self.root) if self.is_complete(key)]
+
+    def get_meta(self, key: str) -> dict:
+        with open(self.get_meta_path(key), "r") as f:
+            return json.load(f)
+
+    def touch(self, key: str):
+        r"""
+        Mark the entry as used now. The last use time is the modification time of the meta file.
+        """
+        os.utime(self.get_meta_path(key))
+
+    def get_last_used(self, key: str) -> float:
+        return os.path.getmtime(self.get_meta_path(key))
+
+    def get_size(self) -> int:
+        return sum(self.get_meta(key).get("size", 0) for key in self.keys)
+
+    def get_or_create(self, key: str, dst: str, build_func: Callable[[str], str]) -> bool:
+        r"""
+        Link or copy the virtual environment of the given key to `dst`. If the entry does not exist, it is built
+        first with `build_func`.
+
+        :param key: The key of the entry.
+        :param dst: The path where to link or copy the virtual environment.
+        :param build_func: The function that creates the virtual environment and installs its requirements at the
+            path it receives. It must raise, e.g. a :class:`VenvBuildError`, if the build failed.
+        :return: True if the entry was already in the cache, False if it was built.
+        """
+        lock_path = self.get_lock_path(key)
+        with utils.file_lock(lock_path, shared=True):
+            hit = self.is_complete(key)
+            if hit:
+                self.touch(key)
+                self._link_or_copy(key, dst)
+        if not hit:
+            with utils.file_lock(lock_path, shared=False):
+                hit = self.is_complete(key)
+                if not hit:
+                    self._build(key, build_func)
+                self.touch(key)
+                self._link_or_copy(key, dst)
+            self.maybe_evict()
+        return hit
+
+    def _build(self, key: str, build_func: Callable[[str], str]):
+        entry_path = self.get_entry_path(key)
+        utils.try_rmtree(entry_path)
+        os.makedirs(entry_path, exist_ok=True)
+        venv_path = self.get_venv_path(key)
+        try:
+            stdout = build_func(venv_path)
+        except BaseException:
+            utils.try_rmtree(entry_path)
+            raise
+        meta = {
+            "key": key,
+            "size": utils.get_dir_size(venv_path),
+            "created": time.time(),
+            "build_stdout": stdout,
+        }
+        with open(self.get_meta_path(key), "w") as f:
+            json.dump(meta, f, indent=4)
+        return meta
+
+    def _link_or_copy(self, key: str, dst: str):
+        src = self.get_venv_path(key)
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        if self.link_mode == "symlink":
+            os.symlink(src, dst, target_is_directory=True)
+        else:
+            shutil.copytree(src, dst, symlinks=True)
+            self._relocate(src, dst)
+        return dst
+
+    def _relocate(self, src: str, dst: str):
+        r"""
+        Replace the absolute path of the cached virtual environment by the one of its copy in the scripts
+        (shebangs, activation scripts) and in the pyvenv.cfg file.
+        """
+        old, new = os.path.abspath(src).encode(), os.path.abspath(dst).encode()
+        filepaths = [os.path.join(dst, "pyvenv.cfg")]
+        for scripts_dirname in self.SCRIPTS_DIRNAMES:
+            scripts_dir = os.path.join(dst, scripts_dirname)
+            if os.path.isdir(scripts_dir):
+                filepaths.extend(os.path.join(scripts_dir, f) for f in os.listdir(scripts_dir))
+        for filepath in filepaths:
+            if os.path.islink(filepath) or not os.path.isfile(filepath):
+                continue
+            if os.path.getsize(filepath) > self.MAX_RELOCATED_FILE_SIZE:
+                continue
+            with open(filepath, "rb") as f:
+                content = f.read()
+            if old in content:
+                with open(filepath, "wb") as f:
+                    f.write(content.replace(old, new))
+
+    def maybe_evict(self):
+        if self.max_size is None:
+            return []
+        return self.evict(self.max_size)
+
+    def evict(self, max_size: int = 0) -> List[str]:
+        r"""
+        Evict the least recently used entries until the size of the cache is at most `max_size`. The entries used
+        during the last `eviction_grace_seconds` seconds or locked by another process are never evicted.
+
+        :param max_size: The maximum size of the cache in bytes.
+        :return: The keys of the evicted entries.
+        """
+        entries = sorted(filter(None, (self._get_eviction_entry(key) for key in self.keys)))
+        total_size = sum(size for _, _, size in entries)
+        evicted = []
+        for last_used, key, size in entries:
+            if total_size <= max_size:
+                break
+            if time.time() - last_used < self.eviction_grace_seconds:
+                continue
+            with utils.file_lock(self.get_lock_path(key), shared=False, blocking=False) as acquired:
+                if not acquired:
+                    continue
+                # The listing was made without the lock: the entry may have been used, rebuilt or evicted since.
+                entry = self._get_eviction_entry(key)
+                if entry is None:
+                    total_size -= size
+                    continue
+                last_used, _, size = entry
+                if time.time() - last_used < self.eviction_grace_seconds:
+                    continue
+                utils.try_rmtree(self.get_entry_path(key))
+            total_size -= size
+            evicted.append(key)
+        return evicted
+
+    def _get_eviction_entry(self, key: str) -> Optional[Tuple[float, str, int]]:
+        r"""
+        Return the last use time, the key and the size of the entry, or None if the entry was removed meanwhile.
+        """
+        try:
+            return self.get_last_used(key), key, self.get_meta(key).get("size", 0)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(root={self.root}, max_size={self.max_size}, link_mode={self.link_mode})"
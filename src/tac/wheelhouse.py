@@ -0,0 +1,58 @@
+import os
+import subprocess
+from typing import List, Optional
+
+from . import utils
+
+
+class Wheelhouse:
+    r"""
+    Local directory of wheels used to install the requirements without any network access. The wheels can be
+    built beforehand on a machine with network access with :meth:`download` or be provided as is.
+
+    :param root: The directory of the wheels.
+    :param python: The interpreter used to build the wheels. It should match the one of the venvs so the wheels
+        have compatible tags.
+    """
+    WHEEL_EXT = ".whl"
+
+    def __init__(self, root: str, python: str = "python", **kwargs):
+        self.root = os.path.abspath(root)
+        self.python = python
+        self.kwargs = kwargs
+
+    @property
+    def wheels(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(f for f in os.listdir(self.root) if f.endswith(self.WHEEL_EXT))
+
+    def get_install_options(self) -> List[str]:
+        r"""
+        Return the pip install options that make pip resolve the requirements from the wheelhouse only.
+
+        :return: The list of options.
+        """
+        return ["--no-index", f"--find-links={self.root}"]
+
+    def download(self, requirements: List[str], reqs_path: Optional[str] = None) -> str:
+        r"""
+        Build the wheels of the requirements and of their dependencies in the wheelhouse in one pip invocation.
+
+        :param requirements: The requirements to download.
+        :param reqs_path: An optional requirements file to download as well.
+        :return: The stdout of pip.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        args = [self.python, "-m", "pip", "wheel", f"--wheel-dir={self.root}"]
+        if reqs_path is not None:
+            args += ["-r", reqs_path]
+        args += list(requirements)
+        result = subprocess.run(
+            utils.join_cmd(args), shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            universal_newlines=True, encoding="utf8", errors="ignore",
+        )
+        return result.stdout
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(root={self.root}, n_wheels={len(self.wheels)})"
@@ -1,7 +1,14 @@
+import os
+import shutil
+
 import pytest
 from .configs import RUN_SLOW_TESTS
 
+from tac import VenvCache
+
 RUN_SLOW_ARG_NAME = "run_slow"
+EXAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Example", "SimpleTP")
+EXAMPLE_REQUIREMENTS = ["pytest", "pytest-cov", "pytest-json-report"]
 
 
 @pytest.hookimpl()
@@ -43,3 +50,26 @@ def pytest_collection_modifyitems(config, items):
         for item in items:
             if "slow" in item.keywords:
                 item.add_marker(skipper)
+
+
+@pytest.fixture(scope="session")
+def venv_cache(tmp_path_factory):
+    r"""
+    Venv cache shared by the tests of the session, so the venv of the example is only built once.
+    """
+    return VenvCache(str(tmp_path_factory.mktemp("venv_cache")))
+
+
+@pytest.fixture
+def simple_tp(tmp_path):
+    r"""
+    Copy of the code and of the tests of the functions of the SimpleTP example, with the requirements needed to
+    grade it. The other tests of the example are left out since they import tac, which is not installed in the
+    graded venvs.
+    """
+    root = tmp_path / "SimpleTP"
+    shutil.copytree(os.path.join(EXAMPLE_DIR, "src"), root / "src")
+    os.makedirs(root / "tests")
+    shutil.copyfile(os.path.join(EXAMPLE_DIR, "tests", "test_functions.py"), root / "tests" / "test_functions.py")
+    (root / "requirements.txt").write_text("\n".join(EXAMPLE_REQUIREMENTS) + "\n")
+    return root
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+import tac
+from tac import utils
+
+
+PATH_PROPERTIES = {
+    "dot_coverage_path"          : tac.Tester.DOT_COVERAGE_KEY,
+    "coverage_json_path"         : tac.Tester.COVERAGE_JSON_KEY,
+    "coverage_xml_path"          : tac.Tester.COVERAGE_XML_KEY,
+    "dot_report_json_path"       : tac.Tester.DOT_REPORT_JSON_KEY,
+    "master_dot_report_json_path": tac.Tester.MASTER_DOT_REPORT_JSON_KEY,
+    "results_path"               : tac.Tester.RESULTS_KEY,
+    "master_results_path"        : tac.Tester.MASTER_RESULTS_KEY,
+}
+
+
+def populate_venv(venv_path, n_files: int = 2000):
+    for i in range(n_files):
+        package_dir = os.path.join(venv_path, "lib", "site-packages", f"package_{i % 50}")
+        os.makedirs(package_dir, exist_ok=True)
+        with open(os.path.join(package_dir, f"module_{i}.py"), "w") as f:
+            f.write("")
+
+
+def forbid_walks(monkeypatch):
+    def walk(*args, **kwargs):
+        raise AssertionError("The artifacts must be found without walking a directory.")
+
+    monkeypatch.setattr(os, "walk", walk)
+    monkeypatch.setattr(utils, "find_filepath", walk)
+
+
+def test_artifacts_are_found_without_walking_the_report_dir(simple_tp, tmp_path, monkeypatch):
+    report_dir = tmp_path / "report"
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src")), tac.SourceTests(str(simple_tp / "tests")), report_dir=str(report_dir)
+    )
+    populate_venv(report_dir / "venv")
+    for name in PATH_PROPERTIES.values():
+        with open(tester.artifacts.get_path(name), "w") as f:
+            f.write("{}")
+    forbid_walks(monkeypatch)
+    for path_property, name in PATH_PROPERTIES.items():
+        assert getattr(tester, path_property) == os.path.join(str(report_dir), tester.ARTIFACTS_FILENAMES[name])
+    assert sorted(tester.temp_files) == sorted(tester.artifacts.get_path(name) for name in PATH_PROPERTIES.values())
+
+
+def test_missing_artifacts_are_none(simple_tp, tmp_path, monkeypatch):
+    report_dir = tmp_path / "report"
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src")), tac.SourceTests(str(simple_tp / "tests")), report_dir=str(report_dir)
+    )
+    populate_venv(report_dir / "venv")
+    # A file named like an artifact elsewhere, e.g. in the venv, must not be mistaken for it.
+    with open(report_dir / "venv" / tester.ARTIFACTS_FILENAMES[tac.Tester.COVERAGE_JSON_KEY], "w") as f:
+        f.write("{}")
+    forbid_walks(monkeypatch)
+    for path_property in PATH_PROPERTIES:
+        assert getattr(tester, path_property) is None
+    assert tester.temp_files == []
+
+
+@pytest.mark.slow
+def test_artifacts_of_a_run_with_a_populated_venv(simple_tp, venv_cache, tmp_path, monkeypatch):
+    report_dir = tmp_path / "report"
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+        tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(report_dir),
+    )
+    report = tester.run()
+    assert report.grade > 0.0
+    n_venv_files = sum(len(files) for _, _, files in os.walk(report_dir / "venv"))
+    assert n_venv_files > 1000
+    forbid_walks(monkeypatch)
+    assert os.path.dirname(tester.results_path) == str(report_dir)
+    assert os.path.dirname(tester.dot_coverage_path) == str(report_dir)
+    assert set(tester.temp_files) <= set(tester.artifacts.paths.values())
+    assert tester.results_path in tester.temp_files
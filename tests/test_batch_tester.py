@@ -0,0 +1,56 @@
+import os
+import shutil
+
+import pytest
+
+import tac
+
+
+class CrashingSourceCode(tac.SourceCode):
+    def fetch_at(self, dst_path: str = None, overwrite=False) -> str:
+        raise RuntimeError("The submission could not be fetched.")
+
+
+def make_submission(simple_tp, root, venv_cache, broken: bool = False):
+    shutil.copytree(simple_tp, root)
+    if broken:
+        functions_path = root / "src" / "functions.py"
+        functions_path.write_text(functions_path.read_text().replace("return a * b", "return a * b + 1"))
+    return tac.SourceCode(str(root / "src"), venv_cache=venv_cache), tac.SourceTests(str(root / "tests"))
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("n_workers", [2, 1])
+def test_batch_grades_each_submission_in_its_own_report_dir(simple_tp, venv_cache, tmp_path, n_workers):
+    submissions = {
+        "correct": make_submission(simple_tp, tmp_path / "correct", venv_cache),
+        "broken" : make_submission(simple_tp, tmp_path / "broken", venv_cache, broken=True),
+        "crashed": (
+            CrashingSourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+            tac.SourceTests(str(simple_tp / "tests")),
+        ),
+    }
+    batch_tester = tac.BatchTester(
+        submissions, report_dir=str(tmp_path / "batch"), n_workers=n_workers, logging_func=lambda *args: None
+    )
+    reports = batch_tester.run()
+    assert list(reports) == ["correct", "broken", "crashed"]
+    assert list(batch_tester.errors) == ["crashed"]
+    assert "The submission could not be fetched." in batch_tester.errors["crashed"]
+
+    grades = batch_tester.get_grades()
+    assert grades["correct"] > grades["broken"] > 0.0
+    for name in ["correct", "broken"]:
+        report_filepath = os.path.join(str(tmp_path / "batch"), name, tac.Tester.DEFAULT_REPORT_FILENAME)
+        assert reports[name].report_filepath == report_filepath
+        assert os.path.isfile(report_filepath)
+    # The report of each submission is the one of a tester run on it alone.
+    tester = tac.Tester(
+        tac.SourceCode(str(tmp_path / "broken" / "src"), venv_cache=venv_cache),
+        tac.SourceTests(str(tmp_path / "broken" / "tests")),
+        report_dir=str(tmp_path / "alone"),
+    )
+    expected_report = tester.run()
+    assert sorted(reports["broken"].keys()) == sorted(expected_report.keys())
+    for key in expected_report.keys():
+        assert reports["broken"].get_value(key) == pytest.approx(expected_report.get_value(key)), key
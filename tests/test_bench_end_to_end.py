@@ -0,0 +1,79 @@
+import importlib.util
+import os
+
+import pytest
+
+import tac
+
+
+BENCH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks", "bench_end_to_end.py")
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench_end_to_end", BENCH_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_fixtures_are_seeded_and_varied(bench, tmp_path):
+    fixtures = bench.make_fixtures(str(tmp_path / "a"), 6, 0, str(tmp_path / "wheelhouse"), bench.BASE_REQUIREMENTS)
+    other = bench.make_fixtures(str(tmp_path / "b"), 6, 0, str(tmp_path / "wheelhouse"), bench.BASE_REQUIREMENTS)
+    specs = [{k: v for k, v in spec.items() if k != "repo"} for spec in fixtures["submissions"].values()]
+    assert specs == [{k: v for k, v in spec.items() if k != "repo"} for spec in other["submissions"].values()]
+    assert len({tuple(spec["broken_functions"]) for spec in specs}) > 1
+    assert len({spec["pep8_level"] for spec in specs}) > 1
+    assert len({tuple(spec["requirements"]) for spec in specs}) > 1
+    assert len(tac.Wheelhouse(str(tmp_path / "wheelhouse")).wheels) == bench.N_GENERATED_PACKAGES
+
+    # Each submission is a bare repo with its mutated code, the tests and the requirements of the example.
+    spec = max(specs, key=lambda s: len(s["broken_functions"]))
+    src = tac.Source("src", url=fixtures["submissions"][spec["name"]]["repo"], sparse_checkout=False)
+    src.setup_at(str(tmp_path / "report"))
+    src.repo.close()
+    functions = {}
+    exec((tmp_path / "report" / "src" / "functions.py").read_text(), functions)
+    expected = {"add": 5, "sub": -1, "mul": 6}
+    assert {name for name, value in expected.items() if functions[name](2, 3) != value} == set(spec["broken_functions"])
+    repo_root = src.local_repo_tmp_dirpath
+    assert os.path.isfile(os.path.join(repo_root, "tests", "test_functions.py"))
+    with open(os.path.join(repo_root, "requirements.txt")) as f:
+        assert f.read().split() == bench.BASE_REQUIREMENTS + spec["requirements"]
+    master_src = tac.Source("master_tests", url=fixtures["master_tests_repo"])
+    master_src.setup_at(str(tmp_path / "master_report"))
+    master_src.repo.close()
+    assert any(f.startswith("test_") for f in os.listdir(master_src.local_path))
+
+
+def save_report(report_dir, name: str, grade: float, sections: dict):
+    os.makedirs(os.path.join(report_dir, name))
+    report = tac.Report(timings={"sections": sections})
+    report.add("tests", grade)
+    report.save(os.path.join(report_dir, name, tac.Tester.DEFAULT_REPORT_FILENAME))
+
+
+def test_summary_and_baseline_comparison(bench, tmp_path, capsys):
+    report_dir = str(tmp_path / "reports")
+    save_report(report_dir, "first", 100.0, {
+        "lint": {"start": 0.0, "wall": 1.0, "cpu": 0.5}, "copy/code_src": {"start": 0.0, "wall": 9.0, "cpu": 9.0},
+    })
+    save_report(report_dir, "second", 50.0, {"lint": {"start": 0.0, "wall": 3.0, "cpu": 1.5}})
+    summary = bench.summarize_reports(report_dir, ["first", "second", "crashed"], 30.0, {"crashed": "Traceback"})
+    assert summary["submissions_per_minute"] == pytest.approx(6.0)
+    assert summary["n_errors"] == 1
+    assert summary["grades"] == {"first": pytest.approx(100.0), "second": pytest.approx(50.0)}
+    # Only the top level stages are summarized.
+    assert list(summary["stages"]) == ["lint"]
+    assert summary["stages"]["lint"]["mean_wall"] == pytest.approx(2.0)
+    assert summary["stages"]["lint"]["mean_cpu"] == pytest.approx(1.0)
+    assert summary["stages"]["lint"]["submissions_per_minute"] == pytest.approx(30.0)
+
+    baseline = {
+        "modes": {"tester": {"submissions_per_minute": 3.0, "stages": {"lint": {"submissions_per_minute": 60.0}}}},
+    }
+    bench.compare_with_baseline({"modes": {"tester": summary, "batch": summary}}, baseline)
+    assert capsys.readouterr().out.splitlines() == [
+        "tester: x2.00 submissions/min against the baseline",
+        "  lint: x0.50",
+    ]
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import tac
+from tac import utils
+
+
+def touch(path) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+    return str(path)
+
+
+def make_venv_dir(path):
+    touch(path / "pyvenv.cfg")
+    return touch(path / "lib" / "__pycache__" / "site.cpython.pyc")
+
+
+def test_clean_tree_removes_the_targets_in_one_pruned_pass(tmp_path):
+    root = tmp_path / "root"
+    targets = sorted([
+        str(root / "src" / "__pycache__"),
+        str(root / "src" / "pkg" / "__pycache__"),
+        str(root / ".pytest_cache"),
+        touch(root / "src" / "functions.pyc"),
+        touch(root / "tests" / "test_functions.pyo"),
+    ])
+    touch(root / "src" / "__pycache__" / "functions.cpython.pyc")
+    touch(root / "src" / "pkg" / "__pycache__" / "module.cpython.pyc")
+    touch(root / ".pytest_cache" / "README.md")
+    kept = [
+        touch(root / "src" / "functions.py"),
+        make_venv_dir(root / "venv"),
+        touch(root / ".git" / "objects" / "module.pyc"),
+        touch(root / "tmp_git" / "src" / "__pycache__" / "functions.cpython.pyc"),
+        touch(tmp_path / "outside" / "__pycache__" / "functions.cpython.pyc"),
+    ]
+    # The symbolic links are not followed.
+    os.symlink(tmp_path / "outside", root / "src" / "link")
+
+    removed = utils.clean_tree(str(root), skip_paths=[str(root / "tmp_git")])
+    assert sorted(removed) == targets
+    assert not any(os.path.exists(path) for path in targets)
+    assert all(os.path.exists(path) for path in kept)
+    assert utils.clean_tree(str(root), skip_paths=[str(root / "tmp_git")]) == []
+
+
+def test_clean_tree_can_walk_the_venvs(tmp_path):
+    venv_pycache = make_venv_dir(tmp_path / "venv")
+    assert utils.clean_tree(str(tmp_path), skip_venvs=False) == [os.path.dirname(venv_pycache)]
+    assert utils.clean_tree(str(tmp_path / "missing")) == []
+
+
+def make_tester(simple_tp, report_dir, **kwargs) -> tac.Tester:
+    return tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), working_dir=str(report_dir)),
+        tac.SourceTests(str(simple_tp / "tests"), working_dir=str(report_dir)),
+        report_dir=str(report_dir),
+        **kwargs
+    )
+
+
+def test_tester_clear_pycache_skips_the_clones_and_the_venvs(simple_tp, tmp_path):
+    report_dir = tmp_path / "report"
+    tester = make_tester(simple_tp, report_dir)
+    pycache = touch(report_dir / "src" / "__pycache__" / "functions.cpython.pyc")
+    kept = [
+        make_venv_dir(report_dir / "venv"),
+        touch(report_dir / tac.SourceCode.DEFAULT_LOCAL_REPO_TMP_DIRNAME / "src" / "functions.pyc"),
+        touch(report_dir / tac.SourceTests.DEFAULT_LOCAL_REPO_TMP_DIRNAME / "tests" / "test_functions.pyc"),
+    ]
+    tester.clear_pycache()
+    assert not os.path.exists(pycache)
+    assert all(os.path.exists(path) for path in kept)
+
+
+def test_pycache_prefix_is_cleared_without_walking_the_report_dir(simple_tp, tmp_path):
+    tester = make_tester(simple_tp, tmp_path / "report", pycache_prefix=str(tmp_path / "pycache"))
+    assert tester.get_pytest_env_vars()["PYTHONPYCACHEPREFIX"] == str(tmp_path / "pycache")
+    prefix_pyc = touch(tmp_path / "pycache" / "src" / "functions.cpython.pyc")
+    report_pyc = touch(tmp_path / "report" / "src" / "functions.pyc")
+    tester.clear_pycache()
+    assert not os.path.exists(prefix_pyc)
+    assert os.path.exists(report_pyc)
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tac
+
+
+COVERED_MODULE = "def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a - b\n"
+# The runner is out of the code source, so its coverage must be left out.
+RUNNER_SCRIPT = "import sys\nsys.path.insert(0, sys.argv[1])\nimport covered\ncovered.add(1, 2)\n"
+
+
+@pytest.fixture
+def covered_tester(tmp_path):
+    r"""
+    Tester of a code source whose coverage data file was recorded by running only `covered.add`. Its files are:
+    `covered.py` with 3 of its 4 statements covered, `unused.py` never imported with 2 statements and `empty.py`
+    without statements.
+    """
+    code_dir = tmp_path / "src"
+    os.makedirs(code_dir)
+    (code_dir / "covered.py").write_text(COVERED_MODULE)
+    (code_dir / "unused.py").write_text("VALUE = 1\nOTHER = 2\n")
+    (code_dir / "empty.py").write_text("")
+    os.makedirs(tmp_path / "tests")
+
+    def make_tester(**kwargs) -> tac.Tester:
+        tester = tac.Tester(
+            tac.Source(str(code_dir)), tac.SourceTests(str(tmp_path / "tests")),
+            report_dir=str(tmp_path / "report"), **kwargs
+        )
+        tester.code_src.setup_at(tester.report_dir)
+        return tester
+
+    tester = make_tester()
+    (tmp_path / "runner.py").write_text(RUNNER_SCRIPT)
+    data_file = tester.artifacts.get_path(tester.DOT_COVERAGE_KEY)
+    subprocess.run(
+        [
+            sys.executable, "-m", "coverage", "run", f"--data-file={data_file}",
+            str(tmp_path / "runner.py"), tester.code_src.local_path,
+        ],
+        check=True, cwd=tester.report_dir,
+    )
+    return make_tester
+
+
+def test_coverage_is_the_mean_of_the_files(covered_tester):
+    tester = covered_tester()
+    files_counts = tester.get_coverage_counts_from_data()
+    assert {os.path.basename(f): counts for f, counts in files_counts.items()} == {
+        "covered.py": (4, 3), "unused.py": (2, 0), "empty.py": (0, 0),
+    }
+    # The file without statements is fully covered.
+    assert tester.get_code_coverage() == pytest.approx((75.0 + 0.0 + 100.0) / 3)
+
+
+def test_coverage_by_statements(covered_tester):
+    assert covered_tester(coverage_by_statements=True).get_code_coverage() == pytest.approx(50.0)
+
+
+def test_file_that_is_not_python_is_skipped(covered_tester):
+    tester = covered_tester()
+    with open(os.path.join(tester.code_src.local_path, "invalid.py"), "w") as f:
+        f.write("def broken(:\n")
+    with pytest.warns(UserWarning, match="Could not analyse the coverage"):
+        files_counts = tester.get_coverage_counts_from_data()
+    assert "invalid.py" not in {os.path.basename(f) for f in files_counts}
+
+
+def test_missing_data_file_gives_no_coverage(covered_tester):
+    tester = covered_tester()
+    os.remove(tester.dot_coverage_path)
+    with pytest.warns(UserWarning, match="Could not load the coverage"):
+        assert tester.get_code_coverage() == 0.0
+
+
+@pytest.mark.slow
+def test_tester_reads_the_coverage_without_json_report(simple_tp, venv_cache, tmp_path):
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+        tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(tmp_path / "report"),
+    )
+    report = tester.run()
+    assert tester.dot_coverage_path is not None
+    assert tester.coverage_json_path is None
+    # The coverage is the same as the one of the json report of coverage.
+    json_path = str(tmp_path / "coverage.json")
+    subprocess.run(
+        [sys.executable, "-m", "coverage", "json", f"--data-file={tester.dot_coverage_path}", "-o", json_path],
+        check=True, cwd=tester.report_dir, stdout=subprocess.DEVNULL,
+    )
+    with open(json_path) as f:
+        files = json.load(f)["files"]
+    percents = [d["summary"]["percent_covered"] for d in files.values()]
+    assert report.get_value(tester.CODE_COVERAGE_KEY) == pytest.approx(sum(percents) / len(percents))
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import tac
+
+
+SLOW_TEST = "import time\n\n\ndef test_slow():\n    time.sleep(2)\n"
+
+
+def run_tester(simple_tp, venv_cache, report_dir, **kwargs) -> tac.Tester:
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+        tac.SourceTests(str(simple_tp / "tests")),
+        master_tests_src=tac.SourceMasterTests(str(simple_tp / "tests")),
+        report_dir=str(report_dir),
+        stage_limits={"pytest": 2},
+        **kwargs
+    )
+    tester.run()
+    return tester
+
+
+def overlap(section, other_section) -> bool:
+    return (
+        section["start"] < other_section["start"] + other_section["wall"]
+        and other_section["start"] < section["start"] + section["wall"]
+    )
+
+
+@pytest.mark.slow
+def test_concurrent_stages_match_the_sequential_ones(simple_tp, venv_cache, tmp_path):
+    (simple_tp / "tests" / "test_slow.py").write_text(SLOW_TEST)
+    concurrent_tester = run_tester(simple_tp, venv_cache, tmp_path / "concurrent")
+    sequential_tester = run_tester(simple_tp, venv_cache, tmp_path / "sequential", concurrent_stages=False)
+
+    concurrent_sections = concurrent_tester.timings.sections
+    assert overlap(concurrent_sections["student_tests"], concurrent_sections["master_tests"])
+    # The lint only needs the copied sources, so it runs while the venv is built.
+    assert overlap(concurrent_sections["lint"], concurrent_sections["venv"])
+    sequential_stages = [
+        section for name, section in sequential_tester.timings.sections.items() if "/" not in name
+    ]
+    for i, section in enumerate(sequential_stages):
+        assert not any(overlap(section, other_section) for other_section in sequential_stages[i + 1:])
+
+    # Each session writes its artifacts at its own path of the report directory.
+    results_paths = [concurrent_tester.results_path, concurrent_tester.master_results_path]
+    assert len(set(results_paths)) == 2
+    for path in results_paths:
+        assert os.path.dirname(path) == str(tmp_path / "concurrent")
+
+    concurrent_report, sequential_report = concurrent_tester.report, sequential_tester.report
+    assert concurrent_report.get_value(tac.Tester.MASTER_PERCENT_PASSED_KEY) == pytest.approx(100.0)
+    assert sorted(concurrent_report.keys()) == sorted(sequential_report.keys())
+    for key in sequential_report.keys():
+        assert concurrent_report.get_value(key) == pytest.approx(sequential_report.get_value(key)), key
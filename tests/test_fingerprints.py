@@ -0,0 +1,144 @@
+import pytest
+
+import tac
+from tac import perf_test_case
+
+
+RUN_STAGES = {"run", "tests", "pep8", "master_tests"}
+
+
+class ThresholdCase(perf_test_case.TestCase):
+    EXPECTED = 2
+
+    def __init__(self, name: str, threshold: float):
+        self.name = name
+        self.threshold = threshold
+
+    def run(self):
+        return perf_test_case.TestResult(self.name, 100.0 * min(1.0, self.EXPECTED / self.threshold))
+
+
+class Unfingerprintable:
+    def get_fingerprint(self):
+        return None
+
+
+def make_factory(threshold: float):
+    return lambda tester: ThresholdCase("factory", threshold)
+
+
+def make_tester(simple_tp, report_dir, test_cases=None, **kwargs) -> tac.Tester:
+    if test_cases is None:
+        test_cases = {"threshold": ThresholdCase("threshold", 4), "factory": make_factory(4)}
+    return tac.Tester(
+        tac.SourceCode(str(simple_tp / "src")),
+        tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(report_dir),
+        test_cases=test_cases,
+        **kwargs
+    )
+
+
+def edit_code(simple_tp, monkeypatch):
+    functions_path = simple_tp / "src" / "functions.py"
+    functions_path.write_text(functions_path.read_text() + "\n\ndef new_function():\n    return 0\n")
+    return {}
+
+
+def edit_tests(simple_tp, monkeypatch):
+    tests_path = simple_tp / "tests" / "test_functions.py"
+    tests_path.write_text(tests_path.read_text() + "\n# An edited comment.\n")
+    return {}
+
+
+def edit_expected_value(simple_tp, monkeypatch):
+    monkeypatch.setattr(ThresholdCase, "EXPECTED", 3)
+    return {}
+
+
+MUTATIONS = {
+    "code"                  : (edit_code, RUN_STAGES),
+    "tests"                 : (edit_tests, {"run", "tests", "pep8"}),
+    "expected_value"        : (edit_expected_value, {"run"}),
+    "weights"               : (lambda *_: {"weights": {**tac.Tester.DEFAULT_WEIGHTS, "threshold": 3.0}}, {"run"}),
+    "test_case_parameter"   : (
+        lambda *_: {"test_cases": {"threshold": ThresholdCase("threshold", 5), "factory": make_factory(4)}},
+        {"run"},
+    ),
+    "test_case_factory"     : (
+        lambda *_: {"test_cases": {"threshold": ThresholdCase("threshold", 4), "factory": make_factory(5)}},
+        {"run"},
+    ),
+    "resource_limits"       : (lambda *_: {"resource_limits": {"timeout": 60}}, {"run", "tests", "master_tests"}),
+    "coverage_by_statements": (lambda *_: {"coverage_by_statements": True}, {"run", "tests"}),
+}
+
+
+def test_same_inputs_same_fingerprints(simple_tp, tmp_path):
+    fingerprints = make_tester(simple_tp, tmp_path / "a").get_fingerprints()
+    assert set(fingerprints) == RUN_STAGES
+    assert all(fingerprint is not None for fingerprint in fingerprints.values())
+    assert make_tester(simple_tp, tmp_path / "b").get_fingerprints() == fingerprints
+
+
+@pytest.mark.parametrize("mutation", list(MUTATIONS))
+def test_each_input_changes_its_fingerprints(simple_tp, tmp_path, monkeypatch, mutation):
+    mutate, changed_stages = MUTATIONS[mutation]
+    fingerprints = make_tester(simple_tp, tmp_path / "report").get_fingerprints()
+    kwargs = mutate(simple_tp, monkeypatch)
+    new_fingerprints = make_tester(simple_tp, tmp_path / "report", **kwargs).get_fingerprints()
+    assert {stage for stage in RUN_STAGES if new_fingerprints[stage] != fingerprints[stage]} == changed_stages
+
+
+def test_test_case_dependencies_change_the_run_fingerprint(simple_tp, tmp_path):
+    tester = make_tester(simple_tp, tmp_path / "report")
+    fingerprint = tester.get_fingerprints()["run"]
+    tester.add_test_case("threshold", ThresholdCase("threshold", 4), deps=("install",))
+    assert tester.get_fingerprints()["run"] != fingerprint
+
+
+def test_unfingerprintable_test_case_is_never_reused(simple_tp, tmp_path):
+    logs = []
+    test_cases = {"threshold": ThresholdCase("threshold", 4)}
+    test_cases["threshold"].source = Unfingerprintable()
+    tester = make_tester(simple_tp, tmp_path / "report", test_cases=test_cases, logging_func=logs.append)
+    fingerprints = tester.get_fingerprints()
+    assert fingerprints["run"] is None
+    assert fingerprints["tests"] is not None
+    assert any("Could not fingerprint the test cases" in log for log in logs)
+
+
+@pytest.mark.slow
+def test_changed_inputs_are_not_reused(simple_tp, venv_cache, tmp_path):
+    logs = []
+
+    def run(test_cases=None, **kwargs):
+        logs.clear()
+        tester = tac.Tester(
+            tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+            tac.SourceTests(str(simple_tp / "tests")),
+            report_dir=str(tmp_path / "report"),
+            test_cases=test_cases or {"threshold": ThresholdCase("threshold", 4)},
+            reuse_results=True,
+            logging_func=logs.append,
+            **kwargs
+        )
+        return tester.run()
+
+    def is_reused():
+        return any("Nothing changed since the report" in log for log in logs)
+
+    report = run()
+    assert not is_reused()
+    assert report.get_value("threshold") == pytest.approx(50.0)
+    run()
+    assert is_reused()
+
+    report = run(test_cases={"threshold": ThresholdCase("threshold", 8)})
+    assert not is_reused()
+    assert report.get_value("threshold") == pytest.approx(25.0)
+
+    report = run(test_cases={"threshold": ThresholdCase("threshold", 8)}, coverage_by_statements=True)
+    assert not is_reused()
+    assert any("Reusing the results of the unchanged stages: ['pep8']" in log for log in logs)
+    assert report.get_value("threshold") == pytest.approx(25.0)
@@ -0,0 +1,63 @@
+import os
+import pickle
+
+import tac
+from tac import GitMirrorCache
+from .test_remote_sources import commit_all, git, init_repo, make_bare_clone
+
+
+def setup_source(src: tac.Source, report_dir) -> tac.Source:
+    src.setup_at(str(report_dir))
+    src.repo.close()
+    return src
+
+
+def test_sources_of_a_batch_share_one_mirror(simple_tp, tmp_path):
+    init_repo(simple_tp)
+    commit_all(simple_tp, "first")
+    bare_dir = make_bare_clone(simple_tp, tmp_path / "remote.git")
+    cache = GitMirrorCache(str(tmp_path / "mirrors"))
+
+    code_src = setup_source(tac.Source("src", url=bare_dir, git_mirror_cache=cache), tmp_path / "report")
+    tests_src = setup_source(tac.SourceTests("tests", url=bare_dir, git_mirror_cache=cache), tmp_path / "report")
+    assert (cache.fetches, cache.skipped_fetches) == (1, 0)
+    assert os.path.isdir(cache.get_mirror_path(bare_dir))
+    assert os.path.isfile(os.path.join(code_src.local_path, "functions.py"))
+    assert os.path.isfile(os.path.join(tests_src.local_path, "test_functions.py"))
+    # The clones borrow the objects of the mirror and only check out their source path.
+    for src in [code_src, tests_src]:
+        assert os.path.isfile(os.path.join(src.local_repo_tmp_dirpath, ".git", "objects", "info", "alternates"))
+    assert not os.path.exists(os.path.join(code_src.local_repo_tmp_dirpath, "tests"))
+
+    # The copies of the cache sent to the workers of the batch don't refresh the mirror again.
+    worker_cache = pickle.loads(pickle.dumps(cache))
+    assert worker_cache.batch_id == cache.batch_id
+    setup_source(tac.Source("src", url=bare_dir, git_mirror_cache=worker_cache), tmp_path / "worker_report")
+    # The counters are copied with the cache and are left unchanged.
+    assert (worker_cache.fetches, worker_cache.skipped_fetches) == (1, 0)
+
+
+def test_mirror_is_fetched_only_when_the_remote_head_moved(simple_tp, tmp_path):
+    init_repo(simple_tp)
+    commit_all(simple_tp, "first")
+    bare_dir = make_bare_clone(simple_tp, tmp_path / "remote.git")
+    mirrors_dir = str(tmp_path / "mirrors")
+    setup_source(tac.Source("src", url=bare_dir, git_mirror_cache=mirrors_dir), tmp_path / "first")
+
+    unchanged_batch = GitMirrorCache(mirrors_dir)
+    setup_source(tac.Source("src", url=bare_dir, git_mirror_cache=unchanged_batch), tmp_path / "unchanged")
+    assert (unchanged_batch.fetches, unchanged_batch.skipped_fetches) == (0, 1)
+
+    functions_path = simple_tp / "src" / "functions.py"
+    functions_path.write_text(functions_path.read_text() + "\n\nVERSION = 2\n")
+    commit_all(simple_tp, "second")
+    git("push", bare_dir, "main", cwd=simple_tp)
+    moved_batch = GitMirrorCache(mirrors_dir)
+    src = setup_source(tac.Source("src", url=bare_dir, git_mirror_cache=moved_batch), tmp_path / "moved")
+    assert (moved_batch.fetches, moved_batch.skipped_fetches) == (1, 0)
+    assert "VERSION = 2" in open(os.path.join(src.local_path, "functions.py")).read()
+
+    # An existing clone is updated from the refreshed mirror.
+    src = setup_source(tac.Source("src", url=bare_dir, git_mirror_cache=moved_batch), tmp_path / "unchanged")
+    assert "VERSION = 2" in open(os.path.join(src.local_path, "functions.py")).read()
+    assert (moved_batch.fetches, moved_batch.skipped_fetches) == (1, 0)
@@ -0,0 +1,90 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from tac import LintCache
+from tac.perf_test_case import PEP8TestCasePylint
+from .conftest import EXAMPLE_DIR
+
+
+UNUSED_IMPORT = "import os\n\n\ndef f(x):\n    return x\n"
+
+
+@pytest.fixture
+def files_dir(tmp_path):
+    files_dir = tmp_path / "src"
+    shutil.copytree(os.path.join(EXAMPLE_DIR, "src"), files_dir)
+    (files_dir / "unused_import.py").write_text(UNUSED_IMPORT)
+    return files_dir
+
+
+def get_pylint_cli_score(files_dir) -> float:
+    r"""
+    Return the score of the directory as printed by the pylint command line, in percent.
+    """
+    stdout = subprocess.run(
+        [sys.executable, "-m", "pylint", str(files_dir), f"--max-line-length={PEP8TestCasePylint.MAX_LINE_LENGTH}"],
+        stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    return 10 * float(re.search(r"rated at (-?[\d.]+)/10", stdout).group(1))
+
+
+def test_key_depends_on_the_content_the_linter_and_its_options(tmp_path):
+    (tmp_path / "a.py").write_text(UNUSED_IMPORT)
+    (tmp_path / "b.py").write_text(UNUSED_IMPORT)
+    (tmp_path / "c.py").write_text(UNUSED_IMPORT + "\n")
+    key = LintCache.make_key(str(tmp_path / "a.py"), "pylint==1", ["--max-line-length=120"])
+    assert LintCache.make_key(str(tmp_path / "b.py"), "pylint==1", ["--max-line-length=120"]) == key
+    assert LintCache.make_key(str(tmp_path / "c.py"), "pylint==1", ["--max-line-length=120"]) != key
+    assert LintCache.make_key(str(tmp_path / "a.py"), "pylint==2", ["--max-line-length=120"]) != key
+    assert LintCache.make_key(str(tmp_path / "a.py"), "pylint==1", ["--max-line-length=80"]) != key
+
+
+def test_entries_persist_across_instances(tmp_path):
+    entry = {"stats": {"statement": 2, "warning": 1}, "messages": {"unused-import": 1}}
+    cache = LintCache(str(tmp_path / "cache"))
+    assert cache.get("ab12") is None
+    cache.set("ab12", entry)
+    assert cache.get("ab12") == entry
+    other_cache = LintCache(str(tmp_path / "cache"))
+    assert other_cache.get("ab12") == entry
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert other_cache.clear().get("ab12") is None
+
+
+def test_cached_score_matches_the_pylint_score(files_dir, tmp_path):
+    expected = get_pylint_cli_score(files_dir)
+    uncached = PEP8TestCasePylint("PEP8", str(files_dir)).run()
+    cache = LintCache(str(tmp_path / "cache"))
+    first = PEP8TestCasePylint("PEP8", str(files_dir), lint_cache=cache).run()
+    second = PEP8TestCasePylint("PEP8", str(files_dir), lint_cache=LintCache(str(tmp_path / "cache"))).run()
+    assert cache.misses == 3
+    for result in [uncached, first, second]:
+        assert result.percent_value == pytest.approx(expected)
+        assert result.details == uncached.details
+    assert uncached.details["message_counts"]["unused-import"] == 1
+
+
+def test_only_the_changed_files_are_linted(files_dir, tmp_path, monkeypatch):
+    cache = LintCache(str(tmp_path / "cache"))
+    PEP8TestCasePylint("PEP8", str(files_dir), lint_cache=cache).run()
+    linted = []
+    lint_files = PEP8TestCasePylint._lint_files
+
+    def record_lint_files(self, filepaths):
+        linted.append(sorted(filepaths))
+        return lint_files(self, filepaths)
+
+    monkeypatch.setattr(PEP8TestCasePylint, "_lint_files", record_lint_files)
+    # A resubmission in another directory, with one changed file.
+    resubmission_dir = tmp_path / "resubmission"
+    shutil.copytree(files_dir, resubmission_dir)
+    (resubmission_dir / "unused_import.py").write_text(UNUSED_IMPORT.replace("import os\n", "import os\nimport sys\n"))
+    result = PEP8TestCasePylint("PEP8", str(resubmission_dir), lint_cache=cache).run()
+    assert linted == [[str(resubmission_dir / "unused_import.py")]]
+    assert result.details["message_counts"]["unused-import"] == 2
+    assert result.percent_value == pytest.approx(get_pylint_cli_score(resubmission_dir))
@@ -0,0 +1,68 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tac.perf_test_case import PEP8TestCasePylint
+
+
+CLEAN_MODULE = '"""A clean module."""\n\n\ndef add(a, b):\n    """Add a and b."""\n    return a + b\n'
+UNUSED_IMPORT = (
+    '"""A module with an unused import."""\nimport os\n\n\ndef sub(a, b):\n    """Sub b from a."""\n    return a - b\n'
+)
+
+
+@pytest.fixture
+def files_dir(tmp_path):
+    files_dir = tmp_path / "src"
+    # Two modules of the same name are linted in separate pylint runs.
+    for package, content in [("pkg_a", CLEAN_MODULE), ("pkg_b", UNUSED_IMPORT)]:
+        os.makedirs(files_dir / package)
+        (files_dir / package / "__init__.py").write_text(f'"""The package {package}."""\n')
+        (files_dir / package / "utils.py").write_text(content)
+    return files_dir
+
+
+def test_results_are_structured_by_file(files_dir):
+    result = PEP8TestCasePylint("PEP8", str(files_dir)).run()
+    details = result.details
+    assert details["message_counts"] == {"unused-import": 1}
+    assert details["file_scores"][str(files_dir / "pkg_a" / "utils.py")] == pytest.approx(10.0)
+    assert details["file_scores"][str(files_dir / "pkg_b" / "utils.py")] < 10.0
+    assert details["file_scores"][str(files_dir / "pkg_a" / "__init__.py")] is None
+    assert details["stats"]["warning"] == 1
+    assert details["stats"]["statement"] == 5
+    assert result.percent_value == pytest.approx(10 * round(PEP8TestCasePylint.compute_score(details["stats"]), 2))
+
+
+def test_directory_without_statements_gets_the_full_score(tmp_path):
+    os.makedirs(tmp_path / "empty")
+    result = PEP8TestCasePylint("PEP8", str(tmp_path / "empty")).run()
+    assert result.percent_value == 100.0
+    assert result.details["file_scores"] == {}
+
+
+def test_concurrent_runs_capture_no_global_output(files_dir, tmp_path, capfd):
+    os.makedirs(tmp_path / "other")
+    (tmp_path / "other" / "module.py").write_text(UNUSED_IMPORT)
+    expected = [
+        PEP8TestCasePylint("PEP8", str(files_dir)).run().details,
+        PEP8TestCasePylint("PEP8", str(tmp_path / "other")).run().details,
+    ]
+    stdout = sys.stdout
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(
+            lambda files_dirs: PEP8TestCasePylint.run_many("PEP8", files_dirs, jobs=2),
+            [[str(files_dir), str(tmp_path / "other")]] * 4,
+        ))
+    assert sys.stdout is stdout
+    assert capfd.readouterr().out == ""
+    for result in results:
+        assert [test_result.details for test_result in result] == expected
+
+
+def test_failed_pylint_run_raises(files_dir, monkeypatch):
+    monkeypatch.setattr(PEP8TestCasePylint, "RUNNER_SCRIPT", str(files_dir / "missing_runner.py"))
+    with pytest.raises(RuntimeError, match="pylint failed"):
+        PEP8TestCasePylint("PEP8", str(files_dir)).run()
@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import tac
+from tac import PytestResults
+
+
+SAMPLE_TESTS = '''import pytest
+
+
+@pytest.fixture
+def broken_teardown():
+    yield
+    raise RuntimeError("teardown")
+
+
+def test_passed():
+    assert True
+
+
+def test_failed():
+    assert False
+
+
+@pytest.mark.skip(reason="skipped")
+def test_skipped():
+    pass
+
+
+@pytest.mark.xfail(reason="expected")
+def test_xfailed():
+    assert False
+
+
+def test_error_at_teardown(broken_teardown):
+    assert True
+
+
+def test_deselected():
+    pass
+'''
+
+
+@pytest.fixture
+def results(tmp_path):
+    r"""
+    Results of a pytest session with every outcome, a collection error and a deselected test, collected both by the
+    results plugin of tac and by pytest-json-report.
+    """
+    pytest.importorskip("pytest_jsonreport")
+    plugins_dir = tmp_path / "plugins"
+    os.makedirs(plugins_dir)
+    plugin_filename = f"{PytestResults.PLUGIN_NAME}.py"
+    shutil.copyfile(os.path.join(os.path.dirname(tac.__file__), plugin_filename), plugins_dir / plugin_filename)
+    tests_dir = tmp_path / "tests"
+    os.makedirs(tests_dir)
+    (tests_dir / "test_sample.py").write_text(SAMPLE_TESTS)
+    (tests_dir / "test_broken.py").write_text("import missing_module\n")
+    env = {
+        **os.environ,
+        "PYTHONPATH"               : str(plugins_dir),
+        PytestResults.FILE_ENV_VAR: str(tmp_path / "results.jsonl"),
+    }
+    subprocess.run(
+        [
+            sys.executable, "-m", "pytest", str(tests_dir), "-p", "no:cacheprovider",
+            "-p", PytestResults.PLUGIN_NAME, "--continue-on-collection-errors", "--deselect",
+            "tests/test_sample.py::test_deselected", "--json-report", f"--json-report-file={tmp_path / 'report.json'}",
+        ],
+        cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return PytestResults.load(str(tmp_path / "results.jsonl")), PytestResults.load(str(tmp_path / "report.json"))
+
+
+def test_results_match_the_json_report(results):
+    plugin_results, json_report = results
+    assert plugin_results["exitcode"] == json_report["exitcode"] == 1
+    assert plugin_results["root"] == json_report["root"]
+    assert {t["nodeid"]: t["outcome"] for t in plugin_results["tests"]} == {
+        t["nodeid"]: t["outcome"] for t in json_report["tests"]
+    }
+    summary = {k: v for k, v in json_report["summary"].items() if k != "deselected"}
+    assert plugin_results["summary"] == summary
+    assert plugin_results["summary"]["collected"] == 6
+    assert [c["nodeid"] for c in plugin_results["collectors"]] == ["tests/test_broken.py"]
+    assert all(t["duration"] >= 0.0 for t in plugin_results["tests"])
+
+
+def test_save_and_load(results, tmp_path):
+    plugin_results, json_report = results
+    assert PytestResults.load(PytestResults.save(str(tmp_path / "saved.jsonl"), plugin_results)) == plugin_results
+    assert PytestResults.load(PytestResults.save(str(tmp_path / "saved.json"), json_report)) == json_report
+
+
+def test_interrupted_session_is_summarized_from_its_finished_tests(results, tmp_path):
+    plugin_results, _ = results
+    path = str(tmp_path / "results.jsonl")
+    with open(path, "r") as f:
+        lines = f.readlines()
+    # The session is killed while writing the record of its third test.
+    with open(path, "w") as f:
+        f.writelines(lines[:4] + [lines[4][:10]])
+    interrupted = PytestResults.load(path)
+    assert interrupted["exitcode"] is None
+    assert interrupted["tests"] == plugin_results["tests"][:2]
+    assert interrupted["summary"] == {"passed": 1, "failed": 1, "total": 2, "collected": 2}
+
+
+def test_missing_results_count_no_test(simple_tp, tmp_path):
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src")), tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(tmp_path / "report"),
+    )
+    with pytest.warns(UserWarning, match="no test is counted"):
+        summary = tester.get_test_cases_summary()
+    assert summary["total"] == 0
+    assert summary[tester.PERCENT_PASSED_KEY] == 100 * tester.DEFAULT_PASSED_RATIO_ZERO_TESTS
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("json_report", [False, True])
+def test_tester_writes_the_json_report_on_demand(simple_tp, venv_cache, tmp_path, json_report):
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+        tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(tmp_path / "report"),
+        json_report=json_report,
+    )
+    tester.run()
+    assert tester.results_path is not None
+    assert (tester.dot_report_json_path is not None) == json_report
+    summary = PytestResults.load(tester.results_path)["summary"]
+    assert summary["total"] == tester.test_cases_summary["total"] > 0
+    if json_report:
+        with open(tester.dot_report_json_path) as f:
+            assert json.load(f)["summary"]["total"] == summary["total"]
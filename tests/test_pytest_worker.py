@@ -0,0 +1,91 @@
+import sys
+
+import pytest
+
+import tac
+from tac.pytest_worker import PytestWorker, PytestWorkerError, PytestWorkerPool
+
+
+pytestmark = pytest.mark.skipif(not PytestWorker.is_supported(), reason="warm workers rely on os.fork")
+
+PASSING_TEST = "def test_ok():\n    assert True\n"
+KILLING_TEST = (
+    "import os\n"
+    "import signal\n"
+    "\n"
+    "\n"
+    "def test_kill_the_parent():\n"
+    "    os.kill(os.getppid(), signal.SIGKILL)\n"
+)
+PYTEST_ARGS = ["-q", "-p", "no:cacheprovider"]
+
+
+@pytest.fixture
+def pool():
+    pool = PytestWorkerPool(max_idle_workers=2)
+    yield pool
+    pool.close()
+
+
+def acquire(pool: PytestWorkerPool):
+    return pool.acquire(sys.prefix, sys.executable)
+
+
+def test_worker_runs_sessions_in_clean_children(pool, tmp_path):
+    (tmp_path / "test_ok.py").write_text(PASSING_TEST)
+    with acquire(pool) as worker:
+        first = worker.run(PYTEST_ARGS + ["test_ok.py"], cwd=str(tmp_path), timeout=60)
+        second = worker.run(PYTEST_ARGS + ["test_ok.py"], cwd=str(tmp_path), timeout=60)
+    assert first["exit_code"] == second["exit_code"] == 0
+    assert first["child_pid"] != second["child_pid"]
+    assert "pytest" in worker.preloaded
+    assert len(pool) == 1
+
+
+def test_concurrent_sessions_get_their_own_worker(pool):
+    with acquire(pool) as first, acquire(pool) as second:
+        assert first is not second
+        first.start()
+        second.start()
+    assert len(pool.idle) == 2
+    with acquire(pool) as third, acquire(pool) as fourth, acquire(pool) as fifth:
+        assert {third, fourth} == {first, second}
+        assert fifth not in (first, second)
+        fifth.start()
+    # Only the 2 most recently used idle workers are kept.
+    assert len(pool) == 2
+    assert sum(worker.is_alive for worker in (third, fourth, fifth)) == 2
+
+
+def test_worker_killed_by_the_tested_code_is_dropped(pool, tmp_path):
+    (tmp_path / "test_kill.py").write_text(KILLING_TEST)
+    (tmp_path / "test_ok.py").write_text(PASSING_TEST)
+    with acquire(pool) as worker:
+        with pytest.raises(PytestWorkerError):
+            worker.run(PYTEST_ARGS + ["test_kill.py"], cwd=str(tmp_path), timeout=60)
+    assert not worker.is_alive
+    assert len(pool) == 0
+    with acquire(pool) as new_worker:
+        assert new_worker is not worker
+        result = new_worker.run(PYTEST_ARGS + ["test_ok.py"], cwd=str(tmp_path), timeout=60)
+    assert result["exit_code"] == 0
+    assert len(pool) == 1
+
+
+@pytest.mark.slow
+def test_tester_records_a_killed_worker_as_a_crash(simple_tp, venv_cache, tmp_path):
+    (simple_tp / "tests" / "test_kill.py").write_text(KILLING_TEST)
+    logs = []
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+        tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(tmp_path / "report"),
+        warm_workers=True,
+        logging_func=logs.append,
+    )
+    report = tester.run()
+    outcome = tester.process_outcomes[tac.Tester.TESTS_SUITE]
+    assert outcome.status == tac.ProcessOutcome.CRASH
+    assert "PytestWorkerError" in outcome.stdout
+    assert any("ended with: crash" in log for log in logs)
+    assert report.get_value("PEP8") is not None
@@ -0,0 +1,134 @@
+import os
+import subprocess
+
+import pytest
+
+import tac
+
+
+def git(*args, cwd):
+    subprocess.run(["git", *args], cwd=str(cwd), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def init_repo(work_dir):
+    git("init", "--initial-branch=main", cwd=work_dir)
+    git("config", "user.email", "tests@example.com", cwd=work_dir)
+    git("config", "user.name", "tests", cwd=work_dir)
+
+
+def commit_all(work_dir, message: str):
+    git("add", "-A", cwd=work_dir)
+    git("commit", "-m", message, cwd=work_dir)
+
+
+def make_bare_clone(work_dir, bare_dir) -> str:
+    git("clone", "--bare", str(work_dir), str(bare_dir), cwd=os.path.dirname(str(bare_dir)))
+    # Allow the partial clones, as the git hosting services do.
+    git("config", "uploadpack.allowFilter", "true", cwd=bare_dir)
+    return str(bare_dir)
+
+
+def git_output(*args, cwd) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=str(cwd), check=True, capture_output=True, universal_newlines=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def bare_repo(simple_tp, tmp_path):
+    r"""
+    Bare repo of the example with its code in src and its tests in tests, as a submission on a git hosting service.
+    """
+    init_repo(simple_tp)
+    commit_all(simple_tp, "submission")
+    return make_bare_clone(simple_tp, tmp_path / "remote.git")
+
+
+def test_sources_of_a_tester_clone_into_their_own_dirs(bare_repo, tmp_path):
+    report_dir = str(tmp_path / "report")
+    sources = [
+        tac.Source("src", url=bare_repo),
+        tac.SourceTests("tests", url=bare_repo),
+        tac.SourceMasterTests("tests", url=bare_repo),
+    ]
+    # As the clone and copy stages of a tester, every source is fetched before any of them is copied.
+    for src in sources:
+        src.fetch_at(report_dir)
+    for src in sources:
+        src.copy_src_files()
+    assert len({src.local_repo_tmp_dirpath for src in sources}) == len(sources)
+    code_src, tests_src, master_tests_src = sources
+    assert os.path.isfile(os.path.join(code_src.local_path, "functions.py"))
+    assert os.path.isfile(os.path.join(tests_src.local_path, "test_functions.py"))
+    assert os.path.isfile(os.path.join(master_tests_src.local_path, "test_functions.py"))
+    assert master_tests_src.local_path != tests_src.local_path
+
+
+def test_source_shared_by_two_testers_keeps_its_path_in_the_repo(bare_repo, tmp_path):
+    master_tests_src = tac.SourceMasterTests("tests", url=bare_repo)
+    fingerprint = master_tests_src.get_fingerprint()
+    assert fingerprint is not None
+    for report_dir in [tmp_path / "first", tmp_path / "second"]:
+        master_tests_src.setup_at(str(report_dir))
+        assert master_tests_src.get_sparse_checkout_paths() == ["tests"]
+        assert master_tests_src.src_path == os.path.join(master_tests_src.local_repo_tmp_dirpath, "tests")
+        assert master_tests_src.local_path == str(report_dir / "master_tests")
+        assert os.path.isfile(os.path.join(master_tests_src.local_path, "test_functions.py"))
+        assert master_tests_src.get_fingerprint() == fingerprint
+
+
+def test_default_src_dir_is_found_in_the_repo(bare_repo, tmp_path):
+    tests_src = tac.SourceTests(url=bare_repo)
+    assert tests_src.get_sparse_checkout_paths() is None
+    for report_dir in [tmp_path / "first", tmp_path / "second"]:
+        tests_src.setup_at(str(report_dir))
+        assert tests_src.get_sparse_checkout_paths() == ["tests"]
+        assert tests_src.src_path == os.path.join(str(report_dir), "tmp_git_tests", "tests")
+        assert os.path.isfile(os.path.join(tests_src.local_path, "test_functions.py"))
+
+
+@pytest.mark.slow
+def test_master_tests_shared_by_two_testers(bare_repo, venv_cache, tmp_path):
+    master_tests_src = tac.SourceMasterTests("tests", url=bare_repo)
+    reports = []
+    for name in ["first", "second"]:
+        tester = tac.Tester(
+            tac.SourceCode("src", url=bare_repo, venv_cache=venv_cache),
+            tac.SourceTests("tests", url=bare_repo),
+            master_tests_src=master_tests_src,
+            report_dir=str(tmp_path / name),
+        )
+        reports.append(tester.run())
+        assert os.path.isdir(os.path.join(str(tmp_path / name), "master_tests"))
+    first, second = reports
+    assert first.grade > 0.0
+    assert sorted(first.keys()) == sorted(second.keys())
+    for key in first.keys():
+        assert second.get_value(key) == pytest.approx(first.get_value(key)), key
+
+
+@pytest.mark.parametrize("clone_kwargs, expected_commits, expected_filter, is_sparse", [
+    ({}, 1, "blob:none", True),
+    ({"clone_depth": None, "clone_filter": None, "sparse_checkout": False}, 2, "", False),
+])
+def test_clone_is_shallow_partial_and_sparse_by_default(
+        simple_tp, tmp_path, clone_kwargs, expected_commits, expected_filter, is_sparse
+):
+    init_repo(simple_tp)
+    os.makedirs(simple_tp / "datasets")
+    (simple_tp / "datasets" / "data.bin").write_bytes(os.urandom(1024))
+    commit_all(simple_tp, "first")
+    functions_path = simple_tp / "src" / "functions.py"
+    functions_path.write_text(functions_path.read_text() + "\n\nVERSION = 2\n")
+    commit_all(simple_tp, "second")
+    bare_dir = make_bare_clone(simple_tp, tmp_path / "remote.git")
+
+    src = tac.Source("src", url=bare_dir, **clone_kwargs)
+    src.setup_at(str(tmp_path / "report"))
+    clone_path = src.local_repo_tmp_dirpath
+    assert git_output("rev-list", "--count", "HEAD", cwd=clone_path) == str(expected_commits)
+    assert git_output("config", "--default", "", "remote.origin.partialclonefilter", cwd=clone_path) == expected_filter
+    assert os.path.exists(os.path.join(clone_path, "datasets")) != is_sparse
+    # The files of the root of the repo, like the requirements, are checked out with the source path.
+    assert os.path.isfile(os.path.join(clone_path, "requirements.txt"))
+    assert "VERSION = 2" in (tmp_path / "report" / "src" / "functions.py").read_text()
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from tac import Report, ReportBatch, ReportStore
+
+
+KEYS = ["code_coverage", "percent_passed", "PEP8"]
+
+
+def make_reports(n_reports: int = 20, seed: int = 42, **kwargs):
+    rng = np.random.default_rng(seed)
+    reports = {}
+    for i in range(n_reports):
+        report = Report(**kwargs)
+        for key in KEYS:
+            # Some reports miss some keys, e.g. the ones without master tests.
+            if rng.random() < 0.2:
+                continue
+            report.add(key, float(rng.uniform(0.0, 100.0)), weight=float(rng.uniform(0.0, 3.0)))
+        reports[f"student_{i}"] = report
+    reports["empty"] = Report(**kwargs)
+    reports["normalized"] = Report({key: {"value": 50.0, "weight": 1 / len(KEYS)} for key in KEYS}, **kwargs)
+    return reports
+
+
+@pytest.mark.parametrize(
+    "grade_kwargs",
+    [
+        {},
+        {"grade_min_value": 40.0},
+        {"grade_min": 10.0, "grade_max": 90.0},
+        {"grade_norm_func": lambda grade: min(max(grade, 0.0), 80.0)},
+    ],
+)
+def test_grades_match_the_report_grades(grade_kwargs):
+    reports = make_reports(**grade_kwargs)
+    batch = ReportBatch.from_reports(reports)
+    expected = [report.grade for report in reports.values()]
+    np.testing.assert_allclose(batch.grades, expected)
+    assert batch.get_grades_by_name() == pytest.approx(dict(zip(reports.keys(), expected)))
+
+
+def test_reweight_matches_reports_with_the_new_weights():
+    reports = make_reports()
+    weights = {"code_coverage": 2.0, "percent_passed": 1.0}
+    batch = ReportBatch.from_reports(reports).reweight(weights)
+    for grade, report in zip(batch.grades, reports.values()):
+        reweighted = Report()
+        for key in report.keys():
+            reweighted.add(key, report.get_value(key), weight=weights.get(key, 0.0))
+        # Report.grade is undefined when all the weights are zero, e.g. for a report with only PEP8.
+        if sum(reweighted.get_weight(key) for key in reweighted.keys()) > 0.0:
+            assert grade == pytest.approx(reweighted.grade)
+
+
+def test_sweep_matches_reweight():
+    batch = ReportBatch.from_reports(make_reports())
+    weights_grid = [{"code_coverage": w, "percent_passed": 1.0, "PEP8": 0.5} for w in [0.0, 0.5, 1.0, 2.0]]
+    grades = batch.sweep(weights_grid)
+    assert grades.shape == (len(weights_grid), batch.n_reports)
+    for weights, candidate_grades in zip(weights_grid, grades):
+        np.testing.assert_allclose(candidate_grades, batch.reweight(weights).grades)
+    np.testing.assert_allclose(batch.sweep(np.array([[1.0, 2.0, 3.0]]))[0], batch.get_grades([1.0, 2.0, 3.0]))
+
+
+def test_unknown_keys_are_rejected():
+    batch = ReportBatch.from_reports(make_reports())
+    with pytest.raises(KeyError):
+        batch.get_grades({"unknown": 1.0})
+    with pytest.raises(ValueError):
+        batch.get_grades([1.0, 2.0])
+
+
+def test_to_reports_round_trip():
+    reports = make_reports()
+    batch = ReportBatch.from_reports(reports)
+    for report, batch_report in zip(reports.values(), batch.to_reports()):
+        assert sorted(batch_report.keys()) == sorted(report.keys())
+        assert batch_report.grade == pytest.approx(report.grade)
+
+
+@pytest.mark.parametrize("grade_kwargs", [{}, {"grade_min_value": 40.0, "grade_norm_func": lambda grade: grade / 2}])
+def test_from_report_store(tmp_path, grade_kwargs):
+    reports = make_reports(5, **grade_kwargs)
+    with ReportStore(str(tmp_path / "reports.sqlite")) as report_store:
+        report_store.save_many([(report, name, "tp1", "") for name, report in reports.items()])
+        batch = ReportBatch.from_report_store(report_store, grade_kwargs=grade_kwargs, assignment="tp1")
+        # grade_min is a filter of the store there, not a grade option of the batch.
+        filtered_batch = ReportBatch.from_report_store(report_store, grade_kwargs=grade_kwargs, grade_min=40.0)
+        with pytest.raises(TypeError):
+            ReportBatch.from_report_store(report_store, grade_kwargs={"grade_maxi": 20.0})
+    expected = {name: report.grade for name, report in reports.items() if len(report)}
+    assert batch.get_grades_by_name() == pytest.approx(expected)
+    assert filtered_batch.get_grades_by_name() == pytest.approx(
+        {name: grade for name, grade in expected.items() if grade >= 40.0}
+    )
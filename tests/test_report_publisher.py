@@ -0,0 +1,131 @@
+import os
+import subprocess
+
+import git
+import pytest
+
+from tac import ReportPublisher
+from tac.utils import push_file_to_git_repo
+
+
+@pytest.fixture
+def bare_repo(tmp_path):
+    repo_path = tmp_path / "remote.git"
+    subprocess.run(["git", "init", "--bare", "-q", str(repo_path)], check=True)
+    return str(repo_path)
+
+
+def make_files(root, n_files: int, prefix: str = "report", content: str = "{}"):
+    os.makedirs(root, exist_ok=True)
+    filepaths = []
+    for i in range(n_files):
+        filepath = os.path.join(root, f"{prefix}_{i}.json")
+        with open(filepath, "w") as f:
+            f.write(content)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def get_remote_files(repo_path: str, branch: str = ReportPublisher.DEFAULT_BRANCH):
+    return sorted(git.Repo(repo_path).git.ls_tree("-r", "--name-only", branch).splitlines())
+
+
+def get_remote_content(repo_path: str, path: str, branch: str = ReportPublisher.DEFAULT_BRANCH) -> str:
+    return git.Repo(repo_path).git.show(f"{branch}:{path}")
+
+
+def count_remote_commits(repo_path: str, branch: str = ReportPublisher.DEFAULT_BRANCH) -> int:
+    return int(git.Repo(repo_path).git.rev_list("--count", branch))
+
+
+def test_first_publish_to_empty_repo(bare_repo, tmp_path):
+    publisher = ReportPublisher(bare_repo, root=str(tmp_path / "clones"))
+    for filepath in make_files(tmp_path / "reports", 3):
+        publisher.add(filepath, f"student/{os.path.basename(filepath)}")
+    shas = publisher.publish()
+    assert len(shas) == 1
+    assert get_remote_files(bare_repo) == [f"student/report_{i}.json" for i in range(3)]
+    assert git.Repo(bare_repo).git.rev_parse(ReportPublisher.DEFAULT_BRANCH) == shas[-1]
+    assert not publisher.pending
+
+
+def test_publish_without_changes_makes_no_commit(bare_repo, tmp_path):
+    publisher = ReportPublisher(bare_repo, root=str(tmp_path / "clones"))
+    filepaths = make_files(tmp_path / "reports", 2)
+    for filepath in filepaths:
+        publisher.add(filepath)
+    assert len(publisher.publish()) == 1
+    for filepath in filepaths:
+        publisher.add(filepath)
+    assert publisher.publish() == []
+    assert count_remote_commits(bare_repo) == 1
+
+
+def test_max_files_per_commit(bare_repo, tmp_path):
+    publisher = ReportPublisher(bare_repo, root=str(tmp_path / "clones"), max_files_per_commit=2)
+    for filepath in make_files(tmp_path / "reports", 5):
+        publisher.add(filepath)
+    shas = publisher.publish()
+    assert len(shas) == 3
+    assert count_remote_commits(bare_repo) == 3
+    assert len(get_remote_files(bare_repo)) == 5
+
+
+def make_racing_publisher(bare_repo, tmp_path, racing_files):
+    r"""
+    Make a publisher whose push is rejected once because another grader publishes the given files between its
+    commits and its push.
+    """
+    other = ReportPublisher(bare_repo, root=str(tmp_path / "other_clones"))
+    publisher = ReportPublisher(bare_repo, root=str(tmp_path / "clones"), max_retries=2)
+    commit = publisher._commit
+    raced = []
+
+    def commit_then_race(repo, files):
+        shas = commit(repo, files)
+        if not raced:
+            raced.append(True)
+            for filepath, dst_path in racing_files:
+                other.add(filepath, dst_path)
+            other.publish()
+        return shas
+
+    publisher._commit = commit_then_race
+    return publisher
+
+
+def test_rejected_push_is_rebased_and_retried(bare_repo, tmp_path):
+    ReportPublisher(bare_repo, root=str(tmp_path / "init_clones")).add(
+        make_files(tmp_path / "init", 1, prefix="init")[0]
+    ).publish()
+    other_file = make_files(tmp_path / "other", 1, prefix="other")[0]
+    publisher = make_racing_publisher(bare_repo, tmp_path, [(other_file, None)])
+    publisher.add(make_files(tmp_path / "reports", 1)[0])
+    shas = publisher.publish()
+    assert publisher.retries == 1
+    assert len(shas) == 1
+    assert get_remote_files(bare_repo) == ["init_0.json", "other_0.json", "report_0.json"]
+    assert git.Repo(bare_repo).git.rev_parse(ReportPublisher.DEFAULT_BRANCH) == shas[-1]
+
+
+def test_conflicting_push_keeps_the_last_publication(bare_repo, tmp_path):
+    ReportPublisher(bare_repo, root=str(tmp_path / "init_clones")).add(
+        make_files(tmp_path / "init", 1, content='{"grade": 0}')[0]
+    ).publish()
+    other_file = make_files(tmp_path / "other", 1, content='{"grade": 1}')[0]
+    publisher = make_racing_publisher(bare_repo, tmp_path, [(other_file, "report_0.json")])
+    publisher.add(make_files(tmp_path / "reports", 1, content='{"grade": 2}')[0])
+    shas = publisher.publish()
+    assert publisher.retries == 1
+    assert len(shas) == 1
+    assert get_remote_content(bare_repo, "report_0.json") == '{"grade": 2}'
+    assert count_remote_commits(bare_repo) == 3
+
+
+def test_push_file_to_git_repo_leaves_no_clone(bare_repo, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    filepath = make_files(tmp_path / "reports", 1)[0]
+    assert push_file_to_git_repo(filepath, bare_repo)
+    assert get_remote_files(bare_repo) == ["report_0.json"]
+    assert not os.path.exists(tmp_path / "tmp_repo")
+    assert not os.path.exists(tmp_path / "tmp_repo.lock")
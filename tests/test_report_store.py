@@ -0,0 +1,96 @@
+import csv
+import json
+
+import pytest
+
+from tac import Report, ReportStore
+
+
+def make_report(code_coverage: float, passed: int, total: int, report_filepath=None) -> Report:
+    report = Report(
+        report_filepath=report_filepath,
+        metadata={
+            "stages": {
+                "tests": {"tests_test_cases_summary": {"passed": passed, "failed": total - passed, "total": total}},
+            },
+        },
+        timings={
+            "sections": {"student_tests": {"start": 1.0, "wall": 2.5, "cpu": 1.5}},
+            "total": {"start": 0.0, "wall": 4.0, "cpu": 3.0},
+        },
+    )
+    report.add("code_coverage", code_coverage, weight=1.0)
+    report.add("percent_passed", 100.0 * passed / total, weight=3.0)
+    return report
+
+
+@pytest.fixture
+def report_store(tmp_path):
+    with ReportStore(str(tmp_path / "reports.sqlite")) as report_store:
+        yield report_store
+
+
+def test_save_and_load_round_trip(report_store):
+    report = make_report(80.0, 3, 4, report_filepath="alice/report.json")
+    report_store.save(report, "alice", "tp1", "run1")
+    loaded = report_store.get_report("alice", "tp1", "run1")
+    # The state is stored as json, like in the report files.
+    assert loaded.get_state() == json.loads(json.dumps(report.get_state()))
+    assert loaded.grade == pytest.approx(report.grade)
+    assert report_store.get_report("bob", "tp1", "run1") is None
+
+
+def test_save_replaces_the_previous_report_of_a_student(report_store):
+    report_store.save(make_report(10.0, 1, 4), "alice", "tp1", "run1")
+    report_store.save(make_report(90.0, 4, 4), "alice", "tp1", "run1")
+    report_store.save(make_report(50.0, 2, 4), "alice", "tp1", "run2")
+    assert len(report_store) == 2
+    assert report_store.get_report("alice", "tp1", "run1").get_value("code_coverage") == 90.0
+
+
+def test_buffered_reports_are_written_on_flush(report_store):
+    for i in range(3):
+        report_store.add(make_report(10.0 * i, i, 4), f"student_{i}", "tp1")
+    assert len(report_store) == 0
+    report_store.flush()
+    assert [row["student"] for row in report_store.query(assignment="tp1")] == [f"student_{i}" for i in range(3)]
+
+
+def test_queries(report_store, tmp_path):
+    reports = {"alice": make_report(80.0, 3, 4), "bob": make_report(20.0, 1, 4)}
+    report_store.save_many([(report, student, "tp1", "run1") for student, report in reports.items()])
+
+    rows = report_store.query(grade_min=50.0)
+    assert [row["student"] for row in rows] == ["alice"]
+    assert rows[0]["grade"] == pytest.approx(reports["alice"].grade)
+
+    summaries = {summary["student"]: summary for summary in report_store.get_summary(assignment="tp1")}
+    assert summaries["bob"]["code_coverage"] == 20.0
+    assert summaries["bob"]["tests/passed"] == 1
+    assert summaries["bob"]["tests/total"] == 4
+
+    values = report_store.get_report_values(student="alice")
+    assert {row["key"]: (row["value"], row["weight"]) for row in values} == {
+        "code_coverage" : (80.0, 1.0),
+        "percent_passed": (75.0, 3.0),
+    }
+
+    timings = report_store.get_stage_timings("student_tests")
+    assert [(row["student"], row["wall"]) for row in timings] == [("alice", 2.5), ("bob", 2.5)]
+
+    csv_path = report_store.export_csv(str(tmp_path / "reports.csv"))
+    with open(csv_path, newline="") as f:
+        assert sorted(row["student"] for row in csv.DictReader(f)) == ["alice", "bob"]
+
+    assert report_store.delete(student="bob") == 1
+    assert [row["student"] for row in report_store.query()] == ["alice"]
+
+
+def test_report_files_import(report_store, tmp_path):
+    report = make_report(60.0, 2, 4)
+    report_filepath = str(tmp_path / "alice.json")
+    report.save(report_filepath)
+    report_store.save_report_files({"alice": report_filepath}, assignment="tp0")
+    loaded = report_store.get_report("alice", "tp0")
+    assert loaded.grade == pytest.approx(report.grade)
+    assert loaded.get_value("percent_passed") == 50.0
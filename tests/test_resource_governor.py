@@ -0,0 +1,132 @@
+import asyncio
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from tac import ProcessOutcome, ResourceLimits
+from tac.async_utils import run_governed_async
+from tac.resource_governor import run_governed
+
+
+requires_rlimits = pytest.mark.skipif(not ResourceLimits.is_rlimit_supported(), reason="rlimits are POSIX only")
+
+
+def python_cmd(code: str):
+    return [sys.executable, "-c", code]
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # A zombie is dead, it only waits to be reaped by its new parent.
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+    except OSError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def wait_dead(pid: int, timeout: float = 5.0) -> bool:
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        if not is_alive(pid):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def spawn_grandchild_code(pid_filepath, parent_sleep: float) -> str:
+    return (
+        "import subprocess, sys, time\n"
+        "process = subprocess.Popen(\n"
+        "    [sys.executable, '-c', 'import time; time.sleep(60)'],\n"
+        "    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,\n"
+        ")\n"
+        f"with open({str(pid_filepath)!r}, 'w') as f:\n"
+        "    f.write(str(process.pid))\n"
+        f"time.sleep({parent_sleep})\n"
+    )
+
+
+def test_ok_whatever_the_returncode():
+    outcome = run_governed(python_cmd("import sys; print('hello'); sys.exit(3)"), ResourceLimits(timeout=30))
+    assert outcome.ok
+    assert outcome.returncode == 3
+    assert outcome.stdout.strip() == "hello"
+    assert outcome.cpu_time is None or outcome.cpu_time >= 0.0
+
+
+def test_timeout():
+    outcome = run_governed(python_cmd("import time; time.sleep(60)"), ResourceLimits(timeout=0.5))
+    assert outcome.status == ProcessOutcome.TIMEOUT
+    assert outcome.returncode is None
+    assert outcome.duration < 30
+
+
+@requires_rlimits
+def test_cpu_limit():
+    outcome = run_governed(python_cmd("while True: pass"), ResourceLimits(timeout=30, cpu_time=1))
+    assert outcome.status == ProcessOutcome.CPU_LIMIT
+    assert outcome.duration < 30
+
+
+@requires_rlimits
+def test_memory_limit():
+    outcome = run_governed(
+        python_cmd("data = bytearray(4 * 1024 ** 3)"), ResourceLimits(timeout=30, memory=512 * 1024 ** 2)
+    )
+    assert outcome.status == ProcessOutcome.OOM
+    assert "MemoryError" in outcome.stdout
+
+
+@pytest.mark.parametrize("signame, status", [("SIGSEGV", ProcessOutcome.CRASH), ("SIGKILL", ProcessOutcome.OOM)])
+def test_killed_by_a_signal(signame, status):
+    if not hasattr(signal, signame):
+        pytest.skip(f"No {signame} on this platform.")
+    outcome = run_governed(python_cmd(f"import os, signal; os.kill(os.getpid(), signal.{signame})"))
+    assert outcome.status == status
+
+
+@pytest.mark.parametrize(
+    "limits", [ResourceLimits(), pytest.param(ResourceLimits(cpu_time=10), marks=requires_rlimits)]
+)
+def test_missing_executable(tmp_path, limits):
+    cmd = [str(tmp_path / "missing")]
+    outcome = run_governed(cmd, limits)
+    assert outcome.status == ProcessOutcome.CRASH
+    assert not outcome.ok
+    outcome = asyncio.run(run_governed_async(cmd, limits))
+    assert outcome.status == ProcessOutcome.CRASH
+
+
+def test_missing_command_in_a_shell(tmp_path):
+    outcome = run_governed(f"{tmp_path / 'missing'} --version")
+    assert outcome.status == ProcessOutcome.CRASH
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="process groups are POSIX only")
+@pytest.mark.parametrize("parent_sleep, status", [(60, ProcessOutcome.TIMEOUT), (0, ProcessOutcome.OK)])
+def test_process_group_is_killed(tmp_path, parent_sleep, status):
+    pid_filepath = tmp_path / "grandchild.pid"
+    outcome = run_governed(python_cmd(spawn_grandchild_code(pid_filepath, parent_sleep)), ResourceLimits(timeout=5))
+    assert outcome.status == status
+    grandchild_pid = int(pid_filepath.read_text())
+    assert wait_dead(grandchild_pid)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="process groups are POSIX only")
+def test_async_timeout_kills_the_process_group(tmp_path):
+    pid_filepath = tmp_path / "grandchild.pid"
+    outcome = asyncio.run(
+        run_governed_async(python_cmd(spawn_grandchild_code(pid_filepath, 60)), ResourceLimits(timeout=2))
+    )
+    assert outcome.status == ProcessOutcome.TIMEOUT
+    assert wait_dead(int(pid_filepath.read_text()))
@@ -0,0 +1,74 @@
+import asyncio
+import pickle
+import sys
+
+import pytest
+
+import tac
+from tac import AsyncLimits, async_utils
+from tac import tester as tester_module
+
+
+def test_send_cmd_to_process_async_records_the_outcome(tmp_path):
+    src = tac.Source(str(tmp_path), working_dir=str(tmp_path))
+    stdout = asyncio.run(src.send_cmd_to_process_async([sys.executable, "-c", "import os; print(os.getcwd())"]))
+    assert stdout.strip() == str(tmp_path)
+    stdout = asyncio.run(src.send_cmd_to_process_async("echo hello && exit 3"))
+    assert stdout.strip() == "hello"
+    assert [(outcome.status, outcome.returncode) for outcome in src.process_outcomes] == [
+        (tac.ProcessOutcome.OK, 0), (tac.ProcessOutcome.OK, 3),
+    ]
+
+
+def test_limits_have_a_semaphore_by_event_loop():
+    limits = AsyncLimits(pytest=2)
+    assert limits.limits[AsyncLimits.PYTEST] == 2
+    assert limits.limits[AsyncLimits.PIP] == AsyncLimits.DEFAULT_LIMITS[AsyncLimits.PIP]
+
+    async def get_semaphores():
+        return limits.get_semaphore(AsyncLimits.PYTEST), limits.get_semaphore(AsyncLimits.PYTEST)
+
+    first, same = asyncio.run(get_semaphores())
+    assert first is same
+    assert asyncio.run(get_semaphores())[0] is not first
+    assert pickle.loads(pickle.dumps(limits)).limits == limits.limits
+
+
+@pytest.mark.slow
+def test_one_event_loop_grades_several_submissions_within_the_limits(simple_tp, venv_cache, tmp_path, monkeypatch):
+    running, max_running = 0, 0
+
+    async def run_governed_async(*args, **kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        try:
+            return await async_utils.run_governed_async(*args, **kwargs)
+        finally:
+            running -= 1
+
+    monkeypatch.setattr(tester_module, "run_governed_async", run_governed_async)
+
+    def make_tester(report_dir, **kwargs) -> tac.Tester:
+        return tac.Tester(
+            tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+            tac.SourceTests(str(simple_tp / "tests")),
+            master_tests_src=tac.SourceMasterTests(str(simple_tp / "tests")),
+            report_dir=str(tmp_path / report_dir),
+            **kwargs
+        )
+
+    async def run_all():
+        limits = AsyncLimits(pytest=1)
+        testers = [make_tester(f"async_{i}", async_limits=limits) for i in range(2)]
+        return await asyncio.gather(*[tester.run_async() for tester in testers])
+
+    reports = asyncio.run(run_all())
+    # The student and master sessions of both submissions ran one at a time.
+    assert max_running == 1
+    expected_report = make_tester("sync").run()
+    assert expected_report.grade > 0.0
+    for report in reports:
+        assert sorted(report.keys()) == sorted(expected_report.keys())
+        for key in expected_report.keys():
+            assert report.get_value(key) == pytest.approx(expected_report.get_value(key)), key
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from tac import StageGraph, StageScheduler
+
+
+class Recorder:
+    r"""
+    Record the start and the end of the stages and the maximum number of stages running at the same time by
+    resource class.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.running = {}
+        self.max_running = {}
+
+    def stage(self, name: str, resource: str = "default", duration: float = 0.0, error: Exception = None):
+        def func():
+            with self.lock:
+                self.events.append(("start", name))
+                self.running[resource] = self.running.get(resource, 0) + 1
+                self.max_running[resource] = max(self.max_running.get(resource, 0), self.running[resource])
+            time.sleep(duration)
+            with self.lock:
+                self.running[resource] -= 1
+                self.events.append(("end", name))
+            if error is not None:
+                raise error
+            return name.upper()
+
+        return func
+
+    def index(self, event: str, name: str) -> int:
+        return self.events.index((event, name))
+
+
+def test_stages_run_after_their_dependencies():
+    recorder = Recorder()
+    graph = StageGraph("job")
+    graph.add("report", recorder.stage("report"), deps=["tests", "pep8"])
+    graph.add("tests", recorder.stage("tests", duration=0.05), deps=["setup"])
+    graph.add("pep8", recorder.stage("pep8"), deps=["setup"])
+    graph.add("setup", recorder.stage("setup", duration=0.05))
+    assert graph.get_order() == ["setup", "tests", "pep8", "report"]
+    [run] = StageScheduler().run([graph])
+    assert run.ok
+    assert run.results == {"setup": "SETUP", "tests": "TESTS", "pep8": "PEP8", "report": "REPORT"}
+    assert set(run.durations) == set(graph.names)
+    for name, deps in [("tests", ["setup"]), ("pep8", ["setup"]), ("report", ["tests", "pep8"])]:
+        for dep in deps:
+            assert recorder.index("end", dep) < recorder.index("start", name)
+
+
+def test_limits_by_resource():
+    recorder = Recorder()
+    graphs = []
+    for i in range(4):
+        graph = StageGraph(f"job_{i}")
+        setup = recorder.stage(f"setup_{i}", resource="pip", duration=0.05)
+        tests = recorder.stage(f"tests_{i}", resource="pytest", duration=0.05)
+        graph.add("setup", setup, resource="pip")
+        graph.add("tests", tests, deps=["setup"], resource="pytest")
+        graphs.append(graph)
+    runs = StageScheduler({"pip": 2, "pytest": 1}).run(graphs)
+    assert all(run.ok for run in runs)
+    assert recorder.max_running == {"pip": 2, "pytest": 1}
+    # The tests of the first jobs overlap the setups of the last ones.
+    assert recorder.index("start", "tests_0") < recorder.index("end", "setup_3")
+
+
+def test_failed_stage_skips_its_dependents_only():
+    recorder = Recorder()
+    graph = StageGraph("job")
+    graph.add("setup", recorder.stage("setup", error=RuntimeError("pip failed")))
+    graph.add("tests", recorder.stage("tests"), deps=["setup"])
+    graph.add("report", recorder.stage("report"), deps=["tests"])
+    graph.add("pep8", recorder.stage("pep8"))
+    other = StageGraph("other")
+    other.add("setup", recorder.stage("other_setup"))
+    run, other_run = StageScheduler(logging_func=lambda *args, **kwargs: None).run([graph, other])
+    assert not run.ok
+    assert list(run.errors) == ["setup"]
+    assert sorted(run.skipped) == ["report", "tests"]
+    assert run.results == {"pep8": "PEP8"}
+    assert ("start", "tests") not in recorder.events
+    assert "pip failed" in run.format_errors()
+    with pytest.raises(RuntimeError, match="pip failed"):
+        run.raise_errors()
+    assert other_run.ok
+
+
+def test_invalid_graph_runs_no_stage():
+    recorder = Recorder()
+    valid = StageGraph("valid")
+    valid.add("setup", recorder.stage("setup"))
+    invalid = StageGraph("invalid")
+    invalid.add("tests", recorder.stage("tests"), deps=["setup"])
+    with pytest.raises(ValueError, match="unknown stages"):
+        StageScheduler().run([valid, invalid])
+    cyclic = StageGraph("cyclic")
+    cyclic.add("a", recorder.stage("a"), deps=["b"])
+    cyclic.add("b", recorder.stage("b"), deps=["a"])
+    with pytest.raises(ValueError, match="cycle"):
+        StageScheduler().run([valid, cyclic])
+    with pytest.raises(ValueError):
+        valid.add("setup", recorder.stage("setup"))
+    assert recorder.events == []
+
+
+@pytest.mark.parametrize("kwargs", [{"limits": {"pip": 0}}, {"limits": {"pytest": None}}, {"max_workers": -1}])
+def test_invalid_limits(kwargs):
+    with pytest.raises(ValueError):
+        StageScheduler(**kwargs)
@@ -0,0 +1,102 @@
+import os
+
+import tac
+from tac import utils
+
+
+def write_file(path, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def list_files(root):
+    return sorted(
+        os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, "/")
+        for dirpath, _, filenames in os.walk(root)
+        for filename in filenames
+    )
+
+
+def test_first_sync_copies_everything(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write_file(src / "a.py", "a = 1\n")
+    write_file(src / "pkg" / "b.py", "b = 22\n")
+    stats = utils.sync_tree(str(src), str(dst), use_reflinks=False)
+    assert stats == {"copied": 2, "linked": 0, "deleted": 0, "unchanged": 0, "bytes_written": 13}
+    assert list_files(dst) == ["a.py", "pkg/b.py"]
+
+
+def test_resync_writes_only_the_changed_files_and_deletes_the_stale_ones(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write_file(src / "a.py", "a = 1\n")
+    write_file(src / "pkg" / "b.py", "b = 22\n")
+    write_file(src / "old" / "c.py", "c = 3\n")
+    write_file(src / "old" / "d.py", "d = 4\n")
+    utils.sync_tree(str(src), str(dst), use_reflinks=False)
+
+    write_file(src / "pkg" / "b.py", "b = 2222\n")
+    os.remove(src / "a.py")
+    for filename in os.listdir(src / "old"):
+        os.remove(src / "old" / filename)
+    os.rmdir(src / "old")
+    write_file(src / "new.py", "new = 1\n")
+    stats = utils.sync_tree(str(src), str(dst), use_reflinks=False)
+
+    assert stats == {"copied": 2, "linked": 0, "deleted": 3, "unchanged": 0, "bytes_written": 17}
+    assert list_files(dst) == ["new.py", "pkg/b.py"]
+    with open(dst / "pkg" / "b.py") as f:
+        assert f.read() == "b = 2222\n"
+
+    stats = utils.sync_tree(str(src), str(dst), use_reflinks=False)
+    assert stats == {"copied": 0, "linked": 0, "deleted": 0, "unchanged": 2, "bytes_written": 0}
+
+
+def test_same_content_with_another_mtime_is_kept_with_compare_hash(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write_file(src / "a.py", "a = 1\n")
+    utils.sync_tree(str(src), str(dst), use_reflinks=False)
+    os.utime(src / "a.py", (0, 0))
+    stats = utils.sync_tree(str(src), str(dst), use_reflinks=False, compare_hash=True)
+    assert stats["unchanged"] == 1
+    assert stats["bytes_written"] == 0
+
+
+def test_link_patterns_are_hardlinked(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write_file(src / "data" / "big.csv", "x,y\n" * 100)
+    write_file(src / "a.py", "a = 1\n")
+    stats = utils.sync_tree(str(src), str(dst), link_patterns=["data/*"], use_reflinks=False)
+    assert stats["linked"] == 1
+    assert stats["copied"] == 1
+    assert stats["bytes_written"] == 6
+    assert os.path.samefile(src / "data" / "big.csv", dst / "data" / "big.csv")
+
+
+def test_skipped_dirs_and_venvs_are_kept(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    write_file(src / "a.py", "a = 1\n")
+    utils.sync_tree(str(src), str(dst), use_reflinks=False)
+    write_file(dst / "__pycache__" / "a.cpython.pyc", "")
+    write_file(dst / "venv" / "pyvenv.cfg", "home = /usr/bin\n")
+    stats = utils.sync_tree(str(src), str(dst), use_reflinks=False)
+    assert stats["deleted"] == 0
+    assert os.path.exists(dst / "__pycache__" / "a.cpython.pyc")
+    assert os.path.exists(dst / "venv" / "pyvenv.cfg")
+
+
+def test_source_copy_stats(tmp_path):
+    src = tmp_path / "project" / "tests"
+    write_file(src / "test_a.py", "a = 1\n")
+    write_file(src / "test_b.py", "b = 2\n")
+    source = tac.SourceTests(str(src), use_reflinks=False)
+    source.setup_at(str(tmp_path / "report"), overwrite=True)
+    assert source.copy_stats["copied"] == 2
+    assert source.copy_stats["bytes_written"] == 12
+
+    os.remove(src / "test_b.py")
+    source.setup_at(str(tmp_path / "report"), overwrite=True)
+    assert source.copy_stats["deleted"] == 1
+    assert source.copy_stats["unchanged"] == 1
+    assert source.copy_stats["bytes_written"] == 0
+    assert sorted(os.listdir(source.local_path)) == ["test_a.py"]
@@ -0,0 +1,37 @@
+import pytest
+
+import tac
+
+
+def make_tester(simple_tp, venv_cache, report_dir, logs, **kwargs) -> tac.Tester:
+    return tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache, logging_func=logs.append),
+        tac.SourceTests(str(simple_tp / "tests"), logging_func=logs.append),
+        report_dir=str(report_dir),
+        logging_func=logs.append,
+        **kwargs
+    )
+
+
+@pytest.mark.slow
+def test_incremental_run_matches_full_run(simple_tp, venv_cache, tmp_path):
+    logs = []
+    make_tester(simple_tp, venv_cache, tmp_path / "incremental", logs, incremental=True).run()
+    functions_path = simple_tp / "src" / "functions.py"
+    functions_path.write_text(functions_path.read_text().replace("return a * b", "return a * b + 1"))
+
+    logs.clear()
+    incremental_report = make_tester(simple_tp, venv_cache, tmp_path / "incremental", logs, incremental=True).run()
+    reuse_logs = [log for log in logs if "reusing the results of" in log]
+    assert len(reuse_logs) == 1, logs
+    assert "reusing the results of 0 tests" not in reuse_logs[0]
+
+    full_report = make_tester(simple_tp, venv_cache, tmp_path / "full", logs).run()
+    assert full_report.grade < 100.0
+    assert sorted(incremental_report.keys()) == sorted(full_report.keys())
+    for key in full_report.keys():
+        assert incremental_report.get_value(key) == pytest.approx(full_report.get_value(key)), key
+    assert incremental_report.grade == pytest.approx(full_report.grade)
+    incremental_summary = incremental_report.metadata["stages"][tac.Tester.TESTS_SUITE]
+    full_summary = full_report.metadata["stages"][tac.Tester.TESTS_SUITE]
+    assert incremental_summary == full_summary
@@ -0,0 +1,97 @@
+import json
+import sys
+import threading
+
+import pytest
+
+import tac
+from tac import Timings
+from tac.resource_governor import run_governed
+from tac.timings import add_children_cpu_time
+
+
+def test_nested_sections_and_totals():
+    timings = Timings("submission")
+    with timings.record("setup"):
+        with timings.record("venv"):
+            add_children_cpu_time(1.5)
+        add_children_cpu_time(0.5)
+    with timings.record("tests", measure_thread_cpu=False):
+        add_children_cpu_time(None)
+    assert list(timings.to_dict()["sections"]) == ["setup", "setup/venv", "tests"]
+    sections = timings.sections
+    assert sections["setup/venv"]["cpu"] >= 1.5
+    # The CPU time of a subprocess counts in every section that was running when it ended.
+    assert sections["setup"]["cpu"] >= 2.0
+    assert sections["tests"]["cpu"] == 0.0
+    total = timings.get_total()
+    assert total["cpu"] == pytest.approx(sections["setup"]["cpu"] + sections["tests"]["cpu"])
+    assert total["wall"] >= sections["setup"]["wall"] + sections["tests"]["wall"]
+
+
+def test_sections_of_threads_are_independent():
+    timings = Timings()
+
+    def record(name: str):
+        with timings.record(name):
+            add_children_cpu_time(1.0)
+
+    with timings.record("stages"):
+        threads = [threading.Thread(target=record, args=(f"stage_{i}",)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    # The threads don't inherit the sections of the main thread.
+    assert set(timings.sections) == {"stages", "stage_0", "stage_1"}
+    assert timings.sections["stages"]["cpu"] < 1.0
+    assert len({event["tid"] for event in timings.events}) == 3
+
+
+def test_governed_process_cpu_time_is_recorded():
+    timings = Timings()
+    with timings.record("busy", measure_thread_cpu=False):
+        outcome = run_governed([sys.executable, "-c", "sum(range(10 ** 7))"])
+    if outcome.cpu_time is None:
+        pytest.skip("The CPU time of the subprocesses is not measured on this platform.")
+    assert timings.sections["busy"]["cpu"] == pytest.approx(outcome.cpu_time)
+
+
+def test_merge_traces(tmp_path):
+    paths = []
+    for name in ["first", "second"]:
+        timings = Timings(name)
+        with timings.record("tests"):
+            pass
+        paths.append(timings.save_trace(str(tmp_path / name / "trace.json")))
+    merged_path = Timings.merge_traces([*paths, str(tmp_path / "missing.json")], str(tmp_path / "batch.json"))
+    with open(merged_path) as f:
+        events = json.load(f)["traceEvents"]
+    processes = {event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert processes == {"first", "second"}
+    assert len({event["pid"] for event in events}) == 2
+    assert [event["name"] for event in events if event["ph"] == "X"] == ["tests", "tests"]
+
+
+@pytest.mark.slow
+def test_tester_saves_the_timings_of_every_stage(simple_tp, venv_cache, tmp_path):
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+        tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(tmp_path / "report"),
+        trace=True,
+    )
+    tester.run()
+    report = tac.Report().load(tester.report_filepath)
+    sections = report.timings["sections"]
+    for name in [
+        "clone/code_src", "copy/code_src", "copy/tests_src", "venv/code_src", "install/code_src",
+        "student_tests", "coverage", "lint", "report/cleanup",
+    ]:
+        assert name in sections, name
+        assert sections[name]["wall"] >= 0.0
+    # The pytest session runs in a subprocess, whose CPU time is counted.
+    assert sections["student_tests"]["cpu"] > 0.0
+    with open(tester.trace_filepath) as f:
+        events = json.load(f)["traceEvents"]
+    assert {event["name"] for event in events if event["ph"] == "X"} >= set(sections)
@@ -0,0 +1,122 @@
+import os
+from contextlib import contextmanager
+
+import pytest
+
+from tac import VenvCache, utils
+from tac.venv_cache import VenvBuildError
+
+
+ENTRY_SIZE = 100
+
+
+class FakeBuild:
+    r"""
+    Build function writing a fake virtual environment of `ENTRY_SIZE` bytes whose script refers to its own path.
+    """
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.n_calls = 0
+
+    def __call__(self, venv_path: str) -> str:
+        self.n_calls += 1
+        os.makedirs(os.path.join(venv_path, "bin"))
+        with open(os.path.join(venv_path, "bin", "activate"), "w") as f:
+            f.write(f"VIRTUAL_ENV={venv_path}\n")
+        with open(os.path.join(venv_path, "data"), "w") as f:
+            f.write("x" * (ENTRY_SIZE - os.path.getsize(os.path.join(venv_path, "bin", "activate"))))
+        if self.fail:
+            raise VenvBuildError("pip install failed")
+        return "built"
+
+
+def add_entries(cache: VenvCache, tmp_path, n_entries: int):
+    r"""
+    Add entries to the cache, the first one being the least recently used.
+    """
+    keys = []
+    for i in range(n_entries):
+        key = cache.make_key([f"package-{i}"])
+        cache.get_or_create(key, str(tmp_path / "venvs" / f"venv_{i}"), FakeBuild())
+        os.utime(cache.get_meta_path(key), (1000.0 + i, 1000.0 + i))
+        keys.append(key)
+    return keys
+
+
+def test_miss_then_hit_copies_the_entry(tmp_path):
+    cache = VenvCache(str(tmp_path / "cache"))
+    key = cache.make_key(["pytest", "numpy"])
+    assert key == cache.make_key(["numpy", "pytest", ""])
+    build = FakeBuild()
+    assert not cache.get_or_create(key, str(tmp_path / "a" / "venv"), build)
+    assert cache.get_or_create(key, str(tmp_path / "b" / "venv"), build)
+    assert build.n_calls == 1
+    assert cache.keys == [key]
+    assert cache.get_size() >= ENTRY_SIZE
+    assert not os.path.islink(tmp_path / "b" / "venv")
+    with open(tmp_path / "b" / "venv" / "bin" / "activate") as f:
+        assert f.read() == f"VIRTUAL_ENV={tmp_path / 'b' / 'venv'}\n"
+
+
+def test_failed_build_is_not_cached(tmp_path):
+    cache = VenvCache(str(tmp_path / "cache"))
+    key = cache.make_key(["pytest"])
+    with pytest.raises(VenvBuildError):
+        cache.get_or_create(key, str(tmp_path / "a" / "venv"), FakeBuild(fail=True))
+    assert cache.keys == []
+    assert not os.path.exists(cache.get_entry_path(key))
+    build = FakeBuild()
+    assert not cache.get_or_create(key, str(tmp_path / "b" / "venv"), build)
+    assert build.n_calls == 1
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = VenvCache(str(tmp_path / "cache"), eviction_grace_seconds=0)
+    keys = add_entries(cache, tmp_path, 3)
+    cache.touch(keys[0])
+    size = cache.get_size()
+    evicted = cache.evict(size - 1)
+    assert evicted == [keys[1]]
+    assert sorted(cache.keys) == sorted([keys[0], keys[2]])
+    assert not os.path.exists(cache.get_entry_path(keys[1]))
+    assert cache.evict(0) == [keys[2], keys[0]]
+    assert cache.keys == []
+
+
+def test_max_size_evicts_after_a_build(tmp_path):
+    cache = VenvCache(str(tmp_path / "cache"), eviction_grace_seconds=0)
+    add_entries(cache, tmp_path, 2)
+    cache.max_size = cache.get_size()
+    key = cache.make_key(["package-new"])
+    cache.get_or_create(key, str(tmp_path / "venvs" / "venv_new"), FakeBuild())
+    assert key in cache.keys
+    assert len(cache.keys) == 2
+    assert cache.get_size() <= cache.max_size
+
+
+def test_recent_and_locked_entries_are_kept(tmp_path):
+    cache = VenvCache(str(tmp_path / "cache"), eviction_grace_seconds=60)
+    keys = add_entries(cache, tmp_path, 3)
+    cache.touch(keys[2])
+    with utils.file_lock(cache.get_lock_path(keys[0]), shared=True):
+        assert cache.evict(0) == [keys[1]]
+    assert sorted(cache.keys) == sorted([keys[0], keys[2]])
+
+
+def test_entry_used_after_the_listing_is_kept(tmp_path, monkeypatch):
+    cache = VenvCache(str(tmp_path / "cache"), eviction_grace_seconds=60)
+    keys = add_entries(cache, tmp_path, 2)
+    file_lock = utils.file_lock
+
+    @contextmanager
+    def file_lock_after_a_hit(lock_path, shared=False, blocking=True):
+        # Another tester hits the entry between the listing of the entries and the lock of the eviction.
+        if lock_path == cache.get_lock_path(keys[0]) and not shared:
+            cache.get_or_create(keys[0], str(tmp_path / "venvs" / "venv_hit"), FakeBuild())
+        with file_lock(lock_path, shared=shared, blocking=blocking) as acquired:
+            yield acquired
+
+    monkeypatch.setattr(utils, "file_lock", file_lock_after_a_hit)
+    assert cache.evict(0) == [keys[1]]
+    assert cache.keys == [keys[0]]
+    assert os.path.isdir(cache.get_venv_path(keys[0]))
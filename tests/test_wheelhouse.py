@@ -0,0 +1,83 @@
+import os
+import subprocess
+import zipfile
+
+import pytest
+
+import tac
+
+
+def make_wheel(wheelhouse_dir, name: str, version: str = "1.0") -> str:
+    r"""
+    Write a minimal pure python wheel of a package `name` whose module defines `VERSION`.
+    """
+    dist_info = f"{name}-{version}.dist-info"
+    files = {
+        f"{name}.py"             : f"VERSION = {version!r}\n",
+        f"{dist_info}/METADATA"  : f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n",
+        f"{dist_info}/WHEEL"     : "Wheel-Version: 1.0\nGenerator: tests\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    files[f"{dist_info}/RECORD"] = "".join(f"{path},,\n" for path in [*files, f"{dist_info}/RECORD"])
+    os.makedirs(wheelhouse_dir, exist_ok=True)
+    wheel_path = os.path.join(wheelhouse_dir, f"{name}-{version}-py3-none-any.whl")
+    with zipfile.ZipFile(wheel_path, "w") as f:
+        for path, content in files.items():
+            f.writestr(path, content)
+    return wheel_path
+
+
+@pytest.fixture
+def code_src(tmp_path):
+    make_wheel(tmp_path / "wheelhouse", "tac_demo_a")
+    make_wheel(tmp_path / "wheelhouse", "tac_demo_b")
+    os.makedirs(tmp_path / "submission" / "src")
+    (tmp_path / "submission" / "requirements.txt").write_text("tac_demo_a  # from the file\n")
+    return tac.SourceCode(
+        str(tmp_path / "submission" / "src"),
+        working_dir=str(tmp_path / "report"),
+        wheelhouse=str(tmp_path / "wheelhouse"),
+        additional_requirements=["tac_demo_b"],
+    )
+
+
+def test_wheelhouse_lists_its_wheels(tmp_path):
+    wheelhouse = tac.Wheelhouse(str(tmp_path / "wheelhouse"))
+    assert wheelhouse.wheels == []
+    make_wheel(tmp_path / "wheelhouse", "tac_demo_b")
+    make_wheel(tmp_path / "wheelhouse", "tac_demo_a")
+    (tmp_path / "wheelhouse" / "notes.txt").write_text("not a wheel")
+    assert wheelhouse.wheels == ["tac_demo_a-1.0-py3-none-any.whl", "tac_demo_b-1.0-py3-none-any.whl"]
+
+
+def test_requirements_are_merged_in_one_offline_pip_invocation(code_src, tmp_path):
+    args = code_src.get_pip_install_args("python")
+    assert args[:7] == [
+        "python", "-m", "pip", "install", "--no-index", f"--find-links={tmp_path / 'wheelhouse'}", "-r",
+    ]
+    assert os.path.samefile(args[7], tmp_path / "submission" / "requirements.txt")
+    assert args[8:] == ["tac_demo_b"]
+    assert code_src.requirements == ["tac_demo_a", "tac_demo_b"]
+
+
+@pytest.mark.parametrize("single_shot_install, n_pip_cmds", [(True, 1), (False, 2)])
+def test_number_of_pip_invocations(code_src, monkeypatch, single_shot_install, n_pip_cmds):
+    cmds = []
+    monkeypatch.setattr(tac.SourceCode, "send_cmd_to_process", lambda self, cmd, **kwargs: cmds.append(cmd) or "")
+    code_src.single_shot_install = single_shot_install
+    code_src.install_requirements("python")
+    assert len(cmds) == n_pip_cmds
+    assert all("pip install" in cmd for cmd in cmds)
+
+
+@pytest.mark.slow
+def test_install_from_the_wheelhouse_without_an_index(code_src, tmp_path):
+    venv_path = tmp_path / "venv"
+    subprocess.run(["python", "-m", "venv", str(venv_path)], check=True, stdout=subprocess.DEVNULL)
+    python_path = code_src.get_venv_python_path(str(venv_path))
+    code_src.install_requirements(python_path)
+    assert all(outcome.ok and outcome.returncode == 0 for outcome in code_src.process_outcomes)
+    result = subprocess.run(
+        [python_path, "-c", "import tac_demo_a, tac_demo_b; print(tac_demo_a.VERSION, tac_demo_b.VERSION)"],
+        check=True, capture_output=True, universal_newlines=True,
+    )
+    assert result.stdout.split() == ["1.0", "1.0"]
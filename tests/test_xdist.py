@@ -0,0 +1,136 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import tac
+from tac import resource_governor
+from tac import tester as tester_module
+
+
+def make_venv(working_dir, with_xdist: bool):
+    venv_path = working_dir / "venv"
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", str(venv_path)], check=True)
+    if with_xdist:
+        site_packages = subprocess.run(
+            [str(venv_path / "bin" / "python"), "-c", "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+            check=True, capture_output=True, universal_newlines=True,
+        ).stdout.strip()
+        os.makedirs(os.path.join(site_packages, "xdist"))
+        open(os.path.join(site_packages, "xdist", "__init__.py"), "w").close()
+    return venv_path
+
+
+def make_tester(simple_tp, working_dir, **kwargs) -> tac.Tester:
+    return tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), working_dir=str(working_dir)),
+        tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(working_dir),
+        **kwargs
+    )
+
+
+@pytest.fixture
+def governed_cmds(monkeypatch):
+    r"""
+    Record the commands run under the resource limits and forget the venvs already checked by other tests.
+    """
+    monkeypatch.setattr(tac.Tester, "_VENVS_WITH_XDIST", {})
+    cmds = []
+
+    def run_governed(cmd, limits=None, **kwargs):
+        cmds.append((cmd, limits))
+        return resource_governor.run_governed(cmd, limits=limits, **kwargs)
+
+    monkeypatch.setattr(tester_module, "run_governed", run_governed)
+    return cmds
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="the venv scripts are in bin on POSIX only")
+def test_has_xdist_is_checked_under_the_limits_and_cached_by_venv(simple_tp, tmp_path, governed_cmds):
+    limits = {"timeout": 60, "cpu_time": 30}
+    make_venv(tmp_path / "without", with_xdist=False)
+    make_venv(tmp_path / "with", with_xdist=True)
+    without_tester = make_tester(simple_tp, tmp_path / "without", resource_limits=limits, test_workers=2)
+    with_tester = make_tester(simple_tp, tmp_path / "with", resource_limits=limits, test_workers=2)
+
+    with pytest.warns(RuntimeWarning, match="pytest-xdist is not installed"):
+        assert without_tester.get_xdist_options(without_tester.code_src) == []
+    assert with_tester.get_xdist_options(with_tester.code_src) == ["-n 2"]
+    assert len(governed_cmds) == 2
+    for cmd, cmd_limits in governed_cmds:
+        assert "-I" in cmd
+        assert cmd_limits.to_dict() == {"timeout": 60, "cpu_time": 30, "memory": None}
+
+    # Another tester of the same venv reuses the answer.
+    other_tester = make_tester(simple_tp, tmp_path / "with", test_workers=2)
+    assert other_tester.has_xdist(other_tester.code_src)
+    assert len(governed_cmds) == 2
+
+    # A recreated venv is checked again.
+    shutil.rmtree(tmp_path / "with" / "venv")
+    make_venv(tmp_path / "with", with_xdist=False)
+    assert not other_tester.has_xdist(other_tester.code_src)
+    assert len(governed_cmds) == 3
+
+
+def test_single_worker_runs_no_check(simple_tp, tmp_path, governed_cmds):
+    tester = make_tester(simple_tp, tmp_path, test_workers=1)
+    assert tester.get_xdist_options(tester.code_src) == []
+    assert governed_cmds == []
+
+
+def test_missing_venv_has_no_xdist(simple_tp, tmp_path, governed_cmds):
+    logs = []
+    tester = make_tester(simple_tp, tmp_path, logging_func=logs.append)
+    assert not tester.has_xdist(tester.code_src)
+    assert any("Could not look for pytest-xdist" in log for log in logs)
+    assert tac.Tester._VENVS_WITH_XDIST == {}
+
+
+def add_xdist_to_requirements(simple_tp):
+    with open(simple_tp / "requirements.txt", "a") as f:
+        f.write("pytest-xdist\n")
+
+
+def run_tester(simple_tp, venv_cache, report_dir, **kwargs) -> tac.Tester:
+    tester = tac.Tester(
+        tac.SourceCode(str(simple_tp / "src"), venv_cache=venv_cache),
+        tac.SourceTests(str(simple_tp / "tests")),
+        report_dir=str(report_dir),
+        **kwargs
+    )
+    tester.run()
+    return tester
+
+
+def assert_same_reports(report, expected_report):
+    assert sorted(report.keys()) == sorted(expected_report.keys())
+    for key in expected_report.keys():
+        assert report.get_value(key) == pytest.approx(expected_report.get_value(key)), key
+    stage = tac.Tester.TESTS_SUITE
+    assert report.metadata["stages"][stage] == expected_report.metadata["stages"][stage]
+
+
+@pytest.mark.slow
+def test_xdist_run_matches_single_process_run(simple_tp, venv_cache, tmp_path):
+    add_xdist_to_requirements(simple_tp)
+    xdist_tester = run_tester(simple_tp, venv_cache, tmp_path / "xdist", test_workers=2)
+    assert xdist_tester.has_xdist(xdist_tester.code_src)
+    single_tester = run_tester(simple_tp, venv_cache, tmp_path / "single")
+    assert single_tester.report.grade > 0.0
+    assert_same_reports(xdist_tester.report, single_tester.report)
+
+
+@pytest.mark.slow
+def test_incremental_xdist_run_counts_the_deselected_tests(simple_tp, venv_cache, tmp_path):
+    add_xdist_to_requirements(simple_tp)
+    run_tester(simple_tp, venv_cache, tmp_path / "incremental", test_workers=2, incremental=True)
+    functions_path = simple_tp / "src" / "functions.py"
+    functions_path.write_text(functions_path.read_text().replace("return a * b", "return a * b + 1"))
+    incremental_tester = run_tester(simple_tp, venv_cache, tmp_path / "incremental", test_workers=2, incremental=True)
+    full_tester = run_tester(simple_tp, venv_cache, tmp_path / "full")
+    assert full_tester.report.grade < 100.0
+    assert_same_reports(incremental_tester.report, full_tester.report)